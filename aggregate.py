@@ -0,0 +1,130 @@
+"""
+重复错误的聚合与去重。
+
+样式字体设错时，每个 run 都会产生一条 (样式, 规则, 期望值, 实际值) 完全相同的错误，
+大文档里可能有上万条。FindingAggregator 把它们折叠成分组记录：
+每组只保存计数和有限个示例位置，控制台和 HTML 报告直接按分组渲染。
+"""
+
+
+class FindingAggregator:
+    """
+    按 (样式, 类别, 规则, 期望值, 实际值) 聚合错误。
+
+    max_samples:       每组最多保留的示例位置数
+    max_per_rule:      每条规则最多计入的错误数，超出部分只计入 dropped
+    max_per_paragraph: 每个段落最多计入的错误数，超出部分只计入 dropped
+    """
+
+    def __init__(self, max_samples=5, max_per_rule=None, max_per_paragraph=None):
+        self.max_samples = max_samples
+        self.max_per_rule = max_per_rule
+        self.max_per_paragraph = max_per_paragraph
+        self.reset()
+
+    def reset(self):
+        """清空已记录的错误，保留上限配置。"""
+        self._groups = {}
+        self._rule_counts = {}
+        self._paragraph_counts = {}
+        self.total = 0
+        self.dropped = 0
+
+    def add(
+        self,
+        para_idx,
+        style_name,
+        category,
+        rule,
+        expected,
+        actual,
+        full_text=None,
+        run_idx=None,
+        run_text=None,
+        location=None,
+    ):
+        """记录一条错误，返回是否被计入（超出上限时返回 False）。"""
+        rule_count = self._rule_counts.get(rule, 0)
+        para_count = self._paragraph_counts.get(para_idx, 0)
+        if (self.max_per_rule is not None and rule_count >= self.max_per_rule) or (
+            self.max_per_paragraph is not None and para_count >= self.max_per_paragraph
+        ):
+            self.dropped += 1
+            return False
+        self._rule_counts[rule] = rule_count + 1
+        self._paragraph_counts[para_idx] = para_count + 1
+        self.total += 1
+
+        key = (style_name, category, rule, str(expected), str(actual))
+        group = self._groups.get(key)
+        if group is None:
+            group = {
+                "style_name": style_name,
+                "category": category,
+                "rule": rule,
+                "expected": key[3],
+                "actual": key[4],
+                "count": 0,
+                "paragraph_count": 0,
+                "samples": [],
+                "_last_para_idx": None,
+            }
+            self._groups[key] = group
+
+        group["count"] += 1
+        if group["_last_para_idx"] != para_idx:
+            # 段落按顺序检查，同一段落的错误是连续到达的
+            group["paragraph_count"] += 1
+            group["_last_para_idx"] = para_idx
+        if len(group["samples"]) < self.max_samples:
+            sample = {"para_idx": para_idx, "full_text": full_text}
+            if run_idx is not None:
+                sample["run_idx"] = run_idx
+                sample["run_text"] = run_text or ""
+            if location:
+                sample["location"] = location
+            group["samples"].append(sample)
+        return True
+
+    @classmethod
+    def from_errors(cls, errors, **kwargs):
+        """从 FormatChecker.errors 的按段落结构构造聚合结果（文档级错误除外）。"""
+        aggregator = cls(**kwargs)
+        for block in errors:
+            if block["para_idx"] == -1:
+                continue
+            for err in block["details"]:
+                aggregator.add(
+                    block["para_idx"],
+                    block["style_name"],
+                    err["category"],
+                    err["rule"],
+                    err["expected"],
+                    err["actual"],
+                    full_text=block.get("full_text"),
+                    run_idx=err.get("run_idx"),
+                    run_text=err.get("run_text"),
+                    location=err.get("location"),
+                )
+        return aggregator
+
+    def groups(self):
+        """分组列表，按出现次数从多到少排序。"""
+        return sorted(
+            self._groups.values(),
+            key=lambda g: (-g["count"], g["samples"][0]["para_idx"] if g["samples"] else 0),
+        )
+
+    def rule_counts(self):
+        """每条规则计入的错误数。"""
+        return dict(self._rule_counts)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def to_list(self):
+        """可 JSON 序列化的分组列表。"""
+        return [
+            {k: v for k, v in group.items() if not k.startswith("_")}
+            for group in self.groups()
+        ]
@@ -0,0 +1,521 @@
+"""
+自动修正：检查文档后，把可以机械修正的问题直接改进 word/document.xml 并写出新的 .docx，
+不经过 python-docx 的保存（其他部件原样复制，document.xml 只解析、修改、序列化一次）。
+
+可修正的问题：
+- run：font_size_pt、chinese_font、western_font、font_bold、font_italic，
+  在 run 的 w:rPr 中写入直接格式；
+- 段落：alignment、first_line_indent_pt、space_before_pt、space_after_pt、
+  keep_with_next、keep_together、widow_control，在段落的 w:pPr 中写入直接格式；
+- 内容间距（正则）规则：按规则的 fixes() 删除多余的空格或插入缺少的空格，
+  只修改检查报告的位置，可以跨 run 修改 w:t 的文本。
+
+节格式、行距等其余问题不修改，计入"未修正"。
+
+    python autofix.py 论文.docx                      # 写出 论文.fixed.docx
+    python autofix.py 论文.docx -o 修正版.docx --verify
+    python autofix.py 提交/*.docx --out-dir fixed/ --processes 8
+"""
+import logging
+import os
+import sys
+import time
+import zipfile
+from collections import Counter
+
+from enums import WD_ALIGN_PARAGRAPH
+from registry import SCOPE_TEXT, compile_pattern
+
+DOCUMENT_PART = "word/document.xml"
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+# w:pPr、w:rPr 子元素在 schema 中的顺序（Word 要求按这个顺序出现），只列出会用到和常见的
+PPR_ORDER = [_w(tag) for tag in (
+    "pStyle", "keepNext", "keepLines", "pageBreakBefore", "framePr", "widowControl", "numPr",
+    "suppressLineNumbers", "pBdr", "shd", "tabs", "suppressAutoHyphens", "kinsoku", "wordWrap",
+    "overflowPunct", "topLinePunct", "autoSpaceDE", "autoSpaceDN", "bidi", "adjustRightInd",
+    "snapToGrid", "spacing", "ind", "contextualSpacing", "mirrorIndents", "suppressOverlap", "jc",
+    "textDirection", "textAlignment", "textboxTightWrap", "outlineLvl", "divId", "cnfStyle", "rPr",
+    "sectPr", "pPrChange",
+)]
+RPR_ORDER = [_w(tag) for tag in (
+    "rStyle", "rFonts", "b", "bCs", "i", "iCs", "caps", "smallCaps", "strike", "dstrike", "outline",
+    "shadow", "emboss", "imprint", "noProof", "snapToGrid", "vanish", "webHidden", "color", "spacing",
+    "w", "kern", "position", "sz", "szCs", "highlight", "u", "effect", "bdr", "shd", "fitText",
+    "vertAlign", "rtl", "cs", "em", "lang", "eastAsianLayout", "specVanish", "oMath", "rPrChange",
+)]
+
+JC_VALUES = {
+    WD_ALIGN_PARAGRAPH.LEFT: "left",
+    WD_ALIGN_PARAGRAPH.CENTER: "center",
+    WD_ALIGN_PARAGRAPH.RIGHT: "right",
+    WD_ALIGN_PARAGRAPH.JUSTIFY: "both",
+    WD_ALIGN_PARAGRAPH.DISTRIBUTE: "distribute",
+}
+
+
+def _properties(parent, tag):
+    """parent（w:p 或 w:r）的 w:pPr / w:rPr，没有时插入为第一个子元素。"""
+    from lxml import etree
+
+    properties = parent.find(tag)
+    if properties is None:
+        properties = etree.Element(tag)
+        parent.insert(0, properties)
+    return properties
+
+
+def _child(parent, tag, order):
+    """parent 中的 tag 子元素，没有时按 schema 顺序插入。"""
+    from lxml import etree
+
+    element = parent.find(tag)
+    if element is not None:
+        return element
+    element = etree.Element(tag)
+    position = order.index(tag)
+    for index, sibling in enumerate(parent):
+        if sibling.tag in order and order.index(sibling.tag) > position:
+            parent.insert(index, element)
+            return element
+    parent.append(element)
+    return element
+
+
+def _set_on_off(parent, tag, order, value):
+    element = _child(parent, tag, order)
+    if value:
+        element.attrib.pop(_w("val"), None)
+    else:
+        element.set(_w("val"), "0")
+
+
+def _twips(pt):
+    return str(int(round(pt * 20)))
+
+
+# ---------------------------------------------------------------- run 的修正：fixer(rPr, 期望值)
+
+def _fix_font_size(rPr, expected):
+    half_points = str(int(round(expected * 2)))
+    _child(rPr, _w("sz"), RPR_ORDER).set(_w("val"), half_points)
+    _child(rPr, _w("szCs"), RPR_ORDER).set(_w("val"), half_points)
+
+
+def _fix_east_asia_font(rPr, expected):
+    fonts = _child(rPr, _w("rFonts"), RPR_ORDER)
+    # 主题字体优先于显式字体，必须一起去掉
+    fonts.attrib.pop(_w("eastAsiaTheme"), None)
+    fonts.set(_w("eastAsia"), expected)
+
+
+def _fix_western_font(rPr, expected):
+    fonts = _child(rPr, _w("rFonts"), RPR_ORDER)
+    for attr in ("ascii", "hAnsi"):
+        fonts.attrib.pop(_w(f"{attr}Theme"), None)
+        fonts.set(_w(attr), expected)
+
+
+RUN_FIXERS = {
+    "font_size_pt": ("font_size_pt", _fix_font_size),
+    "chinese_font": ("chinese_font", _fix_east_asia_font),
+    "western_font": ("western_font", _fix_western_font),
+    "western_font (fallback)": ("western_font", _fix_western_font),
+    "font_bold": ("font_bold", lambda rPr, expected: _set_on_off(rPr, _w("b"), RPR_ORDER, expected)),
+    "font_italic": ("font_italic", lambda rPr, expected: _set_on_off(rPr, _w("i"), RPR_ORDER, expected)),
+}
+
+
+# ---------------------------------------------------------------- 段落的修正：fixer(pPr, 期望值)
+
+def _fix_alignment(pPr, expected):
+    value = JC_VALUES.get(expected)
+    if value is None:
+        return False
+    _child(pPr, _w("jc"), PPR_ORDER).set(_w("val"), value)
+
+
+def _fix_first_line_indent(pPr, expected):
+    ind = _child(pPr, _w("ind"), PPR_ORDER)
+    # 按字符数的缩进优先于按长度的缩进
+    for attr in ("firstLine", "firstLineChars", "hanging", "hangingChars"):
+        ind.attrib.pop(_w(attr), None)
+    if expected >= 0:
+        ind.set(_w("firstLine"), _twips(expected))
+    else:
+        ind.set(_w("hanging"), _twips(-expected))
+
+
+def _spacing_fixer(side):
+    def fix(pPr, expected):
+        spacing = _child(pPr, _w("spacing"), PPR_ORDER)
+        for attr in (f"{side}Lines", f"{side}Autospacing"):
+            spacing.attrib.pop(_w(attr), None)
+        spacing.set(_w(side), _twips(expected))
+
+    return fix
+
+
+def _on_off_fixer(tag):
+    return lambda pPr, expected: _set_on_off(pPr, _w(tag), PPR_ORDER, expected)
+
+
+PARAGRAPH_FIXERS = {
+    "alignment": _fix_alignment,
+    "first_line_indent_pt": _fix_first_line_indent,
+    "space_before_pt": _spacing_fixer("before"),
+    "space_after_pt": _spacing_fixer("after"),
+    "keep_with_next": _on_off_fixer("keepNext"),
+    "keep_together": _on_off_fixer("keepLines"),
+    "widow_control": _on_off_fixer("widowControl"),
+}
+
+
+# ---------------------------------------------------------------- 文本的修正
+
+# 段落中与文本对应的元素，和 python-docx 的 paragraph.text 一致（包括超链接中的 run）；
+# 只修改 w:t，w:tab、w:br 等按 run.text 的方式换成占位字符，使偏移和检查时的段落文本相同
+_RUN_TEXT = "*[self::w:t or self::w:tab or self::w:ptab or self::w:br or self::w:cr or self::w:noBreakHyphen]"
+_TEXT_XPATH = f"./w:r/{_RUN_TEXT} | ./w:hyperlink/w:r/{_RUN_TEXT}"
+
+
+def _inner_text(node):
+    tag = node.tag
+    if tag == _w("t"):
+        return node.text or ""
+    if tag in (_w("tab"), _w("ptab")):
+        return "\t"
+    if tag == _w("br"):
+        # 分页符、分栏符没有对应的文本
+        return "\n" if node.get(_w("type"), "textWrapping") == "textWrapping" else ""
+    if tag == _w("cr"):
+        return "\n"
+    return "-"
+
+
+def _edit_text_nodes(nodes, texts, edits):
+    """
+    nodes 为段落中依次出现的文本元素，texts 为它们的文本（见 _inner_text），
+    edits 为按起点排序、互不重叠、只涉及 w:t 的 (起点, 终点, 替换文本)，
+    位置是在所有文本拼接后（即段落文本）中的偏移。
+    """
+    texts = list(texts)
+    editable = [node.tag == _w("t") for node in nodes]
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+    changed = set()
+    # 从后往前改，前面节点中的偏移不受影响
+    for start, end, replacement in reversed(edits):
+        placed = not replacement
+        for k, text in enumerate(texts):
+            if not editable[k]:
+                continue
+            node_start = starts[k]
+            node_end = node_start + len(text)
+            low, high = max(start, node_start), min(end, node_end)
+            if low < high:
+                texts[k] = text[:low - node_start] + text[high - node_start:]
+                changed.add(k)
+            # 插入的文本放进 start 前一个字符所在的 w:t
+            if not placed and node_start < start <= node_end:
+                texts[k] = texts[k][:start - node_start] + replacement + texts[k][start - node_start:]
+                changed.add(k)
+                placed = True
+        if not placed:
+            # start 前是占位元素或段落开头，放进从 start 开始的 w:t
+            for k, node_start in enumerate(starts):
+                if editable[k] and node_start == start:
+                    texts[k] = replacement + texts[k]
+                    changed.add(k)
+                    break
+    for k in changed:
+        text = texts[k]
+        nodes[k].text = text
+        if text != text.strip():
+            nodes[k].set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+
+
+def _fix_text(p, fixes):
+    """
+    fixes 为 [(正则, 分组, 替换文本, 检查报告的位置)]。只修改落在报告位置之内的匹配，
+    不修改涉及 w:tab、w:br 等元素的匹配；互相重叠的修改只保留靠前的一个。返回修改的处数。
+    """
+    nodes = p.xpath(_TEXT_XPATH, namespaces={"w": W_NS})
+    if not nodes:
+        return 0
+    texts = [_inner_text(node) for node in nodes]
+    text = "".join(texts)
+    fixed_spans = []
+    offset = 0
+    for node, node_text in zip(nodes, texts):
+        if node.tag != _w("t") and node_text:
+            fixed_spans.append((offset, offset + len(node_text)))
+        offset += len(node_text)
+
+    edits = []
+    for pattern, group, replacement, locations in fixes:
+        for match in compile_pattern(pattern).finditer(text):
+            start, end = match.span(group)
+            if not any(low <= start and end <= high for low, high in locations):
+                continue
+            if any(start < high and low < end for low, high in fixed_spans):
+                continue
+            edits.append((start, end, replacement))
+    edits.sort(key=lambda edit: edit[:2])
+    kept = []
+    for edit in edits:
+        if kept and (edit[0] < kept[-1][1] or edit[:2] == kept[-1][:2]):
+            continue
+        kept.append(edit)
+    if kept:
+        _edit_text_nodes(nodes, texts, kept)
+    return len(kept)
+
+
+# ---------------------------------------------------------------- 整个文档
+
+def _paragraph_style_names(doc_path, para_indices):
+    """{段落序号: 样式名}，和检查时 ResolvedParagraph.style_name 相同。"""
+    from lazy_package import open_document
+
+    paragraphs = open_document(doc_path).paragraphs
+    return {para_idx: paragraphs[para_idx].style.name for para_idx in para_indices if para_idx < len(paragraphs)}
+
+
+class FixPlan:
+    """
+    由检查结果得到的每个段落要修正的内容：
+    paragraphs[para_idx] = (样式名, 有效规则, {段落级 rule}, {run 序号: {run 级 rule}},
+    {文本 rule 名: [检查报告的位置]})。
+    """
+
+    def __init__(self, checker, errors, doc_path=None):
+        self.checker = checker
+        self.paragraphs = {}
+        self.unfixable = Counter()
+        self._text_fixes = {}
+        # 段落 0 的块可能由节格式的错误建立，样式名为 None，这时从文档中取段落的实际样式
+        unstyled = [
+            block["para_idx"] for block in errors
+            if block["para_idx"] >= 0 and block["style_name"] is None
+            and any(detail["category"] not in ("节格式", "节") for detail in block["details"])
+        ]
+        style_names = _paragraph_style_names(doc_path, unstyled) if unstyled and doc_path is not None else {}
+        for block in errors:
+            para_idx = block["para_idx"]
+            style_name = block["style_name"]
+            if style_name is None:
+                style_name = style_names.get(para_idx)
+            rules = checker.get_effective_rules(style_name) if para_idx >= 0 else {}
+            text_rule_keys = self._text_fix_map(style_name, rules) if para_idx >= 0 else {}
+            details = getattr(block, "raw_details", None)
+            if details is None:
+                details = block["details"]
+            for detail in details:
+                rule_key = detail["rule"]
+                if para_idx < 0 or detail["category"] in ("节格式", "节"):
+                    self.unfixable[rule_key] += 1
+                    continue
+                entry = self.paragraphs.get(para_idx)
+                if entry is None:
+                    entry = self.paragraphs[para_idx] = (style_name, rules, set(), {}, {})
+                if "run_idx" in detail and rule_key in RUN_FIXERS and rules.get(RUN_FIXERS[rule_key][0]) is not None:
+                    entry[3].setdefault(detail["run_idx"], set()).add(rule_key)
+                elif "run_idx" not in detail and rule_key in PARAGRAPH_FIXERS and rules.get(rule_key) is not None:
+                    entry[2].add(rule_key)
+                elif rule_key in text_rule_keys and detail.get("location"):
+                    entry[4].setdefault(rule_key, []).append(tuple(detail["location"]))
+                else:
+                    self.unfixable[rule_key] += 1
+
+    def _text_fix_map(self, style_name, rules):
+        """{文本 rule 名: (正则, 分组, 替换文本)}，按样式缓存。"""
+        fix_map = self._text_fixes.get(style_name)
+        if fix_map is None:
+            fix_map = {}
+            for rule in self.checker.registry.rules(SCOPE_TEXT):
+                if rule.applies(rules):
+                    for rule_key, pattern, group, replacement in rule.fixes(rules):
+                        fix_map[rule_key] = (pattern, group, replacement)
+            self._text_fixes[style_name] = fix_map
+        return fix_map
+
+    def apply(self, root):
+        """在 document.xml 的根元素上应用修正，返回 {rule: 修正次数}。"""
+        fixed = Counter()
+        body = root.find(_w("body"))
+        if body is None:
+            return fixed
+        for para_idx, p in enumerate(body.iterchildren(_w("p"))):
+            entry = self.paragraphs.get(para_idx)
+            if entry is None:
+                continue
+            style_name, rules, paragraph_keys, run_keys, text_keys = entry
+            if paragraph_keys:
+                pPr = _properties(p, _w("pPr"))
+                for rule_key in sorted(paragraph_keys):
+                    if PARAGRAPH_FIXERS[rule_key](pPr, rules[rule_key]) is not False:
+                        fixed[rule_key] += 1
+            if run_keys:
+                runs = list(p.iterchildren(_w("r")))
+                for run_idx, keys in run_keys.items():
+                    if run_idx >= len(runs):
+                        continue
+                    rPr = _properties(runs[run_idx], _w("rPr"))
+                    for rule_key in sorted(keys):
+                        rules_key, fixer = RUN_FIXERS[rule_key]
+                        fixer(rPr, rules[rules_key])
+                        fixed[rule_key] += 1
+            if text_keys:
+                fix_map = self._text_fixes[style_name]
+                edits = _fix_text(p, [fix_map[rule_key] + (locations,)
+                                      for rule_key, locations in sorted(text_keys.items())])
+                if edits:
+                    fixed["内容间距"] += edits
+        return fixed
+
+
+def write_fixed_package(doc_path, out_path, plan):
+    """复制 doc_path 的所有部件到 out_path，document.xml 换成修正后的内容。返回修正计数。"""
+    from lxml import etree
+
+    with zipfile.ZipFile(doc_path) as source:
+        root = etree.fromstring(source.read(DOCUMENT_PART))
+        fixed = plan.apply(root)
+        document_xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+        tmp_path = out_path + ".tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                data = document_xml if info.filename == DOCUMENT_PART else source.read(info)
+                target.writestr(info, data)
+    os.replace(tmp_path, out_path)
+    return fixed
+
+
+def fix_document(doc_path, out_path, checker=None):
+    """检查并修正一个文档，返回 {"fixed": Counter, "unfixable": Counter, "findings": 问题数}。"""
+    if checker is None:
+        from checking import FormatChecker
+        from rules import DEFAULT_RULES
+
+        checker = FormatChecker(DEFAULT_RULES)
+    errors = checker.check_document(doc_path)
+    if any(block["para_idx"] == -1 for block in errors):
+        raise ValueError(f"无法打开文档 '{doc_path}'")
+    plan = FixPlan(checker, errors, doc_path)
+    fixed = write_fixed_package(doc_path, out_path, plan)
+    return {
+        "fixed": fixed,
+        "unfixable": plan.unfixable,
+        "findings": sum(len(block["details"]) for block in errors),
+    }
+
+
+def default_out_path(doc_path, out_dir=None):
+    stem, ext = os.path.splitext(os.path.basename(doc_path))
+    return os.path.join(out_dir or os.path.dirname(doc_path), f"{stem}.fixed{ext or '.docx'}")
+
+
+_worker_checker = None
+
+
+def _fix_one(task):
+    """进程池中修正一个文档，每个进程复用一个 FormatChecker。"""
+    global _worker_checker
+    doc_path, out_path = task
+    if _worker_checker is None:
+        from checking import FormatChecker
+        from rules import DEFAULT_RULES
+
+        _worker_checker = FormatChecker(DEFAULT_RULES)
+    started = time.perf_counter()
+    try:
+        result = fix_document(doc_path, out_path, _worker_checker)
+    except Exception as e:
+        logging.warning(f"修正 '{doc_path}' 失败: {e}")
+        return doc_path, out_path, None, time.perf_counter() - started
+    return doc_path, out_path, result, time.perf_counter() - started
+
+
+def fix_many(doc_paths, out_dir=None, processes=1):
+    """批量修正，逐个产出 (原文件, 输出文件, fix_document 的结果或失败时 None, 耗时)。"""
+    tasks = [(path, default_out_path(path, out_dir)) for path in doc_paths]
+    if processes <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _fix_one(task)
+        return
+    import multiprocessing
+
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(_fix_one, tasks)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="自动修正可以机械修正的格式问题，写出新的 .docx")
+    parser.add_argument("doc_paths", nargs="+", help="待修正的 .docx 文件")
+    parser.add_argument("-o", "--output", default=None, help="输出路径（只有一个输入文件时可用）")
+    parser.add_argument("--out-dir", default=None, help="输出目录，默认与输入文件相同，文件名加 .fixed")
+    parser.add_argument("--processes", type=int, default=1, help="并行修正的进程数")
+    parser.add_argument("--verify", action="store_true", help="修正后重新检查输出文件，报告剩余问题数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    if args.output and len(args.doc_paths) > 1:
+        parser.error("-o 只能用于单个输入文件，多个文件请用 --out-dir")
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    if args.output:
+        started = time.perf_counter()
+        try:
+            result = fix_document(args.doc_paths[0], args.output)
+        except Exception as e:
+            print(f"修正 '{args.doc_paths[0]}' 失败: {e}")
+            return 1
+        results = [(args.doc_paths[0], args.output, result, time.perf_counter() - started)]
+    else:
+        results = fix_many(args.doc_paths, args.out_dir, args.processes)
+
+    failed = 0
+    total_fixed = Counter()
+    total_unfixable = Counter()
+    started = time.perf_counter()
+    for doc_path, out_path, result, elapsed in results:
+        if result is None:
+            failed += 1
+            print(f"{doc_path}: 修正失败")
+            continue
+        total_fixed.update(result["fixed"])
+        total_unfixable.update(result["unfixable"])
+        line = (f"{doc_path} -> {out_path}: {result['findings']} 个问题，修正 {sum(result['fixed'].values())} 处，"
+                f"未修正 {sum(result['unfixable'].values())} 个，用时 {elapsed:.2f} 秒")
+        if args.verify:
+            from checking import FormatChecker
+            from rules import DEFAULT_RULES
+
+            remaining = FormatChecker(DEFAULT_RULES).check_document(out_path)
+            line += f"；修正后剩余 {sum(len(block['details']) for block in remaining)} 个问题"
+        print(line)
+
+    if len(args.doc_paths) > 1:
+        print(f"\n共 {len(args.doc_paths)} 个文档，失败 {failed} 个，用时 {time.perf_counter() - started:.1f} 秒")
+    if total_fixed:
+        print("修正：" + "，".join(f"{rule} {count}" for rule, count in total_fixed.most_common()))
+    if total_unfixable:
+        print("未修正：" + "，".join(f"{rule} {count}" for rule, count in total_unfixable.most_common()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+规则检查耗时基准：通用检查路径与按样式生成的专用检查函数（codegen.py）对比。
+
+文档先完整解析一次（段落和 run 的所有有效格式属性都已缓存），之后只计时规则比较本身，
+两条路径各重复若干次取最小值，并确认两者得到的错误完全相同：
+
+    python bench_checks.py test.docx
+    python bench_checks.py test.docx --repeat 20 --output bench_output.txt
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+
+def load_resolved_paragraphs(doc_path):
+    """打开文档并解析全部段落属性，返回 ResolvedParagraph 列表。"""
+    from lazy_package import open_document
+    from resolved import ResolvedParagraph
+    from snapshot import PARAGRAPH_PROPERTIES, RUN_PROPERTIES
+
+    doc = open_document(doc_path)
+    paragraphs = [ResolvedParagraph(p, p_idx, doc) for p_idx, p in enumerate(doc.paragraphs)]
+    for p in paragraphs:
+        for name in ("text", "style_name") + PARAGRAPH_PROPERTIES:
+            getattr(p, name)
+        for run in p.runs:
+            for name in RUN_PROPERTIES + ("fonts", "has_chinese", "has_western"):
+                getattr(run, name)
+    return paragraphs
+
+
+def time_checker(checker, paragraphs, repeat):
+    best = None
+    for _ in range(repeat):
+        checker.start_check()
+        started = time.perf_counter()
+        for p in paragraphs:
+            checker.check_resolved_paragraph(p)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, checker.errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比通用检查路径与生成的专用检查函数的耗时")
+    parser.add_argument("doc_path", help="用于基准测试的 .docx 文件")
+    parser.add_argument("--repeat", type=int, default=10, help="每条路径重复次数，取最小值")
+    parser.add_argument("--output", default=None, help="同时把结果写入该文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.ERROR)
+
+    from checking import FormatChecker
+    from rules import DEFAULT_RULES
+
+    paragraphs = load_resolved_paragraphs(args.doc_path)
+    generic = FormatChecker(DEFAULT_RULES, compile_checks=False)
+    compiled = FormatChecker(DEFAULT_RULES, compile_checks=True)
+    generic.warm_up()
+    compiled.warm_up()
+
+    generic_s, generic_errors = time_checker(generic, paragraphs, args.repeat)
+    compiled_s, compiled_errors = time_checker(compiled, paragraphs, args.repeat)
+
+    same = json.dumps(generic_errors, ensure_ascii=False, default=str) == json.dumps(
+        compiled_errors, ensure_ascii=False, default=str
+    )
+    lines = [
+        f"段落数           {len(paragraphs)}",
+        f"错误数           {sum(len(block['details']) for block in generic_errors)}",
+        f"通用路径         {generic_s * 1000:8.2f} ms",
+        f"生成的检查函数   {compiled_s * 1000:8.2f} ms",
+        f"加速比           {generic_s / compiled_s:8.2f}x" if compiled_s else "加速比           -",
+        f"结果一致         {'是' if same else '否'}",
+    ]
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
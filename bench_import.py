@@ -0,0 +1,99 @@
+"""
+冷启动导入耗时基准。
+
+用 `python -X importtime` 运行几个不需要打开文档的入口（导入 checking、--help、
+--check-rules），统计导入总耗时，并确认 python-docx / lxml / tangled_up_in_unicode
+没有被导入。任一场景超出预算或导入了重量级模块时以非零状态退出，可直接放进 CI：
+
+    python bench_import.py
+    python bench_import.py --repeat 10 --output bench_output.txt
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 这些入口都不应触发的重量级模块
+FORBIDDEN_MODULES = ("docx", "lxml", "tangled_up_in_unicode")
+
+# 场景名 -> (python 参数, 导入耗时预算，毫秒)
+# 预算包含解释器自身的 site/encodings 等导入，留有足够余量以免在慢机器上误报
+SCENARIOS = {
+    "import checking": (["-c", "import checking"], 60),
+    "checking.py --help": (["checking.py", "--help"], 80),
+    "checking.py --check-rules": (["checking.py", "--check-rules"], 80),
+    "client.py --help": (["client.py", "--help"], 60),
+}
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出，返回 (顶层模块累计耗时之和(微秒), 已导入模块名集合)。
+    每行格式为 "import time: self [us] | cumulative | <缩进>模块名"。
+    """
+    total_us = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # 表头
+        cumulative = int(parts[1])
+        name_field = parts[2]
+        name = name_field.strip()
+        modules.add(name.split(".")[0])
+        # 顶层模块的名字前只有一个空格，嵌套导入会继续缩进
+        if len(name_field) - len(name_field.lstrip(" ")) == 1:
+            total_us += cumulative
+    return total_us, modules
+
+
+def run_scenario(args):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=PACKAGE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查 CLI 冷启动导入耗时是否退化")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景重复次数，取最小值")
+    parser.add_argument("--output", default=None, help="同时把结果写入该文件")
+    args = parser.parse_args(argv)
+
+    lines = []
+    failed = False
+    for name, (scenario_args, budget_ms) in SCENARIOS.items():
+        best_us = None
+        imported = set()
+        for _ in range(args.repeat):
+            total_us, modules = run_scenario(scenario_args)
+            imported |= modules
+            best_us = total_us if best_us is None else min(best_us, total_us)
+
+        heavy = sorted(set(FORBIDDEN_MODULES) & imported)
+        over_budget = best_us / 1000 > budget_ms
+        status = "FAIL" if heavy or over_budget else "ok"
+        failed = failed or status == "FAIL"
+        line = f"{status:4} {name:28} {best_us / 1000:8.1f} ms (预算 {budget_ms} ms)"
+        if heavy:
+            line += f"  导入了重量级模块: {', '.join(heavy)}"
+        lines.append(line)
+
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+内存预算基准：用 python-docx 生成几种大文档，在 tracemalloc 下检查并输出报告，
+统计整个检查和各阶段（见 memory_usage.py）每个段落的内存峰值。先检查只有一个段落的文档
+得到固定开销（styles.xml、规则集等），各项扣除固定开销后再按段落数平均，
+因此每段落的数值与文档大小无关。任一场景超出预算时以非零状态退出，可直接放进 CI：
+
+    python bench_memory.py
+    python bench_memory.py --scale 2 --output bench_memory.txt
+    python -m pytest tests/test_memory_budget.py     # 同样的场景和预算
+
+tracemalloc 只统计 Python 对象，lxml 解析树的内存不在其中（见 memory_usage.py）；
+tracemalloc 会让检查慢好几倍，默认规模的几个场景共需一两分钟。
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+
+# 场景名 -> (段落数, 每段 run 数, 每段落预算（KB）：{"total": 整个检查的峰值, 阶段名: 该阶段的峰值增量})
+# 预算约为实测值的 1.5 到 2 倍；逐段流式检查时 check 阶段每段落的峰值不应随文档变大而增长
+SCENARIOS = {
+    "正文段落": (240, 2, {"total": 64, "load": 4, "resolve": 2, "check": 8, "render": 48}),
+    "多 run 段落": (24, 40, {"total": 640, "load": 8, "resolve": 2, "check": 64, "render": 560}),
+}
+
+_TEXT = "这是第{}段正文，包含English单词和数字123 （ 括号 ）以及  多余的空格。"
+
+
+def build_document(path, paragraphs, runs_per_paragraph):
+    """生成测试文档：每 20 段一个一级标题，其余为正文；正文中有中英文间距、全角括号和多余空格。"""
+    import docx
+
+    document = docx.Document()
+    for p_idx in range(paragraphs):
+        if p_idx % 20 == 0:
+            document.add_paragraph(f"第{p_idx // 20 + 1}章 测试", style="Heading 1")
+            continue
+        paragraph = document.add_paragraph()
+        text = _TEXT.format(p_idx)
+        for r_idx in range(runs_per_paragraph):
+            run = paragraph.add_run(text if r_idx == 0 else f"补充{r_idx} run ")
+            run.bold = r_idx % 7 == 3
+    document.save(path)
+
+
+def measure(doc_path, html_path):
+    """在 tracemalloc 下检查并生成 HTML 报告，返回 (检查结果, {"total": 整个过程的峰值, 阶段名: 峰值增量})。"""
+    from checking import FormatChecker, preload
+    from rules import DEFAULT_RULES
+
+    preload()
+    checker = FormatChecker(DEFAULT_RULES, memory_accounting=True)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        errors = checker.check_document(doc_path)
+        # generate_html_report 会输出"HTML报告已生成"
+        with checker.memory_phase("render"), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            checker.generate_html_report(html_path)
+    finally:
+        tracemalloc.stop()
+    phases = errors.memory or {}
+    # 各阶段开始时都会 reset_peak，整个过程的峰值取各阶段总量峰值的最大值
+    peaks = {"total": max((entry["traced_peak_bytes"] for entry in phases.values()), default=base) - base}
+    peaks.update((phase, entry["peak_bytes"]) for phase, entry in phases.items())
+    return errors, peaks
+
+
+def measure_fixed(tmp_dir):
+    """只有一个段落的文档的峰值，即与段落数无关的固定开销。"""
+    doc_path = os.path.join(tmp_dir, "bench.docx")
+    build_document(doc_path, 1, 1)
+    return measure(doc_path, os.path.join(tmp_dir, "bench.html"))[1]
+
+
+def measure_scenario(tmp_dir, name, fixed, scale=1.0):
+    """
+    生成并检查一个场景的文档，返回 (段落数, 检查结果, {键: 扣除固定开销后每段落的峰值 KB}, [超出预算的键])。
+    """
+    paragraphs, runs_per_paragraph, budgets_kb = SCENARIOS[name]
+    paragraphs = max(1, int(paragraphs * scale))
+    doc_path = os.path.join(tmp_dir, "bench.docx")
+    build_document(doc_path, paragraphs, runs_per_paragraph)
+    errors, peaks = measure(doc_path, os.path.join(tmp_dir, "bench.html"))
+    measured_kb = {key: max(0, peak - fixed.get(key, 0)) / paragraphs / 1024 for key, peak in peaks.items()}
+    over = [key for key, budget in budgets_kb.items() if measured_kb.get(key, 0.0) > budget]
+    return paragraphs, errors, measured_kb, over
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查每个段落的内存峰值是否超出预算")
+    parser.add_argument("--scale", type=float, default=1.0, help="按这个倍数放大各场景的段落数")
+    parser.add_argument("--output", default=None, help="同时把结果写入该文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.ERROR)
+
+    lines = []
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fixed = measure_fixed(tmp_dir)
+        for name, (_, runs_per_paragraph, budgets_kb) in SCENARIOS.items():
+            paragraphs, errors, measured_kb, over = measure_scenario(tmp_dir, name, fixed, args.scale)
+            if errors and errors[0]["para_idx"] == -1:
+                lines.append(f"FAIL {name}: 无法检查生成的文档: {errors[0]['details'][0]['actual']}")
+                failed = True
+                continue
+
+            status = "FAIL" if over else "ok"
+            failed = failed or bool(over)
+            lines.append(f"{status:4} {name}（{paragraphs} 段，每段 {runs_per_paragraph} 个 run，"
+                         f"{errors.findings} 个问题）每段落峰值 KB：")
+            for key, budget in budgets_kb.items():
+                mark = "  超出预算" if key in over else ""
+                lines.append(f"       {key:<8} {measured_kb.get(key, 0.0):8.1f} (预算 {budget}){mark}")
+    fixed_kb = "，".join(f"{key} {value / 1024:.0f}" for key, value in fixed.items())
+    lines.append(f"固定开销 KB：{fixed_kb}")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
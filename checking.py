@@ -1,28 +1,144 @@
-from rules import *
-from utils import is_cjk_char, is_latin_char, is_punctuation, get_effective_run_fonts
-
-from docx import Document
-from docx.shared import Pt, Cm
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
-from docx.document import Document as DocObject  # For type hinting
-from docx.styles.style import _ParagraphStyle  # For type hinting
+from registry import DEFAULT_REGISTRY, ParagraphContext, RuleTimings, SectionContext
+from registry import SCOPE_PARAGRAPH, SCOPE_RUN, SCOPE_SECTION, SCOPE_TEXT
+
+from result import CheckResult, ErrorBlock, run_text_of, snippet_of
+from result import STOP_MAX_ERRORS, STOP_MAX_ERRORS_PER_RULE, STOP_TIME_BUDGET, STOP_CANCELLED
+
+import contextlib
 import logging
-import re
 import sys
 import html
-from font import get_effective_font_property
-from paragraph import get_effective_first_line_indent, get_effective_alignment,get_effective_line_spacing_rule, get_effective_line_spacing
+import time
+
+# python-docx、lxml 和 tangled_up_in_unicode 导入很慢，只在真正打开文档时才导入
+# (lazy_package / font / paragraph / utils)，这样 --help、规则校验和缓存命中都不需要它们。
+
 
-logging.basicConfig(
-    format="{levelname} - {message}", style="{", level=logging.INFO
-)
+def preload():
+    """提前导入检查文档所需的重量级模块（供常驻进程启动时调用）。"""
+    import docx  # noqa: F401
+    import font  # noqa: F401
+    import lazy_package  # noqa: F401
+    import paragraph  # noqa: F401
+    import utils  # noqa: F401
+
+
+class ConsoleColors:
+    HEADER = '\033[95m'; BLUE = '\033[94m'; GREEN = '\033[92m'
+    WARNING = '\033[93m'; FAIL = '\033[91m'; ENDC = '\033[0m'
+    BOLD = '\033[1m'; UNDERLINE = '\033[4m'; GREY = '\033[90m'
+    HIGHLIGHT_CHAR = '\033[1;31;43m' # Bold, Red text, Yellow background
+
+
+HTML_REPORT_HEAD = """
+        <html><head><meta charset='UTF-8'><title>格式检查报告</title>
+        <style>
+            body { font-family: 'Segoe UI', Arial, sans-serif; margin: 20px; background-color: #f4f4f4; color: #333; }
+            h1 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
+            .document-error { background-color: #e74c3c; color: white; padding: 15px; margin-bottom: 20px; border-radius: 5px; }
+            .paragraph-errors { margin-bottom: 25px; border: 1px solid #bdc3c7; border-radius: 5px; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+            .paragraph-header { font-size: 1.3em; font-weight: bold; margin-bottom: 15px; color: #3498db; padding: 10px 15px; background-color: #ecf0f1; border-bottom: 1px solid #bdc3c7; border-top-left-radius: 5px; border-top-right-radius: 5px;}
+            .paragraph-header .style-name { font-weight: normal; color: #7f8c8d; font-size: 0.9em; }
+            .paragraph-header .snippet { font-weight: normal; font-style: italic; color: #555; font-size: 0.9em; display: block; margin-top: 5px;}
+            table { width: 100%; border-collapse: collapse; margin-top: 0px; }
+            th, td { border-bottom: 1px solid #ddd; padding: 12px 15px; text-align: left; font-size: 0.95em; vertical-align: top;}
+            th { background-color: #f8f9fa; color: #34495e; font-weight: 600;}
+            tr:last-child td { border-bottom: none; }
+            /* tr:hover { background-color: #f1f1f1; } */
+            .error-category { font-weight: 500; color: #8e44ad; }
+            .error-rule { color: #7f8c8d; }
+            .expected { color: #27ae60; font-weight: 500; }
+            .actual { color: #c0392b; font-weight: 500; }
+            .run-info { font-size: 0.85em; color: #95a5a6; }
+            .group-count { font-weight: bold; color: #c0392b; }
+            .char-highlight { background-color: #f1c40f; color: #c0392b; font-weight: bold; padding: 0.1em 0; border-radius: 0.2em;}
+            .context-snippet { font-family: 'Courier New', Courier, monospace; font-size: 0.9em; color: #555; display: block; margin-top: 5px; white-space: pre-wrap; word-break: break-all;}
+        </style>
+        </head><body><h1>格式检查报告</h1>
+        """
+HTML_REPORT_TAIL = "</body></html>"
 
 
 class FormatChecker:
-    def __init__(self, rules):
-        self.rules = rules
-        self.errors = []
+    def __init__(
+        self,
+        rules,
+        aggregator=None,
+        compile_checks=True,
+        registry=None,
+        skip_expensive_after_failure=False,
+        rule_timing=False,
+        paragraph_timing=False,
+        memory_accounting=False,
+    ):
+        from compiled_rules import CompiledRules
+
+        # 传入 compiled_rules.CompiledRules 时继承链已展开并校验过，见 _resolve_effective_rules
+        self.compiled_rules = rules if isinstance(rules, CompiledRules) else None
+        self.rules = rules.rules if self.compiled_rules is not None else rules
+        rules = self.rules
+        self.errors = CheckResult()
+        # check_document 的提前结束条件，见 _reset_limits
+        self._reset_limits()
+        # para_idx -> self.errors 中对应的错误块，避免每条错误都线性查找
+        self._error_blocks = {}
+        # 设置 aggregate.FindingAggregator 后，段落错误只做聚合，不再逐条保存
+        self.aggregator = aggregator
         self.default_style_name = self._find_default_style_name()
+        # 样式名 -> 合并后的有效规则，规则集不变时可在多次检查之间复用
+        self._effective_rules_cache = {}
+        # 为 True 时段落格式和字体检查使用按样式生成的专用函数（见 codegen.py）
+        self.compile_checks = compile_checks
+        # 样式名 -> 生成的检查函数，与 _effective_rules_cache 一样随检查器复用
+        self._compiled_checks = {}
+        # 段落、run、文本和节的规则都来自规则注册表（见 registry.py）
+        self.registry = registry if registry is not None else DEFAULT_REGISTRY
+        # 样式名 -> registry.RulePlan，注册表改变（registry.version 变化）后在下一次检查开始时清空
+        self._rule_plans = {}
+        self._registry_version = self.registry.version
+        # 为 True 时，段落已有 cheap / moderate 规则报错就跳过 expensive（正则）规则
+        self.skip_expensive_after_failure = skip_expensive_after_failure
+        # 记录每条规则的耗时，见 print_rule_timings
+        self.rule_timings = RuleTimings() if rule_timing else None
+        # 记录每个段落的耗时、run 数和正则匹配数，见 paragraph_profile.py 和 print_hot_paragraphs
+        self.paragraph_timings = None
+        if paragraph_timing:
+            from paragraph_profile import ParagraphTimings
+
+            self.paragraph_timings = ParagraphTimings()
+        # 为 True 时用 tracemalloc 统计 check_document 各阶段的内存峰值（较慢），
+        # 为 "rss" 时只记录进程最大常驻内存，见 memory_usage.py
+        self.memory_accounting = memory_accounting
+        # 当前检查的 memory_usage.MemoryPhases
+        self._memory = None
+        # 生成的函数不能跳过规则或逐条计时，这些情况下走注册表；
+        # 是否注册了自定义规则在每次使用时判断，见 _use_compiled_checks
+        self._compiled_checks_allowed = compile_checks and not skip_expensive_after_failure and not rule_timing
+        # 不为 None 时，_add_error 把每条错误的参数追加到这个列表（见 watch.py 的增量检查）
+        self._finding_recorder = None
+        # 规则集的 "cross_paragraph" 分组对应的跨段落规则（见 window.py），在同一次遍历中运行
+        self._window_runner = None
+        if rules.get("cross_paragraph"):
+            from window import WindowRunner, build_window_rules, make_reporter
+
+            window_rules = build_window_rules(rules["cross_paragraph"])
+            if window_rules:
+                self._window_runner = WindowRunner(window_rules, make_reporter(self))
+
+    @property
+    def _use_compiled_checks(self):
+        # 生成的函数只覆盖内置规则，构造检查器之后才注册的规则也要走注册表
+        return self._compiled_checks_allowed and not self.registry.customized
+
+    def warm_up(self):
+        """预先计算规则集中所有样式的有效规则（供常驻进程启动时调用）。"""
+        for style_name in self.rules["paragraph"]:
+            self.get_effective_rules(style_name)
+        for style_name in ("Normal", "正文"):
+            self.get_effective_rules(style_name)
+        if self._use_compiled_checks:
+            for style_name in self._effective_rules_cache:
+                self.get_compiled_check(style_name)
 
     def _find_default_style_name(self):
         for name, style_rules in self.rules["paragraph"].items():
@@ -34,6 +150,15 @@ class FormatChecker:
             return "Normal"
         return None
 
+    def _reset_limits(self, max_errors=None, max_errors_per_rule=None):
+        self._max_errors = max_errors
+        self._max_errors_per_rule = max_errors_per_rule
+        self._finding_count = 0
+        self._rule_finding_counts = {}
+        self._stop_reason = None
+        self._stop_detail = None
+        self._dropped_after_stop = 0
+
     def _add_error(
         self,
         para_idx,
@@ -48,22 +173,53 @@ class FormatChecker:
         run_text_snippet_for_detail=None,
         error_char_location=None,
     ):
-        para_error_block = None
-        for block in self.errors:
-            if block["para_idx"] == para_idx:
-                para_error_block = block
-                break
+        if self._finding_recorder is not None:
+            self._finding_recorder.append((
+                style_name, paragraph_main_snippet, full_paragraph_text, error_category, rule_key,
+                expected, actual, run_idx, run_text_snippet_for_detail, error_char_location,
+            ))
+        if self._stop_reason is not None:
+            # 已触发提前结束，当前段落剩余的错误不再记录
+            self._dropped_after_stop += 1
+            return
+        self._finding_count += 1
+        if self._max_errors is not None and self._finding_count >= self._max_errors:
+            self._stop_reason = STOP_MAX_ERRORS
+            self._stop_detail = f"{self._max_errors} 个"
+        if self._max_errors_per_rule is not None:
+            rule_count = self._rule_finding_counts.get(rule_key, 0) + 1
+            self._rule_finding_counts[rule_key] = rule_count
+            if rule_count >= self._max_errors_per_rule and self._stop_reason is None:
+                self._stop_reason = STOP_MAX_ERRORS_PER_RULE
+                self._stop_detail = f"{rule_key}: {self._max_errors_per_rule} 个"
+
+        if self.aggregator is not None:
+            self.aggregator.add(
+                para_idx,
+                style_name,
+                error_category,
+                rule_key,
+                expected,
+                actual,
+                full_text=full_paragraph_text,
+                run_idx=run_idx,
+                run_text=run_text_snippet_for_detail,
+                location=error_char_location,
+            )
+            return
+
+        para_error_block = self._error_blocks.get(para_idx)
 
         if para_error_block is None:
-            para_error_block = {
-                "para_idx": para_idx,
-                "style_name": style_name,
-                "paragraph_text_snippet": paragraph_main_snippet,
-                "full_text": full_paragraph_text,
-                "details": [],
-            }
+            para_error_block = self._new_error_block(
+                para_idx, style_name, paragraph_main_snippet, full_paragraph_text
+            )
+            self._error_blocks[para_idx] = para_error_block
+            # 段落通常按顺序检查，只有乱序到达时才需要重新排序
+            needs_sort = bool(self.errors) and self.errors[-1]["para_idx"] > para_idx
             self.errors.append(para_error_block)
-            self.errors.sort(key=lambda x: x["para_idx"])
+            if needs_sort:
+                self.errors.sort(key=lambda x: x["para_idx"])
 
         error_item = {
             "category": error_category,
@@ -73,14 +229,22 @@ class FormatChecker:
         }
         if run_idx is not None:
             error_item["run_idx"] = run_idx
-            error_item["run_text"] = (
-                run_text_snippet_for_detail if run_text_snippet_for_detail else ""
-            )
+            run_text = run_text_snippet_for_detail if run_text_snippet_for_detail else ""
+            # 能由 location 从段落文本中截出的 run_text 不保存，见 ErrorBlock
+            if not (
+                error_char_location
+                and isinstance(para_error_block, ErrorBlock)
+                and run_text_of(para_error_block.full_text, error_char_location) == run_text
+            ):
+                error_item["run_text"] = run_text
 
         if error_char_location:
             error_item["location"] = error_char_location
 
-        para_error_block["details"].append(error_item)
+        if isinstance(para_error_block, ErrorBlock):
+            para_error_block.raw_details.append(error_item)
+        else:
+            para_error_block["details"].append(error_item)
 
         # log_msg_for_debug = (
         #     f"Para {para_idx+1} (Style: '{style_name}', Snippet: '{paragraph_main_snippet[:20]}...') - "
@@ -94,20 +258,26 @@ class FormatChecker:
         #     log_msg_for_debug += f", Location: {error_char_location}"
         # logging.debug(f"Adding structured error: {log_msg_for_debug}")
 
-    def _get_effective_format_value(
-        self, direct_format, style_format, attribute_name, default_value
-    ):
-        """
-        获取有效的格式值。
-        首先检查直接格式，然后检查样式格式，最后使用默认值。
-        """
-        value = getattr(direct_format, attribute_name, None)
-        if value is None and style_format:
-            value = getattr(style_format, attribute_name, None)
+    def replay_findings(self, para_idx, records):
+        """重放 _finding_recorder 记录的错误参数（见 watch.py 的增量检查和 planner.py 的并行检查）。"""
+        add_error = self._add_error
+        for record in records:
+            add_error(para_idx, *record[:7], run_idx=record[7], run_text_snippet_for_detail=record[8],
+                      error_char_location=record[9])
 
-        if value is None:
-            return default_value
-        return value
+    def _new_error_block(self, para_idx, style_name, snippet, full_text):
+        if full_text is None:
+            return {
+                "para_idx": para_idx,
+                "style_name": style_name,
+                "paragraph_text_snippet": snippet,
+                "full_text": full_text,
+                "details": [],
+            }
+        # 摘要通常是段落文本的开头，这时只记长度
+        snippet_spec = len(snippet) if snippet == snippet_of(full_text, len(snippet)) else snippet
+        texts = self.errors.texts
+        return ErrorBlock(para_idx, style_name, texts, texts.add(full_text), snippet_spec)
 
     def _get_first_line_location(self, paragraph_text):
         """获取段落首行索引"""
@@ -123,34 +293,55 @@ class FormatChecker:
     def get_effective_rules(self, style_name_or_obj):
         """
         获取指定样式的有效规则，处理 based_on 继承和全局默认。
+        结果按样式名缓存，调用方不应修改返回的字典。
         """
+        style_name = ""
+        if isinstance(style_name_or_obj, str):
+            style_name = style_name_or_obj
+        elif style_name_or_obj is not None:
+            style_name = style_name_or_obj.name  # ParagraphStyle
+
+        cached = self._effective_rules_cache.get(style_name)
+        if cached is None:
+            cached = self._resolve_effective_rules(style_name)
+            self._effective_rules_cache[style_name] = cached
+        return cached
+
+    def get_compiled_check(self, style_name):
+        """样式对应的专用检查函数，第一次使用时生成并缓存。"""
+        check = self._compiled_checks.get(style_name)
+        if check is None:
+            from codegen import compile_style_check
+
+            check = compile_style_check(self.get_effective_rules(style_name), style_name)
+            self._compiled_checks[style_name] = check
+        return check
+
+    def _resolve_effective_rules(self, style_name):
         # 1. 从全局字体和间距规则开始
         effective_rules = {}
         effective_rules.update(self.rules.get("fonts", {}))
         effective_rules.update(self.rules.get("spacing", {}))
         effective_rules.update(self.rules.get("section", {}))
 
-        style_name = ""
-        if isinstance(style_name_or_obj, str):
-            style_name = style_name_or_obj
-        elif isinstance(style_name_or_obj, _ParagraphStyle):
-            style_name = style_name_or_obj.name
-
         # 尝试获取特定样式规则，如果找不到，并且是Word的"Normal"（正文）样式，则使用配置中的默认样式
         style_to_check = self.rules["paragraph"].get(style_name)
         if not style_to_check and style_name in ["Normal", "正文"] and self.default_style_name:
             style_to_check = self.rules["paragraph"].get(
                 self.default_style_name)
             if style_to_check:
-                logging.info(f"Style '{style_name}' not in rules, using default style '{
-                             self.default_style_name}' for checking.")
+                logging.info(f"Style '{style_name}' not in rules, using default style "
+                             f"'{self.default_style_name}' for checking.")
                 style_name = self.default_style_name  # 更新style_name为实际使用的规则名
 
         if not style_to_check:
-            logging.warning(f"Style '{
-                            style_name}' not found in DEFAULT_RULES['paragraph'] and no default mapping applied.")
+            logging.warning(f"Style '{style_name}' not found in "
+                            "DEFAULT_RULES['paragraph'] and no default mapping applied.")
             return effective_rules  # 只返回全局规则
 
+        if self.compiled_rules is not None:
+            return dict(self.compiled_rules.effective_rules(style_name))
+
         # 2. 处理 based_on 继承链
         style_chain = []
         current_name = style_name
@@ -169,653 +360,440 @@ class FormatChecker:
 
         return effective_rules
 
+    def get_rule_plan(self, style_name):
+        """样式名 -> registry.RulePlan（适用的规则按开销排序），与有效规则一样缓存。"""
+        plan = self._rule_plans.get(style_name)
+        if plan is None:
+            plan = self._rule_plans[style_name] = self.registry.plan(self.get_effective_rules(style_name))
+        return plan
+
+    def _run_scope(self, scope, p, p_idx, effective_rules, style_name):
+        plan = self.registry.plan(effective_rules, scopes=(scope,))
+        plan.run(ParagraphContext(self, p, p_idx, style_name, effective_rules), timings=self.rule_timings)
+
     def check_paragraph_formatting(self, p, p_idx, effective_rules, style_name):
-        para_text_snippet = p.text[:30].replace("\n", " ")
-        # highlighting context
-        full_para_text = p.text
-        first_line_loc = self._get_first_line_location(full_para_text)
-        direct_fmt = p.paragraph_format
-        style_p_fmt = (
-            p.style.paragraph_format if p.style else None
-        )  # 获取段落样式的格式
-
-        # 调试输出，可以保留或删除
-        # print(f"--- 段落 {p_idx} ({para_text_snippet}) ---")
-        # print(f"直接格式行距: {direct_fmt.line_spacing}, 规则: {direct_fmt.line_spacing_rule}")
-        # if style_p_fmt:
-        #     print(f"样式格式行距: {style_p_fmt.line_spacing}, 规则: {style_p_fmt.line_spacing_rule}")
-        # else:
-        #     print("无样式格式对象")
-        # return
-
-        if "alignment" in effective_rules:
-            # actual_alignment = self._get_effective_format_value(
-            #     direct_fmt, style_p_fmt, "alignment", WD_ALIGN_PARAGRAPH.LEFT
-            # )
-            actual_alignment = get_effective_alignment(p)
-            if actual_alignment != effective_rules["alignment"]:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "alignment",
-                    WD_ALIGN_PARAGRAPH(effective_rules["alignment"]).name,
-                    (
-                        WD_ALIGN_PARAGRAPH(actual_alignment).name
-                        if actual_alignment is not None
-                        else "None"
-                    ),
-                    error_char_location=first_line_loc
-                )
+        """p 为 resolved.ResolvedParagraph。只运行 paragraph 作用范围的规则。"""
+        self._run_scope(SCOPE_PARAGRAPH, p, p_idx, effective_rules, style_name)
 
-        if "first_line_indent_pt" in effective_rules:
-            expected_indent = effective_rules["first_line_indent_pt"]
-            # actual_indent_raw = self._get_effective_format_value(
-            #     direct_fmt, style_p_fmt, "first_line_indent", 0
-            # )
-            # actual_indent_emu = (
-            #     actual_indent_raw.pt if actual_indent_raw is not None and actual_indent_raw != 0 else 0
-            # )  # 确保是数值
-            actual_indent_raw = get_effective_first_line_indent(p)
-            actual_indent = actual_indent_raw if actual_indent_raw is not None else 0
-
-            if abs(actual_indent - expected_indent) > PT_TOLERANCE:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "first_line_indent_pt",
-                    f"{effective_rules['first_line_indent_pt']:.2f} pt",
-                    f"{actual_indent:.2f} pt",
-                    error_char_location=first_line_loc
-                )
+    def check_font_rules_for_paragraph(
+        self, p, p_idx, effective_rules, style_name
+    ):
+        """p 为 resolved.ResolvedParagraph，其 runs 已带有段内位置和有效字体属性。只运行 run 作用范围的规则。"""
+        self._run_scope(SCOPE_RUN, p, p_idx, effective_rules, style_name)
 
-        # 行间距规则
-        actual_ls_rule = None
-        if "line_spacing_rule" in effective_rules:
-            # actual_ls_rule = self._get_effective_format_value(
-            #     direct_fmt,
-            #     style_p_fmt,
-            #     "line_spacing_rule",
-            #     WD_LINE_SPACING.SINGLE,  # 默认单倍行距
-            # )
-            actual_ls_rule = get_effective_line_spacing_rule(p)
-            if actual_ls_rule != effective_rules["line_spacing_rule"]:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "line_spacing_rule",
-                    WD_LINE_SPACING(effective_rules["line_spacing_rule"]).name,
-                    (
-                        WD_LINE_SPACING(actual_ls_rule).name
-                        if actual_ls_rule is not None
-                        else "None"
-                    ),
-                    error_char_location=first_line_loc
-                )
+    def check_spacing_rules_for_paragraph(self, p, p_idx, effective_rules, style_name):
+        """只运行 text 作用范围的规则（内容间距）。"""
+        self._run_scope(SCOPE_TEXT, p, p_idx, effective_rules, style_name)
 
-        # 行间距值 (仅当规则匹配或规则允许自定义值时检查)
-        if (
-            "line_spacing_value" in effective_rules
-            and actual_ls_rule
-            == effective_rules.get(
-                "line_spacing_rule"
-            )  # 确保规则是我们期望检查值的规则
-            and effective_rules["line_spacing_rule"]
-            in [
-                WD_LINE_SPACING.MULTIPLE,
-                WD_LINE_SPACING.AT_LEAST,
-                WD_LINE_SPACING.EXACTLY,
-            ]
-        ):
+    def check_document(
+        self,
+        doc_path,
+        max_errors=None,
+        max_errors_per_rule=None,
+        time_budget_s=None,
+        cancel_event=None,
+        snapshot_dir=None,
+        plan=None,
+    ):
+        """
+        检查文档，返回 CheckResult（按段落组织的错误列表）。
 
-            expected_val = float(effective_rules["line_spacing_value"])
-            # 对于行距值，如果规则是 SINGLE, DOUBLE, ONE_POINT_FIVE，其 line_spacing 属性可能为 None 或特定值 (如 1.0, 2.0, 1.5)
-            # 当规则是 MULTIPLE, AT_LEAST, EXACTLY 时，line_spacing 存储的是 Pt 值 (对于 MULTIPLE，是浮点数)
-
-            # actual_val_raw = self._get_effective_format_value(
-            #     direct_fmt, style_p_fmt, "line_spacing", None  # 先获取原始值
-            # )
-
-            # actual_val = 0.0  # 默认值
-            # if actual_val_raw is not None:
-            #     if effective_rules["line_spacing_rule"] == WD_LINE_SPACING.MULTIPLE:
-            #         # python-docx 对于多倍行距，line_spacing 直接返回浮点数 (例如 1.5 代表1.5倍行距)
-            #         actual_val = (
-            #             float(actual_val_raw / 127000)
-            #             if isinstance(actual_val_raw, int) and actual_val_raw > 200
-            #             else float(actual_val_raw)
-            #         )
-            #     elif effective_rules["line_spacing_rule"] in [
-            #         WD_LINE_SPACING.AT_LEAST,
-            #         WD_LINE_SPACING.EXACTLY,
-            #     ]:
-            #         # 对于 AT_LEAST 和 EXACTLY，line_spacing 返回的是 EMU，需要转换为 Pt
-            #         actual_val = (
-            #             Pt(actual_val_raw).pt
-            #             if isinstance(actual_val_raw, int)
-            #             else float(actual_val_raw)
-            #         )  # 假设如果不是int，已经是Pt
-            #     else:  # 其他情况（SINGLE, DOUBLE, ONE_POINT_FIVE），line_spacing 可能不是我们期望的数值比较对象
-            #         actual_val = (
-            #             float(actual_val_raw) if actual_val_raw is not None else 1.0
-            #         )  # 默认给个值避免比较错误
-            actual_val_raw = get_effective_line_spacing(p)
-            actual_val = actual_val_raw if actual_val_raw is not None else 1.0
-
-            if abs(actual_val - expected_val) > PT_TOLERANCE:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "line_spacing_value",
-                    f"{expected_val:.2f}",
-                    f"{actual_val:.2f}",
-                    error_char_location=first_line_loc
-                )
+        doc_path 可以是文件路径，也可以是内存中的文档内容：bytes / bytearray /
+        memoryview / mmap 或文件对象（见 source.open_source），不需要先写临时文件。
 
-        if "space_before_pt" in effective_rules:
-            expected_pt_val = effective_rules["space_before_pt"]
-            space_before_obj = self._get_effective_format_value(
-                direct_fmt, style_p_fmt, "space_before", None
-            )
-            actual_pt = space_before_obj.pt if space_before_obj is not None else 0
-
-            if abs(actual_pt - expected_pt_val) > PT_TOLERANCE:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "space_before_pt",
-                    f"{expected_pt_val:.1f} pt",
-                    f"{actual_pt:.1f} pt",
-                    error_char_location=first_line_loc
-                )
+        以下参数用于快速分诊，任一条件满足即停止检查，结果标记为 partial：
+        max_errors:          记录到这么多个错误后停止
+        max_errors_per_rule: 任一规则记录到这么多个错误后停止
+        time_budget_s:       检查耗时超过这么多秒后停止（在段落之间检查）
+        cancel_event:        带 is_set() 的对象（如 threading.Event），被设置后停止
 
-        if "space_after_pt" in effective_rules:
-            expected_pt_val = effective_rules["space_after_pt"]
-            space_after_obj = self._get_effective_format_value(
-                direct_fmt, style_p_fmt, "space_after", None
-            )
-            actual_pt = space_after_obj.pt if space_after_obj is not None else 0
-
-            if abs(actual_pt - expected_pt_val) > PT_TOLERANCE:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "space_after_pt",
-                    f"{expected_pt_val:.1f} pt",
-                    f"{actual_pt:.1f} pt",
-                    error_char_location=first_line_loc
-                )
+        snapshot_dir: 解析结果快照目录（见 snapshot.py），只对文件路径生效。
+                      命中时直接读取快照，不打开 docx；未命中时解析全部段落并写入快照。
 
-        if "keep_with_next" in effective_rules:
-            actual_kwn = self._get_effective_format_value(
-                direct_fmt,
-                style_p_fmt,
-                "keep_with_next",
-                False,  # Word 默认可能是 False
-            )
-            if actual_kwn != effective_rules["keep_with_next"]:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "keep_with_next",
-                    effective_rules["keep_with_next"],
-                    actual_kwn,
-                    error_char_location=first_line_loc
-                )
+        plan: 执行计划（见 planner.py）。"auto" / "serial" / "parallel" 时先预扫描文档再决定，
+              也可以传入 plan_document 得到的 ExecutionPlan；为 None 时按原来的方式串行检查。
+              使用计划时结果的 plan 属性记录所选的计划和预计耗时。
 
-        if "keep_together" in effective_rules:
-            actual_kt = self._get_effective_format_value(
-                direct_fmt, style_p_fmt, "keep_together", False  # Word 默认可能是 False
+        memory_accounting=True 时结果的 memory 属性记录各阶段的内存峰值（见 memory_usage.py）。
+        """
+        if isinstance(plan, str):
+            plan = self.plan_document(
+                doc_path, plan, max_errors=max_errors, max_errors_per_rule=max_errors_per_rule,
+                time_budget_s=time_budget_s, cancel_event=cancel_event, snapshot_dir=snapshot_dir,
             )
-            if actual_kt != effective_rules["keep_together"]:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "keep_together",
-                    effective_rules["keep_together"],
-                    actual_kt,
-                    error_char_location=first_line_loc
+        self._memory = None
+        tracing = contextlib.nullcontext()
+        if self.memory_accounting:
+            from memory_usage import MemoryPhases
+
+            # 重量级模块（尤其是 tangled_up_in_unicode 的数据表）在 tracemalloc 下导入极慢，
+            # 也不属于文档占用的内存，先在开启统计之前导入
+            preload()
+            self._memory = MemoryPhases(trace=self.memory_accounting != "rss")
+            tracing = self._memory.tracing()
+
+        compiled_checks_allowed = self._compiled_checks_allowed
+        if plan is not None:
+            self._compiled_checks_allowed = compiled_checks_allowed and plan.compile_checks
+        try:
+            with tracing:
+                result = self._check_document(
+                    doc_path, max_errors, max_errors_per_rule, time_budget_s, cancel_event, snapshot_dir, plan
                 )
+        finally:
+            self._compiled_checks_allowed = compiled_checks_allowed
+        if plan is not None:
+            result.plan = plan.as_dict()
+        if self._memory is not None:
+            result.memory = self._memory.phases
+        return result
+
+    def memory_phase(self, name):
+        """
+        统计一个阶段的内存（需要 memory_accounting=True），记在 self.errors.memory 中；
+        例如 with checker.memory_phase("render"): checker.generate_html_report(...)。
+        """
+        if not self.memory_accounting:
+            return contextlib.nullcontext()
+        if self._memory is None:
+            from memory_usage import MemoryPhases
 
-        if "widow_control" in effective_rules:
-            # Word 的默认 widow_control 通常是 True (如果样式中未指定)
-            # python-docx 未显式设置时可能返回 None
-            actual_wc = self._get_effective_format_value(
-                direct_fmt,
-                style_p_fmt,
-                "widow_control",
-                True,
-            )
-            
-            actual_wc_for_comparison = actual_wc if actual_wc is not None else False
-
-            if actual_wc_for_comparison != effective_rules["widow_control"]:
-                self._add_error(
-                    p_idx,
-                    style_name,
-                    para_text_snippet,
-                    full_para_text,
-                    "段落格式",
-                    "widow_control",
-                    effective_rules["widow_control"],
-                    actual_wc_for_comparison,
-                    error_char_location=first_line_loc
-                )
+            self._memory = MemoryPhases(trace=self.memory_accounting != "rss")
+            self.errors.memory = self._memory.phases
+        return self._memory.phase(name)
 
-    def check_font_rules_for_paragraph(
-        self, p, p_idx, effective_rules, style_name, doc
+    def plan_document(
+        self,
+        doc_path,
+        mode="auto",
+        workers=None,
+        max_errors=None,
+        max_errors_per_rule=None,
+        time_budget_s=None,
+        cancel_event=None,
+        snapshot_dir=None,
     ):
-        paragraph_main_snippet = p.text[:30].replace("\n", " ")
-        # paragraph_main_snippet = p.text.replace("\n", " ")
-        full_para_text = p.text
-        current_char_offset_in_para = 0
-
-
-        for r_idx, run in enumerate(p.runs):
-            run_text = run.text
-            run_len = len(run_text)
-            run_start_offset_in_para = current_char_offset_in_para
-            run_end_offset_in_para = run_start_offset_in_para + run_len
-            
-            # run 在当前段落的位置
-            run_loc_in_para = [run_start_offset_in_para, run_end_offset_in_para]
-
-            if not run_text.strip():
-                current_char_offset_in_para += run_len
-                continue
-
-            
-            # print(f"DEBUG::, {run_text}, {run.font.size} {run.style.font.size} {get_effective_font_property(p, run, "size")}")
-            # print(f"DEBUG::, {run_text}, {run.font.italic} {run.style.font.italic} {get_effective_font_property(p, run, "italic")}")
-            # print(f"DEBUG::, {run_text}, {run.font.italic} {run.style.font.italic} {get_effective_font_property(p, run, "name")}")
-            # continue
-            run_text_snippet_detail = run.text[:20].replace("\n", " ")
-            font = run.font
-
-            if "font_size_pt" in effective_rules:
-                expected_size_val = effective_rules["font_size_pt"]
-                # actual_size = (
-                #     font.size.pt if font.size is not None else 0
-                # )
-                # if (
-                #     actual_size == 0 and p.style.font.size
-                # ):  # 如果 run 的字体大小字段为 0/None，检查段落样式字体大小
-                #     actual_size = p.style.font.size.pt
-                actual_size = get_effective_font_property(p, run, "size")
-
-                if abs(actual_size - expected_size_val) > PT_TOLERANCE:
-                    self._add_error(
-                        p_idx,
-                        style_name,
-                        paragraph_main_snippet,
-                        full_para_text,
-                        "字体",
-                        "font_size_pt",
-                        f"{expected_size_val:.1f} pt",
-                        f"{actual_size:.1f} pt",
-                        run_idx=r_idx,
-                        run_text_snippet_for_detail=run_text_snippet_detail,
-                        error_char_location=run_loc_in_para
-                    )
+        """预扫描文档，按本检查器的设置和 check_document 的参数选择执行计划（planner.ExecutionPlan）。"""
+        import os
+
+        from planner import plan_check, scan_source
+
+        blockers = []
+        if not isinstance(doc_path, (str, os.PathLike)):
+            blockers.append("文档不是文件路径，工作进程无法打开，串行检查")
+        if any(limit is not None for limit in (max_errors, max_errors_per_rule, time_budget_s, cancel_event)):
+            blockers.append("设置了提前结束条件，需要按顺序检查，串行检查")
+        if snapshot_dir is not None:
+            blockers.append("需要写入解析快照，串行检查")
+        if self.registry.customized:
+            blockers.append("使用了自定义规则注册表，工作进程无法重建，串行检查")
+        if self.rule_timings is not None:
+            blockers.append("需要逐条规则计时，串行检查")
+        if self.paragraph_timings is not None:
+            blockers.append("需要逐段计时，串行检查")
+        if self.memory_accounting:
+            blockers.append("需要统计内存，串行检查")
+        return plan_check(
+            scan_source(doc_path),
+            mode,
+            workers,
+            parallel_allowed=not blockers,
+            compile_allowed=self._use_compiled_checks,
+            keep_paragraphs=snapshot_dir is not None,
+            blockers=blockers,
+        )
 
-            if "font_bold" in effective_rules:
-                # actual_bold = (
-                #     font.bold
-                #     if font.bold is not None
-                #     else (p.style.font.bold if p.style.font else False)
-                # )
-                actual_bold = get_effective_font_property(p, run, "bold")
-                if actual_bold != effective_rules["font_bold"]:
-                    self._add_error(
-                        p_idx,
-                        style_name,
-                        paragraph_main_snippet,
-                        full_para_text,
-                        "字体",
-                        "font_bold",
-                        effective_rules["font_bold"],
-                        actual_bold,
-                        run_idx=r_idx,
-                        run_text_snippet_for_detail=run_text_snippet_detail,
-                        error_char_location=run_loc_in_para
-                    )
+    def _check_document(
+        self,
+        doc_path,
+        max_errors=None,
+        max_errors_per_rule=None,
+        time_budget_s=None,
+        cancel_event=None,
+        snapshot_dir=None,
+        plan=None,
+    ):
+        import os
 
-            if "font_italic" in effective_rules:
-                # actual_italic = (
-                #     font.italic
-                #     if font.italic is not None
-                #     else (p.style.font.italic if p.style.font else False)
-                # )  # Check style if None
-                actual_italic = get_effective_font_property(p, run, "italic")
-                if actual_italic != effective_rules["font_italic"]:
-                    self._add_error(
-                        p_idx,
-                        style_name,
-                        paragraph_main_snippet,
-                        full_para_text,
-                        "字体",
-                        "font_italic",
-                        effective_rules["font_italic"],
-                        actual_italic,
-                        run_idx=r_idx,
-                        run_text_snippet_for_detail=run_text_snippet_detail,
-                        error_char_location=run_loc_in_para
-                    )
+        from lazy_package import open_document
+        from resolved import ResolvedParagraph, resolve_sections
+        from preflight import check_package
+        from source import open_source
 
-            run_text = run.text
-            is_chinese_dominant = bool(re.search(RE_CHINESE, run_text))
-            is_western_dominant = bool(re.search(RE_WESTERN, run_text))
-            # is_number_dominant = bool(re.search(RE_NUMBER, run_text)) # RE_NUMBER might be too broad if it includes western numbers
-
-            target_font_key = None
-            target_font_value = None
-            font_to_check_actual = None
-
-            effective_run_fonts = get_effective_run_fonts(run, p, doc)
-
-            if is_chinese_dominant and "chinese_font" in effective_rules:
-                target_font_key = "chinese_font"
-                target_font_value = effective_rules["chinese_font"]
-                font_to_check_actual = effective_run_fonts.get("eastAsia")
-            elif (
-                is_western_dominant or (not is_chinese_dominant and run_text.strip())
-            ) and "western_font" in effective_rules:
-                target_font_key = "western_font"
-                target_font_value = effective_rules["western_font"]
-                font_to_check_actual = effective_run_fonts.get("ascii")
-                if font_to_check_actual is None:
-                    font_to_check_actual = effective_run_fonts.get("hAnsi")
-
-            # 既不是中文也不是英文则大概率是标点符号（不保证完整），目前暂时先不考虑
-            # if not target_font_key and "common_script_font" in effective_rules:
-            #     pass
-
-            if target_font_key and target_font_value:
-                if font_to_check_actual != target_font_value:
-                    normalized_actual = (
-                        font_to_check_actual.replace(" (正文)", "").replace(
-                            " (标题)", ""
-                        )
-                        if font_to_check_actual
-                        else None
-                    )
-                    normalized_expected = (
-                        target_font_value.replace(" (正文)", "").replace(" (标题)", "")
-                        if target_font_value
-                        else None
-                    )
-                    if normalized_actual != normalized_expected:
-                        self._add_error(
-                            p_idx,
-                            style_name,
-                            paragraph_main_snippet,
-                            full_para_text,
-                            "字体",
-                            target_font_key,
-                            target_font_value,
-                            font_to_check_actual,
-                            run_idx=r_idx,
-                            run_text_snippet_for_detail=run_text_snippet_detail,
-                            error_char_location=run_loc_in_para
-                        )
-            elif (
-                "western_font" in effective_rules
-                and not is_chinese_dominant
-                and run_text.strip()
-            ):  # Default check for western_font if no other dominant type matched.
-                # This is a broader fallback check if no specific script was dominant.
-                actual_font_name = effective_run_fonts.get(
-                    "ascii", effective_run_fonts.get("hAnsi")
-                )
-                if actual_font_name != effective_rules["western_font"]:
-                    self._add_error(
-                        p_idx,
-                        style_name,
-                        paragraph_main_snippet,
-                        full_para_text,
-                        "字体",
-                        "western_font (fallback)",
-                        effective_rules["western_font"],
-                        actual_font_name,
-                        run_idx=r_idx,
-                        run_text_snippet_for_detail=run_text_snippet_detail,
-                        error_char_location=run_loc_in_para
+        use_snapshot = (
+            snapshot_dir is not None
+            and isinstance(doc_path, (str, os.PathLike))
+            and os.path.isfile(doc_path)
+        )
+        if use_snapshot and self._snapshot_covers_rules():
+            from snapshot import open_snapshot
+
+            with self.memory_phase("load"):
+                cached_snapshot = open_snapshot(snapshot_dir, doc_path)
+            if cached_snapshot is not None:
+                logging.debug(f"使用快照 {cached_snapshot.path}")
+                with cached_snapshot, self.memory_phase("check"):
+                    return self.check_snapshot(
+                        cached_snapshot, max_errors, max_errors_per_rule, time_budget_s, cancel_event
                     )
-            current_char_offset_in_para += run_len
 
-    def check_spacing_rules_for_paragraph(self, p, p_idx, effective_rules, style_name):
-        text = p.text
-        paragraph_main_snippet = text[:50].replace("\n", " ")
-        # paragraph_main_snippet = text.replace("\n", " ")
-        error_category = "内容间距"
-
-        rule_cn_en = effective_rules.get("require_space_between_cn_en")
-        if rule_cn_en is not None:
-            if rule_cn_en is True: # 需要空格, 发现没有空格
-                for pat, desc in [(f"({RE_CHINESE})({RE_WESTERN})", "(中->英)"), (f"({RE_WESTERN})({RE_CHINESE})", "(英->中)")]:
-                    for match in re.finditer(pat, text):
-                        loc = [match.start(0), match.end(0)] # Highlight "好w"
-                        self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                        f"require_space_between_cn_en {desc}", "需要空格", "无空格", error_char_location=loc)
-            else: # 不需要空格，但是发现存在空格
-                for pat, desc in [(f"({RE_CHINESE})(\\s+)({RE_WESTERN})", "(中->英)"), (f"({RE_WESTERN})(\\s+)({RE_CHINESE})", "(英->中)")]:
-                    for match in re.finditer(pat, text):
-                        loc = [match.start(2), match.end(2)] # Highlight the space(s)
-                        self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                        f"require_space_between_cn_en {desc}", "不允许空格", "有空格", error_char_location=loc)
-
-
-        # Rule: require_space_between_cn_number
-        rule_cn_num = effective_rules.get("require_space_between_cn_number")
-        if rule_cn_num is not None:
-            if rule_cn_num is True:
-                for pat, desc in [(f"({RE_CHINESE})({RE_NUMBER})", "(中->数)"), (f"({RE_NUMBER})({RE_CHINESE})", "(数->中)")]:
-                    for match in re.finditer(pat, text):
-                        loc = [match.start(0), match.end(0)]
-                        self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                        f"require_space_between_cn_number {desc}", "需要空格", "无空格", error_char_location=loc)
-            else:
-                for pat, desc in [(f"({RE_CHINESE})(\\s+)({RE_NUMBER})", "(中->数)"), (f"({RE_NUMBER})(\\s+)({RE_CHINESE})", "(数->中)")]:
-                    for match in re.finditer(pat, text):
-                        loc = [match.start(2), match.end(2)]
-                        self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                        f"require_space_between_cn_number {desc}", "不允许空格", "有空格", error_char_location=loc)
-
-        # Rule: require_space_between_en_number (similar logic)
-        rule_en_num = effective_rules.get("require_space_between_en_number")
-        if rule_en_num is not None:
-            if rule_en_num is True:
-                for pat, desc in [(f"({RE_WESTERN})({RE_NUMBER})", "(英->数)"), (f"({RE_NUMBER})({RE_WESTERN})", "(数->英)")]:
-                    for match in re.finditer(pat, text):
-                        loc = [match.start(0), match.end(0)]
-                        self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                        f"require_space_between_en_number {desc}", "需要空格", "无空格", error_char_location=loc)
-            else:
-                for pat, desc in [(f"({RE_WESTERN})(\\s+)({RE_NUMBER})", "(英->数)"), (f"({RE_NUMBER})(\\s+)({RE_WESTERN})", "(数->英)")]:
-                    for match in re.finditer(pat, text):
-                        loc = [match.start(2), match.end(2)]
-                        self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                        f"require_space_between_en_number {desc}", "不允许空格", "有空格", error_char_location=loc)
-        
-        # Rule: space_after_chinese_punctuation
-        rule_after_cn_punct = effective_rules.get("space_after_chinese_punctuation")
-        if rule_after_cn_punct == "none":
-            pat = f"({RE_CHINESE_PUNCTUATION})(\\s+)"
-            for match in re.finditer(pat, text):
-                loc = [match.start(2), match.end(2)] # Highlight the space(s)
-                self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                "space_after_chinese_punctuation", "none (无空格)", "有空格", error_char_location=loc)
-
-        # Rule: no_space_around_full_width_brackets
-        rule_no_space_brackets = effective_rules.get("no_space_around_full_width_brackets")
-        if rule_no_space_brackets is True:
-            # Left bracket + space(s)
-            pat_left = f"({RE_FULL_WIDTH_BRACKETS_LEFT})(\\s+)"
-            for match in re.finditer(pat_left, text):
-                loc = [match.start(2), match.end(2)]
-                self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                "no_space_around_full_width_brackets (左括号后)", "括号内侧无空格", "有空格", error_char_location=loc)
-            # Space(s) + Right bracket
-            pat_right = f"(\\s+)({RE_FULL_WIDTH_BRACKETS_RIGHT})"
-            for match in re.finditer(pat_right, text):
-                loc = [match.start(1), match.end(1)]
-                self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                "no_space_around_full_width_brackets (右括号前)", "括号内侧无空格", "有空格", error_char_location=loc)
-
-        # Rule: no_space_after_full_width_punctuation_to_en_num
-        rule_no_space_punct_en_num = effective_rules.get("no_space_after_full_width_punctuation_to_en_num")
-        if rule_no_space_punct_en_num is True:
-            pat = f"({RE_CHINESE_PUNCTUATION})(\\s+)([{RE_WESTERN.strip('[]')}{RE_NUMBER.strip('[]')}])"
-            for match in re.finditer(pat, text):
-                loc = [match.start(2), match.end(2)] # Highlight the space(s)
-                self._add_error(p_idx, style_name, paragraph_main_snippet, text, error_category,
-                                "no_space_after_full_width_punctuation_to_en_num", "全角标点后接英文/数字时无空格", "有空格", error_char_location=loc)
-
-    def check_document(self, doc_path):
-        self.errors = []
+        started = time.perf_counter()
+        self.start_check(max_errors, max_errors_per_rule)
         try:
-            doc = Document(doc_path)
+            with self.memory_phase("load"), open_source(doc_path) as doc_file:
+                problem = check_package(doc_file)
+                if problem is None:
+                    doc = open_document(doc_file)
         except Exception as e:
-            # For this kind of error, we can't use the structured approach as it's a global doc error
-            # We can append a special error dict or just a string message
-            self.errors.append(
-                {
-                    "para_idx": -1,  # Special index for document-level errors
-                    "style_name": "N/A",
-                    "paragraph_text_snippet": f"无法打开或读取文档 '{doc_path}'",
-                    "details": [
-                        {
-                            "category": "文档读取",
-                            "rule": "文件访问",
-                            "expected": "成功读取",
-                            "actual": f"失败: {e}",
-                        }
-                    ],
-                }
-            )
+            self.add_document_error(doc_path, e)
+            self.errors.elapsed_s = time.perf_counter() - started
             return self.errors  # Return early
+        if problem is not None:
+            self.add_preflight_error(doc_path, problem)
+            self.errors.elapsed_s = time.perf_counter() - started
+            return self.errors
+
+        with self.memory_phase("resolve"):
+            section_margins = resolve_sections(doc)
+            paragraphs = doc.paragraphs
+            resolved_paragraphs = (ResolvedParagraph(p, p_idx, doc) for p_idx, p in enumerate(paragraphs))
+            if use_snapshot:
+                resolved_paragraphs = list(resolved_paragraphs)
+                self._store_snapshot(snapshot_dir, doc_path, section_margins, resolved_paragraphs)
+
+        with self.memory_phase("check"):
+            self.check_sections(section_margins)
+            if plan is not None and plan.parallel:
+                from planner import check_paragraphs_parallel
+
+                check_paragraphs_parallel(self, doc_path, doc, plan)
+            else:
+                self._check_paragraphs(resolved_paragraphs, len(paragraphs), started, time_budget_s, cancel_event)
+            return self.finish_check(started)
+
+    def _snapshot_covers_rules(self):
+        """规则需要的已解析属性（Rule.requires）是否都保存在快照中；不是时读原文档检查。"""
+        from snapshot import SNAPSHOT_PROPERTIES
+
+        missing = set()
+        # 每个样式的有效规则都包含全局规则
+        for style_name in self.rules["paragraph"]:
+            missing |= self.registry.required_properties(self.get_effective_rules(style_name))
+        missing -= SNAPSHOT_PROPERTIES
+        if missing:
+            logging.info(f"规则需要快照中没有的属性 {sorted(missing)}，不使用快照")
+        return not missing
+
+    def check_snapshot(
+        self,
+        document_snapshot,
+        max_errors=None,
+        max_errors_per_rule=None,
+        time_budget_s=None,
+        cancel_event=None,
+    ):
+        """按本检查器的规则集检查一个 snapshot.DocumentSnapshot，参数含义同 check_document。"""
+        started = time.perf_counter()
+        self.start_check(max_errors, max_errors_per_rule)
+        self.check_sections(document_snapshot.sections)
+        self._check_paragraphs(
+            document_snapshot.paragraphs, document_snapshot.paragraph_count,
+            started, time_budget_s, cancel_event,
+        )
+        return self.finish_check(started)
 
-        for i, section in enumerate(doc.sections):
-            left = section.left_margin.cm
-            right = section.right_margin.cm
-            top = section.top_margin.cm
-            bottom = section.bottom_margin.cm
-            expect_margin = self.rules.get("section")
-            expect_left = expect_margin.get("left_margin_cm")
-            expect_right = expect_margin.get("right_margin_cm")
-            expect_top = expect_margin.get("top_margin_cm")
-            expect_bottom = expect_margin.get("bottom_margin_cm")
-            if abs(left - expect_left) > CM_TOLERANCE:
-                self._add_error(
-                    0,
-                    None,
-                    None,
-                    None,
-                    "节格式",
-                    "页面大小",
-                    expect_left,
-                    left,
-                )
-            if abs(right - expect_right) > CM_TOLERANCE:
-                self._add_error(
-                    0,
-                    None,
-                    None,
-                    None,
-                    "节格式",
-                    "页面大小",
-                    expect_right,
-                    right,
-                )
-            if abs(top - expect_top) > CM_TOLERANCE:
-                self._add_error(
-                    0,
-                    None,
-                    None,
-                    None,
-                    "节",
-                    "页面大小",
-                    expect_top,
-                    top,
-                )
-            if abs(bottom - expect_bottom) > CM_TOLERANCE:
-                self._add_error(
-                    0,
-                    None,
-                    None,
-                    None,
-                    "节格式",
-                    "页面大小",
-                    expect_bottom,
-                    bottom,
-                )
+    def _store_snapshot(self, snapshot_dir, doc_path, section_margins, resolved_paragraphs):
+        import os
 
-        for p_idx, p in enumerate(doc.paragraphs):
-            if not p.text.strip() and not p.runs:
-                continue
+        from snapshot import snapshot_key, snapshot_path, write_snapshot
 
-            style_name = p.style.name
-            # print(f"样式名称：{style_name}")
+        try:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            write_snapshot(
+                snapshot_path(snapshot_dir, snapshot_key(doc_path)), section_margins, resolved_paragraphs
+            )
+        except OSError as e:
+            logging.warning(f"写入快照失败: {e}")
+
+    def _check_paragraphs(self, resolved_paragraphs, total, started, time_budget_s=None, cancel_event=None):
+        self.errors.paragraphs_total = total
+        for p in resolved_paragraphs:
+            self.errors.paragraphs_checked = p.index
+            if self.should_stop(started, time_budget_s, cancel_event):
+                break
+            if self.paragraph_timings is None:
+                self.check_resolved_paragraph(p)
+            else:
+                self._check_resolved_paragraph_timed(p)
+        else:
+            self.errors.paragraphs_checked = total
+
+    def _check_resolved_paragraph_timed(self, p):
+        """与 check_resolved_paragraph 相同，另外记录段落的耗时和错误（见 paragraph_profile.py）。"""
+        started = time.perf_counter()
+        if self._window_runner is not None:
+            self._window_runner.push(p)
+        # 跨段落规则的错误属于之前的段落，只记录本段落规则的错误
+        records = self._finding_recorder = []
+        try:
+            self.check_paragraph_rules(p)
+        finally:
+            self._finding_recorder = None
+        self.paragraph_timings.add(p, time.perf_counter() - started, records)
+
+    def start_check(self, max_errors=None, max_errors_per_rule=None):
+        """开始一次新的检查：清空上一次的结果并设置提前结束条件。"""
+        self.errors = CheckResult()
+        self._error_blocks = {}
+        self._reset_limits(max_errors, max_errors_per_rule)
+        if self._registry_version != self.registry.version:
+            self._registry_version = self.registry.version
+            self._rule_plans = {}
+        if self.aggregator is not None:
+            self.aggregator.reset()
+        if self._window_runner is not None:
+            self._window_runner.reset()
+        if self.paragraph_timings is not None:
+            self.paragraph_timings.reset()
+
+    def finish_check(self, started):
+        """结束检查，填写 CheckResult 的完成情况并返回它。"""
+        if self._window_runner is not None:
+            # 最后几个段落还在等待后续段落，文档结束时补做检查
+            self._window_runner.flush()
+        if (
+            self.errors.paragraphs_checked == self.errors.paragraphs_total
+            and self._dropped_after_stop == 0
+        ):
+            # 在最后一个错误上恰好达到上限时，结果仍然是完整的
+            self._stop_reason = None
+        if self._stop_reason is not None:
+            self.errors.mark_stopped(self._stop_reason, self._stop_detail)
+        self.errors.findings = self._finding_count
+        self.errors.elapsed_s = time.perf_counter() - started
+        return self.errors
 
-            # print(get_effective_line_spacing_rule(p))
-            # print(get_effective_alignment(p))
-            # print(get_effective_line_spacing(p))
-            # print(get_effective_first_line_indent(p))
-            effective_rules = self.get_effective_rules(p.style)
-            # continue
+    def add_document_error(self, doc_path, e):
+        self._add_document_level_error(doc_path, "文件访问", "成功读取", f"失败: {e}")
 
-            # 检查这个段落的样式是否在规则集中，如果没有则回退
-            is_style_explicitly_defined = style_name in self.rules["paragraph"] or (
-                style_name in ["Normal", "正文"]
-                and self.default_style_name in self.rules["paragraph"]
-            )
+    def add_preflight_error(self, doc_path, problem):
+        """problem 为 preflight.check_package 的结果。"""
+        self._add_document_level_error(doc_path, "文件类型", problem["expected"], problem["actual"], problem["code"])
 
-            if (
-                not is_style_explicitly_defined
-                and self.default_style_name != style_name
-                and style_name
-                not in self.rules["paragraph"]
-                .get(self.default_style_name, {})
-                .get("aliases", [])
-            ):
-                if p.text.strip():
-                    logging.info(
-                        f"提醒: 段落 {p_idx+1} 使用的样式 '{style_name}' 未在 DEFAULT_RULES 中明确定义，也未映射到默认样式。将仅应用全局规则（如有）。"
-                    )
+    def _add_document_level_error(self, doc_path, rule, expected, actual, code=None):
+        from source import describe_source
 
-            logging.debug(f"规则集：{effective_rules}")
-            if effective_rules:
-                self.check_paragraph_formatting(p, p_idx, effective_rules, style_name)
-                self.check_font_rules_for_paragraph(
-                    p, p_idx, effective_rules, style_name, doc
-                )
-                self.check_spacing_rules_for_paragraph(
-                    p, p_idx, effective_rules, style_name
+        # For this kind of error, we can't use the structured approach as it's a global doc error
+        # We can append a special error dict or just a string message
+        detail = {
+            "category": "文档读取",
+            "rule": rule,
+            "expected": expected,
+            "actual": actual,
+        }
+        if code is not None:
+            detail["code"] = code
+        self.errors.append(
+            {
+                "para_idx": -1,  # Special index for document-level errors
+                "style_name": "N/A",
+                "paragraph_text_snippet": f"无法打开或读取文档 '{describe_source(doc_path)}'",
+                "details": [detail],
+            }
+        )
+
+    def check_sections(self, section_margins):
+        """section_margins 为 resolved.resolve_sections 的结果。"""
+        expect_margin = self.rules.get("section") or {}
+        plan = self.registry.plan(expect_margin, scopes=(SCOPE_SECTION,))
+        ctx = SectionContext(self, expect_margin)
+        for margins in section_margins:
+            for rule in plan.rules:
+                rule.check(ctx, margins)
+
+    def check_resolved_paragraph(self, p):
+        """按本检查器的规则集检查一个 resolved.ResolvedParagraph。"""
+        if self._window_runner is not None:
+            # 空段落也要进入窗口（例如只包含图片的段落）
+            self._window_runner.push(p)
+        self.check_paragraph_rules(p)
+
+    def check_paragraph_rules(self, p):
+        """只运行单个段落的规则，不包括跨段落规则。"""
+        p_idx = p.index
+        if not p.text.strip() and not p.runs:
+            return
+
+        style_name = p.style_name
+        # print(f"样式名称：{style_name}")
+
+        effective_rules = self.get_effective_rules(style_name)
+
+        # 检查这个段落的样式是否在规则集中，如果没有则回退
+        is_style_explicitly_defined = style_name in self.rules["paragraph"] or (
+            style_name in ["Normal", "正文"]
+            and self.default_style_name in self.rules["paragraph"]
+        )
+
+        if (
+            not is_style_explicitly_defined
+            and self.default_style_name != style_name
+            and style_name
+            not in self.rules["paragraph"]
+            .get(self.default_style_name, {})
+            .get("aliases", [])
+        ):
+            if p.text.strip():
+                logging.info(
+                    f"提醒: 段落 {p_idx+1} 使用的样式 '{style_name}' 未在 DEFAULT_RULES 中明确定义，也未映射到默认样式。将仅应用全局规则（如有）。"
                 )
-        return self.errors
+
+        # 规则集很大，只在确实输出调试日志时才格式化
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"规则集：{effective_rules}")
+        if effective_rules:
+            if self._use_compiled_checks:
+                self.get_compiled_check(style_name)(self, p, p_idx, style_name)
+                return
+            self.get_rule_plan(style_name).run(
+                ParagraphContext(self, p, p_idx, style_name, effective_rules),
+                skip_expensive_after_failure=self.skip_expensive_after_failure,
+                timings=self.rule_timings,
+            )
+
+    def print_rule_timings(self):
+        """输出每条规则的调用次数、累计耗时、错误数和被跳过的次数（需要 rule_timing=True）。"""
+        if self.rule_timings is None:
+            return
+        print("\n--- 规则耗时 ---")
+        print(f"{'规则':<50} {'范围':<10} {'开销':<10} {'调用':>6} {'耗时(ms)':>8} {'错误':>6} {'跳过':>6}")
+        for name, entry in self.rule_timings.rows():
+            print(
+                f"{name:<52} {entry['scope']:<12} {entry['cost']:<12} {entry['calls']:>8} "
+                f"{entry['seconds'] * 1000:>10.2f} {entry['findings']:>8} {entry['skipped']:>8}"
+            )
+
+    def print_hot_paragraphs(self, limit=None):
+        """输出最慢的段落（需要 paragraph_timing=True）。"""
+        if self.paragraph_timings is None:
+            return
+        from paragraph_profile import format_hot_paragraphs
+
+        print("\n".join(format_hot_paragraphs(self.paragraph_timings, limit)))
+
+    @property
+    def stopped(self):
+        return self._stop_reason is not None
+
+    def should_stop(self, started, time_budget_s=None, cancel_event=None):
+        """段落循环中的协作式取消检查。"""
+        if self._stop_reason is None:
+            if cancel_event is not None and cancel_event.is_set():
+                self._stop_reason = STOP_CANCELLED
+            elif time_budget_s is not None and time.perf_counter() - started > time_budget_s:
+                self._stop_reason = STOP_TIME_BUDGET
+                self._stop_detail = f"{time_budget_s} 秒"
+        return self._stop_reason is not None
 
 
     def _generate_highlighted_html_snippet(self, full_text, location, context_chars=20):
@@ -882,33 +860,16 @@ class FormatChecker:
         return f"{ellipsis_start}{prefix}{highlighted_part_colored}{suffix}{ellipsis_end}"
 
 
+    def _partial_notice(self):
+        """检查提前结束时的说明文字；完整检查或结果来自缓存的普通列表时为空。"""
+        describe = getattr(self.errors, "describe", None)
+        return describe() if describe else ""
+
     def generate_html_report(self, filename="format_report.html"):
-        html_start = """
-        <html><head><meta charset='UTF-8'><title>格式检查报告</title>
-        <style>
-            body { font-family: 'Segoe UI', Arial, sans-serif; margin: 20px; background-color: #f4f4f4; color: #333; }
-            h1 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
-            .document-error { background-color: #e74c3c; color: white; padding: 15px; margin-bottom: 20px; border-radius: 5px; }
-            .paragraph-errors { margin-bottom: 25px; border: 1px solid #bdc3c7; border-radius: 5px; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
-            .paragraph-header { font-size: 1.3em; font-weight: bold; margin-bottom: 15px; color: #3498db; padding: 10px 15px; background-color: #ecf0f1; border-bottom: 1px solid #bdc3c7; border-top-left-radius: 5px; border-top-right-radius: 5px;}
-            .paragraph-header .style-name { font-weight: normal; color: #7f8c8d; font-size: 0.9em; }
-            .paragraph-header .snippet { font-weight: normal; font-style: italic; color: #555; font-size: 0.9em; display: block; margin-top: 5px;}
-            table { width: 100%; border-collapse: collapse; margin-top: 0px; }
-            th, td { border-bottom: 1px solid #ddd; padding: 12px 15px; text-align: left; font-size: 0.95em; vertical-align: top;}
-            th { background-color: #f8f9fa; color: #34495e; font-weight: 600;}
-            tr:last-child td { border-bottom: none; }
-            /* tr:hover { background-color: #f1f1f1; } */
-            .error-category { font-weight: 500; color: #8e44ad; }
-            .error-rule { color: #7f8c8d; }
-            .expected { color: #27ae60; font-weight: 500; }
-            .actual { color: #c0392b; font-weight: 500; }
-            .run-info { font-size: 0.85em; color: #95a5a6; }
-            .char-highlight { background-color: #f1c40f; color: #c0392b; font-weight: bold; padding: 0.1em 0; border-radius: 0.2em;}
-            .context-snippet { font-family: 'Courier New', Courier, monospace; font-size: 0.9em; color: #555; display: block; margin-top: 5px; white-space: pre-wrap; word-break: break-all;}
-        </style>
-        </head><body><h1>格式检查报告</h1>
-        """
-        html_end = "</body></html>"
+        html_start = HTML_REPORT_HEAD
+        if self._partial_notice():
+            html_start += f"<div class='document-error'>{html.escape(self._partial_notice())}</div>\n"
+        html_end = HTML_REPORT_TAIL
         report_body = ""
 
         doc_level_error_processed = False
@@ -977,102 +938,327 @@ class FormatChecker:
         except IOError as e:
             print(f"错误: 无法写入HTML报告文件 '{filename}'. 详细信息: {e}")
 
-    def print_structured_errors_to_console(self):
-        class Colors:
-            HEADER = '\033[95m'; BLUE = '\033[94m'; GREEN = '\033[92m'
-            WARNING = '\033[93m'; FAIL = '\033[91m'; ENDC = '\033[0m'
-            BOLD = '\033[1m'; UNDERLINE = '\033[4m'; GREY = '\033[90m'
-            HIGHLIGHT_CHAR = '\033[1;31;43m' # Bold, Red text, Yellow background
+    def generate_interactive_html_report(self, filename="format_report.html"):
+        """生成内嵌压缩数据、虚拟滚动的交互式 HTML 报告，见 interactive_report.py。"""
+        import interactive_report
 
+        try:
+            size = interactive_report.write_report(self.errors, filename, self._partial_notice())
+            print(f"\nHTML报告已生成: {filename} ({size / 1024:.0f} KB)")
+        except IOError as e:
+            print(f"错误: 无法写入HTML报告文件 '{filename}'. 详细信息: {e}")
+
+    def print_structured_errors_to_console(self, finding_filter=None, top=None, page=None, page_size=50, pager=False):
+        """逐条输出错误，参数见 console_report.ConsoleReport.detail。"""
+        from console_report import ConsoleReport
+
+        report = ConsoleReport(self, finding_filter)
+        report.detail(top=top, page=page, page_size=page_size)
+        report.flush(pager)
+
+    def print_error_summary_to_console(self, finding_filter=None, limit=10, pager=False):
+        """一屏的汇总：各规则、样式、类别的错误数。"""
+        from console_report import ConsoleReport
+
+        report = ConsoleReport(self, finding_filter)
+        report.summary(limit)
+        report.flush(pager)
+
+    def print_grouped_errors_to_console(self):
+        """按 self.aggregator 中的分组输出，每组一条，附带计数和示例位置。"""
+        Colors = ConsoleColors
         is_tty = hasattr(sys.stdout, 'isatty') and sys.stdout.isatty()
         def colorize(text, color_code):
             return f"{color_code}{text}{Colors.ENDC}" if is_tty else text
-        
-        if not self.errors:
+
+        groups = self.aggregator.groups() if self.aggregator is not None else []
+        if self._partial_notice():
+            print(f"\n{colorize(self._partial_notice(), Colors.WARNING + Colors.BOLD)}")
+        if not groups:
             print("\n--- 控制台输出：未发现格式问题 (基于当前规则) ---")
             return
 
-        print("\n--- 文档格式检查发现以下问题 (控制台详细输出) ---")
-        for para_error_block in self.errors:
-            if para_error_block['para_idx'] == -1:
-                continue
+        print(f"\n--- 文档格式检查共发现 {self.aggregator.total} 个问题，归并为 {len(groups)} 组 ---")
+        if self.aggregator.dropped:
+            print(f"    (另有 {self.aggregator.dropped} 个问题超出单条规则/单个段落的上限，未计入)")
+        for i, group in enumerate(groups):
+            title = f"▼ {i + 1}. [{group['category']}] {group['rule']}"
+            count = f"x{group['count']}"
+            print(f"\n{colorize(title, Colors.BOLD + Colors.HEADER)} {colorize(count, Colors.FAIL + Colors.BOLD)}")
+            print(f"  {colorize('样式:', Colors.BLUE)} '{group['style_name']}'，涉及 {group['paragraph_count']} 个段落")
+            print(f"  {colorize('期望:', Colors.GREEN)} {group['expected']}")
+            print(f"  {colorize('实际:', Colors.FAIL)} {group['actual']}")
+            for sample in group["samples"]:
+                location_info = f"段落 {sample['para_idx'] + 1}"
+                if "run_idx" in sample:
+                    location_info += f", Run {sample['run_idx'] + 1}"
+                line = f"    {colorize('示例:', Colors.GREY)} {location_info}"
+                if sample.get("location"):
+                    line += " " + self._generate_highlighted_console_snippet(
+                        sample["full_text"], sample["location"], is_tty=is_tty, colors_class=Colors
+                    )
+                print(line)
+            omitted = group["count"] - len(group["samples"])
+            if omitted > 0:
+                print(f"    {colorize(f'... 其余 {omitted} 处省略', Colors.GREY)}")
+
+    def generate_grouped_html_report(self, filename="format_report.html"):
+        """按 self.aggregator 中的分组生成 HTML 报告，每组一行。"""
+        groups = self.aggregator.groups() if self.aggregator is not None else []
+        parts = [HTML_REPORT_HEAD]
+        if self._partial_notice():
+            parts.append(f"<div class='document-error'>{html.escape(self._partial_notice())}</div>\n")
+        for block in self.errors:
+            if block["para_idx"] == -1:
+                for err in block["details"]:
+                    parts.append(f"<div class='document-error'>{html.escape(block['paragraph_text_snippet'])}: "
+                                 f"{html.escape(str(err['actual']))}</div>\n")
+        if not groups:
+            parts.append("<p>未发现格式问题。</p>")
+        else:
+            parts.append(f"<p>共发现 {self.aggregator.total} 个问题，归并为 {len(groups)} 组。")
+            if self.aggregator.dropped:
+                parts.append(f" 另有 {self.aggregator.dropped} 个问题超出上限未计入。")
+            parts.append("</p>\n<div class='paragraph-errors'>\n  <table>\n")
+            parts.append("    <tr><th>次数</th><th>样式</th><th>类别</th><th>规则</th><th>期望值</th><th>实际值</th><th>示例位置/高亮</th></tr>\n")
+            for group in groups:
+                samples_html = []
+                for sample in group["samples"]:
+                    location_info = f"段落 {sample['para_idx'] + 1}"
+                    if "run_idx" in sample:
+                        location_info += f", Run {sample['run_idx'] + 1}"
+                    sample_html = f"<span class='run-info'>{location_info}</span>"
+                    if sample.get("location"):
+                        snippet_html = self._generate_highlighted_html_snippet(sample["full_text"], sample["location"])
+                        sample_html += f"<span class='context-snippet'>{snippet_html}</span>"
+                    samples_html.append(sample_html)
+                omitted = group["count"] - len(group["samples"])
+                if omitted > 0:
+                    samples_html.append(f"<span class='run-info'>... 其余 {omitted} 处省略</span>")
+                parts.append(
+                    f"    <tr>\n"
+                    f"      <td><span class='group-count'>{group['count']}</span></td>\n"
+                    f"      <td>{html.escape(str(group['style_name']))}</td>\n"
+                    f"      <td><span class='error-category'>{group['category']}</span></td>\n"
+                    f"      <td><span class='error-rule'>{group['rule']}</span></td>\n"
+                    f"      <td><span class='expected'>{html.escape(group['expected'])}</span></td>\n"
+                    f"      <td><span class='actual'>{html.escape(group['actual'])}</span></td>\n"
+                    f"      <td>{'<br>'.join(samples_html)}</td>\n"
+                    f"    </tr>\n"
+                )
+            parts.append("  </table>\n</div>\n")
+        parts.append(HTML_REPORT_TAIL)
+        try:
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("".join(parts))
+            print(f"\nHTML报告已生成: {filename}")
+        except IOError as e:
+            print(f"错误: 无法写入HTML报告文件 '{filename}'. 详细信息: {e}")
 
-            para_idx = para_error_block['para_idx']
-            style_name = para_error_block['style_name']
-            snippet = para_error_block['paragraph_text_snippet']
-            full_para_text = para_error_block['full_text']
 
+def main(argv=None):
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="按 rules.py 中的规则集检查 docx 文档格式")
+    parser.add_argument("doc_path", nargs="?", default="test.docx", help="待检查的 .docx 文件")
+    parser.add_argument("--html", dest="html_report", default="format_checker_report.html",
+                        help="HTML 报告输出路径")
+    parser.add_argument("--report-format", choices=("table", "interactive"), default="table",
+                        help="HTML 报告格式：table 每条错误一行；interactive 内嵌压缩数据，可过滤，适合错误很多的文档")
+    parser.add_argument("--check-rules", action="store_true", help="只校验规则集，不检查文档")
+    parser.add_argument("--rules", default=None,
+                        help="规则集：.json / .toml 文件或 模块[:变量]，编译后使用（见 compiled_rules.py）；默认 rules.py")
+    parser.add_argument("--rules-cache", default=None, help="已编译规则的缓存目录")
+    parser.add_argument("--cross-paragraph", action="store_true",
+                        help="规则集没有 cross_paragraph 分组时启用 rules.py 中默认的跨段落规则（标题编号、图题、参考文献编号）")
+    parser.add_argument("--cache-dir", default=None, help="检查结果缓存目录，命中时跳过文档解析")
+    parser.add_argument("--snapshot-dir", default=None,
+                        help="解析结果快照目录，修改规则后重复检查同一文档时跳过 docx 解析")
+    parser.add_argument("--group", action="store_true", help="把相同的错误归并成分组输出")
+    parser.add_argument("--max-samples", type=int, default=5, help="分组模式下每组保留的示例位置数")
+    parser.add_argument("--max-per-rule", type=int, default=None, help="分组模式下每条规则最多计入的错误数")
+    parser.add_argument("--max-per-paragraph", type=int, default=None, help="分组模式下每个段落最多计入的错误数")
+    parser.add_argument("--max-errors", type=int, default=None, help="发现这么多个错误后停止检查")
+    parser.add_argument("--max-errors-per-rule", type=int, default=None, help="任一规则发现这么多个错误后停止检查")
+    parser.add_argument("--time-budget", type=float, default=None, help="检查耗时超过这么多秒后停止")
+    parser.add_argument("--skip-expensive", action="store_true",
+                        help="段落已有格式或字体错误时跳过内容间距（正则）检查，结果不完整")
+    parser.add_argument("--rule-timing", action="store_true", help="检查结束后输出每条规则的耗时")
+    parser.add_argument("--memory", nargs="?", choices=("trace", "rss"), const="trace", default=None,
+                        help="统计并输出各阶段（读取、解析、检查、报告）的内存：trace（默认）用 tracemalloc，"
+                             "检查会慢好几倍；rss 只记录进程最大常驻内存")
+    parser.add_argument("--hot-paragraphs", type=int, default=None, metavar="N",
+                        help="检查结束后输出最慢的 N 个段落（耗时、run 数、正则匹配数）")
+    parser.add_argument("--plan", choices=("auto", "serial", "parallel"), default="auto",
+                        help="执行方式：auto 先预扫描文档再选择串行或并行（见 planner.py）")
+    parser.add_argument("--workers", type=int, default=None, help="并行检查的工作进程数")
+    parser.add_argument("--explain-plan", action="store_true", help="输出执行计划、预计耗时和实际耗时")
+    parser.add_argument("--summary", action="store_true", help="控制台只输出按规则、样式统计的汇总")
+    parser.add_argument("--category", action="append", default=None, help="控制台只输出这个类别的错误，可多次指定")
+    parser.add_argument("--rule", action="append", default=None, help="控制台只输出这条规则的错误，可多次指定")
+    parser.add_argument("--style", action="append", default=None, help="控制台只输出这个样式的段落，可多次指定")
+    parser.add_argument("--top", type=int, default=None, help="控制台最多输出前 N 个错误")
+    parser.add_argument("--page", type=int, default=None, help="控制台分页输出，显示第几页（从 1 开始）")
+    parser.add_argument("--page-size", type=int, default=50, help="分页输出时每页的错误数")
+    parser.add_argument("--pager", action="store_true", help="输出到终端时交给 $PAGER（默认 less -R）分页浏览")
+    args = parser.parse_args(argv)
+    if args.hot_paragraphs is not None and args.hot_paragraphs < 1:
+        parser.error("--hot-paragraphs 必须是正整数")
+    if args.page is not None and args.page < 1:
+        parser.error("--page 从 1 开始")
+    if args.page_size < 1:
+        parser.error("--page-size 必须是正整数")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers 必须是正整数")
+
+    logging.basicConfig(
+        format="{levelname} - {message}", style="{", level=logging.INFO
+    )
 
-            print(f"\n{colorize(f'▼ 段落 {para_idx + 1}', Colors.BOLD + Colors.HEADER)}")
-            print(f"  {colorize('样式:', Colors.BLUE)} '{style_name}'")
-            print(f"  {colorize('内容片段:', Colors.BLUE)} '{snippet}...'")
-            print(f"  {colorize('发现的错误:', Colors.BLUE)}")
+    if args.check_rules:
+        from compiled_rules import LOAD_ERRORS, load_rules_source
+        from rules_validation import validate_rules
 
-            for i, err in enumerate(para_error_block['details']):
-                category = err['category']
-                rule = err['rule']
-                expected = err['expected']
-                actual = err['actual']
+        try:
+            problems = validate_rules(load_rules_source(args.rules or "rules:DEFAULT_RULES"))
+        except LOAD_ERRORS as e:
+            print(e)
+            return 1
+        for problem in problems:
+            print(f"规则问题: {problem}")
+        if not problems:
+            print("规则集校验通过")
+        return 1 if problems else 0
+
+    if args.rules:
+        from compiled_rules import LOAD_ERRORS, load_compiled_rules
 
-                print(f"    {i+1}. {colorize(f'[{category}]', Colors.WARNING + Colors.BOLD)}")
-                print(f"       {colorize('规则:', Colors.GREY)} {rule}")
-                if "run_idx" in err:
-                    run_info = f"Run {err['run_idx'] + 1}"
-                    if err.get("run_text"):
-                        run_info += f" ('{err['run_text']}')"
-                    print(f"       {colorize('位置:', Colors.GREY)} {run_info}")
-                print(f"       {colorize('期望:', Colors.GREEN)} {expected}")
-                print(f"       {colorize('实际:', Colors.FAIL)} {actual}")
-                
-                if err.get("location"):
-                    highlighted_snippet_console = self._generate_highlighted_console_snippet(
-                        full_para_text, err["location"], is_tty=is_tty, colors_class=Colors
-                    )
-                    print(f"         {colorize('上下文:', Colors.GREY)} {highlighted_snippet_console}")
+        try:
+            rules = load_compiled_rules(args.rules, args.rules_cache)
+        except LOAD_ERRORS as e:
+            print(e)
+            return 1
+    else:
+        from rules import DEFAULT_RULES as rules
+    if args.cross_paragraph and not rules.get("cross_paragraph"):
+        from compiled_rules import CompiledRules, compile_rules
+        from rules import CROSS_PARAGRAPH_RULES
 
+        if isinstance(rules, CompiledRules):
+            rules = compile_rules({**rules.rules, "cross_paragraph": CROSS_PARAGRAPH_RULES})
+        else:
+            rules = {**rules, "cross_paragraph": CROSS_PARAGRAPH_RULES}
 
-if __name__ == "__main__":
-    from rules import DEFAULT_RULES, CM_TOLERANCE, FLOAT_TOLERANCE, PT_TOLERANCE
-    from rules import RE_CHINESE, RE_WESTERN, RE_NUMBER, RE_CHINESE_PUNCTUATION
-    from rules import RE_FULL_WIDTH_BRACKETS_LEFT, RE_FULL_WIDTH_BRACKETS_RIGHT
+    doc_file_path = args.doc_path
+    if not os.path.isfile(doc_file_path):
+        print(f"Err: 文档 '{doc_file_path}' 不存在")
+        return 1
 
-    doc_file_path = (
-        "test.docx"
-    )
+    aggregator = None
+    if args.group:
+        from aggregate import FindingAggregator
+
+        aggregator = FindingAggregator(
+            max_samples=args.max_samples,
+            max_per_rule=args.max_per_rule,
+            max_per_paragraph=args.max_per_paragraph,
+        )
 
-    try:
-        doc = Document(doc_file_path)
-    except Exception as e:
-        print(f"Err: {e}, 文档 '{doc_file_path}' 不存在")
-        exit(1)
-        # doc = Document()
-        # # 测试段落格式错误（对齐）
-        # p1 = doc.add_paragraph("This paragraph should be left aligned.", style='Normal')
-        # p1.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        #
-        # p2 = doc.add_paragraph("Text with a ", style='Normal')
-        # run_correct_font = p2.add_run("correctly_sized")
-        # run_correct_font.font.size = Pt(11)
-        # p2.add_run(" segment, then an ")
-        # run_wrong_size = p2.add_run("ERROR_SIZE")
-        # run_wrong_size.font.size = Pt(11)
-        # p2.add_run(" run, and a ")
-        # run_wrong_bold = p2.add_run("WRONGLY_BOLD")
-        # run_wrong_bold.font.bold = True
-        # p2.add_run(" run.")
-        # 
-        # doc.add_paragraph("First line of text for para rule.\nSecond line of text.\nThird line.", style='Normal')
-        # 
-        # doc.save(doc_file_path)
-
-    checker = FormatChecker(DEFAULT_RULES)
-    checker.check_document(doc_file_path)
-
-    if checker.errors:
-        checker.print_structured_errors_to_console()
-        checker.generate_html_report("format_checker_report.html")
+    checker = FormatChecker(
+        rules,
+        skip_expensive_after_failure=args.skip_expensive,
+        rule_timing=args.rule_timing,
+        paragraph_timing=args.hot_paragraphs is not None,
+        memory_accounting={"trace": True, "rss": "rss"}.get(args.memory, False),
+    )
+    if args.hot_paragraphs is not None:
+        checker.paragraph_timings.top = args.hot_paragraphs
+    cached_errors = None
+    if args.cache_dir:
+        import result_cache
+
+        key = result_cache.cache_key(doc_file_path, rules)
+        # 需要规则耗时、段落耗时或内存统计时必须真正检查一次
+        if not (args.rule_timing or args.hot_paragraphs is not None or args.memory is not None):
+            cached_errors = result_cache.load_cached_errors(args.cache_dir, key)
+
+    plan = None
+    if cached_errors is None:
+        plan = checker.plan_document(
+            doc_file_path, args.plan, args.workers,
+            args.max_errors, args.max_errors_per_rule, args.time_budget, snapshot_dir=args.snapshot_dir,
+        )
+        if args.explain_plan:
+            print(plan.describe())
+
+    limits = {
+        "plan": plan,
+        "max_errors": args.max_errors,
+        "max_errors_per_rule": args.max_errors_per_rule,
+        "time_budget_s": args.time_budget,
+        "snapshot_dir": args.snapshot_dir,
+    }
+    if cached_errors is not None:
+        checker.errors = CheckResult(cached_errors)
+        if aggregator is not None:
+            # 缓存里保存的是逐条结果，在这里归并
+            aggregator = FindingAggregator.from_errors(
+                cached_errors,
+                max_samples=args.max_samples,
+                max_per_rule=args.max_per_rule,
+                max_per_paragraph=args.max_per_paragraph,
+            )
+            checker.errors = CheckResult(block for block in cached_errors if block["para_idx"] == -1)
+            checker.aggregator = aggregator
+    elif aggregator is not None:
+        # 分组模式不保留逐条结果，因此也不写缓存
+        checker.aggregator = aggregator
+        checker.check_document(doc_file_path, **limits)
     else:
-        print(f"\n--- 文档 '{doc_file_path}' 未发现格式问题 (基于当前规则) ---")
-        checker.generate_html_report(
-            "format_checker_report.html"
+        checker.check_document(doc_file_path, **limits)
+        # 提前结束或跳过了规则的结果不完整，不能缓存
+        if args.cache_dir and not checker.errors.partial and not args.skip_expensive:
+            result_cache.store_errors(args.cache_dir, key, checker.errors)
+
+    if args.explain_plan and plan is not None:
+        print(f"实际耗时 {checker.errors.elapsed_s:.1f} 秒（预计 {plan.estimated_s or 0:.1f} 秒）")
+    if args.rule_timing:
+        checker.print_rule_timings()
+    if args.hot_paragraphs is not None:
+        checker.print_hot_paragraphs()
+
+    with checker.memory_phase("render"):
+        _print_reports(checker, args, doc_file_path)
+    if args.memory is not None:
+        from memory_usage import format_memory
+
+        print("\n".join(format_memory(checker.errors.memory, checker.errors.paragraphs_total)))
+    return 0
+
+
+def _print_reports(checker, args, doc_file_path):
+    if checker.aggregator is not None:
+        checker.print_grouped_errors_to_console()
+        checker.generate_grouped_html_report(args.html_report)
+        return
+
+    from console_report import FindingFilter
+
+    finding_filter = FindingFilter(args.category, args.rule, args.style)
+    if args.summary:
+        checker.print_error_summary_to_console(finding_filter, pager=args.pager)
+    elif checker.errors or checker.errors.partial:
+        checker.print_structured_errors_to_console(
+            finding_filter, top=args.top, page=args.page, page_size=args.page_size, pager=args.pager
         )
+    else:
+        print(f"\n--- 文档 '{doc_file_path}' 未发现格式问题 (基于当前规则) ---")
+    if args.report_format == "interactive":
+        checker.generate_interactive_html_report(args.html_report)
+    else:
+        checker.generate_html_report(args.html_report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+常驻检查进程 (daemon.py) 的轻量客户端。
+
+只依赖标准库，不导入 python-docx / lxml / tangled_up_in_unicode，
+启动开销基本等于一次 Unix socket 往返，适合编辑器在每次保存时调用：
+
+    python client.py thesis.docx
+    python client.py thesis.docx --html format_checker_report.html
+    python client.py --ping
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+def default_socket_path():
+    """默认 socket 路径，优先放在 XDG_RUNTIME_DIR 下，按用户区分。"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "word-checking.sock")
+    return os.path.join(tempfile.gettempdir(), f"word-checking-{os.getuid()}.sock")
+
+
+def send_request(request, socket_path=None, timeout=None):
+    """
+    发送一个请求并等待回复。
+    协议：一行 UTF-8 JSON 请求，一行 UTF-8 JSON 回复，然后关闭连接。
+    """
+    socket_path = socket_path or default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks).decode("utf-8"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="向常驻检查进程提交 docx 格式检查请求")
+    parser.add_argument("doc_path", nargs="?", help="待检查的 .docx 文件")
+    parser.add_argument("--socket", dest="socket_path", default=None, help="daemon 的 socket 路径")
+    parser.add_argument("--html", dest="html_report", default=None, help="同时生成 HTML 报告到该路径")
+    parser.add_argument("--json", action="store_true", help="输出结构化 JSON 而不是控制台文本")
+    parser.add_argument("--max-errors", type=int, default=None, help="发现这么多个错误后停止检查")
+    parser.add_argument("--max-errors-per-rule", type=int, default=None, help="任一规则发现这么多个错误后停止检查")
+    parser.add_argument("--time-budget", type=float, default=None, help="检查耗时超过这么多秒后停止")
+    parser.add_argument("--timeout", type=float, default=None, help="等待回复的秒数")
+    parser.add_argument("--ping", action="store_true", help="仅检查 daemon 是否在运行")
+    parser.add_argument("--shutdown", action="store_true", help="让 daemon 退出")
+    args = parser.parse_args(argv)
+
+    if args.ping:
+        request = {"cmd": "ping"}
+    elif args.shutdown:
+        request = {"cmd": "shutdown"}
+    elif args.doc_path:
+        request = {
+            "cmd": "check",
+            # daemon 的工作目录与客户端不同，统一传绝对路径
+            "doc_path": os.path.abspath(args.doc_path),
+            "html_report": os.path.abspath(args.html_report) if args.html_report else None,
+            "console": not args.json,
+            "max_errors": args.max_errors,
+            "max_errors_per_rule": args.max_errors_per_rule,
+            "time_budget_s": args.time_budget,
+        }
+    else:
+        parser.error("需要提供 doc_path，或使用 --ping / --shutdown")
+
+    try:
+        reply = send_request(request, args.socket_path, args.timeout)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"错误: 无法连接到 daemon ({args.socket_path or default_socket_path()})，请先运行 python daemon.py",
+              file=sys.stderr)
+        return 2
+    except socket.timeout:
+        print("错误: 等待 daemon 回复超时", file=sys.stderr)
+        return 2
+
+    if not reply.get("ok"):
+        print(f"错误: {reply.get('error')}", file=sys.stderr)
+        return 2
+
+    if request["cmd"] != "check":
+        print(reply.get("message", "ok"))
+        return 0
+
+    if args.json:
+        json.dump({"status": reply.get("status"), "errors": reply["errors"]},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        sys.stdout.write(reply.get("console", ""))
+    return 1 if reply["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+按样式生成专用的段落检查函数。
+
+通用路径（registry.py 中的规则对象）对每个段落、每个 run 都要逐条调用规则的 check，
+期望值和提示文字每次现算；这里为每个样式的有效规则生成一段 Python 源码，只包含该样式
+定义了的比较，期望值和由期望值决定的提示文字在生成时就算好并内联，正则预先编译，再 compile 成函数。
+
+生成的函数与注册表中的内置规则逐条等价（错误的顺序、rule 名和 expected/actual 文本都相同），
+签名为 check(checker, p, p_idx, style_name)，p 为 resolved.ResolvedParagraph。
+注册了自定义规则、需要逐条计时或跳过规则时，FormatChecker 不使用生成的函数。
+"""
+import linecache
+import re
+
+from enums import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+from registry import DEFAULT_REGISTRY, LINE_SPACING_VALUE_RULES, SCOPE_TEXT, normalize_font_name
+from rules import PT_TOLERANCE
+
+_compiled_count = 0
+
+
+class _Emitter:
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self.indent = 1
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def const(self, value):
+        """返回可以写进源码的表达式：简单字面量直接内联，其他对象作为全局常量绑定。"""
+        if value is None or type(value) in (bool, int, float, str):
+            return repr(value)
+        name = f"K{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+
+def _emit_paragraph_checks(out, rules):
+    add_error_tail = "para_text_snippet, full_para_text, \"段落格式\""
+    location = "error_char_location=first_line_loc"
+
+    if "alignment" in rules:
+        expected = rules["alignment"]
+        out.emit("actual = p.alignment")
+        out.emit(f"if actual != {out.const(expected)}:")
+        out.emit(f"    add_error(p_idx, style_name, {add_error_tail}, \"alignment\", "
+                 f"{WD_ALIGN_PARAGRAPH(expected).name!r}, "
+                 f"WD_ALIGN_PARAGRAPH(actual).name if actual is not None else \"None\", {location})")
+
+    if "first_line_indent_pt" in rules:
+        expected = rules["first_line_indent_pt"]
+        out.emit("actual = p.first_line_indent_pt")
+        out.emit("if actual is None:")
+        out.emit("    actual = 0")
+        out.emit(f"if abs(actual - {out.const(expected)}) > PT_TOLERANCE:")
+        out.emit(f"    add_error(p_idx, style_name, {add_error_tail}, \"first_line_indent_pt\", "
+                 f"{f'{expected:.2f} pt'!r}, f\"{{actual:.2f}} pt\", {location})")
+
+    if "line_spacing_rule" in rules:
+        expected_rule = rules["line_spacing_rule"]
+        out.emit("actual_ls_rule = p.line_spacing_rule")
+        out.emit(f"if actual_ls_rule != {out.const(expected_rule)}:")
+        out.emit(f"    add_error(p_idx, style_name, {add_error_tail}, \"line_spacing_rule\", "
+                 f"{WD_LINE_SPACING(expected_rule).name!r}, "
+                 f"WD_LINE_SPACING(actual_ls_rule).name if actual_ls_rule is not None else \"None\", {location})")
+
+        # 行距值只在实际行距规则与期望一致、且期望规则带数值时检查
+        if "line_spacing_value" in rules and expected_rule in LINE_SPACING_VALUE_RULES:
+            expected = float(rules["line_spacing_value"])
+            out.emit("else:")
+            out.emit("    actual = p.line_spacing")
+            out.emit("    if actual is None:")
+            out.emit("        actual = 1.0")
+            out.emit(f"    if abs(actual - {expected!r}) > PT_TOLERANCE:")
+            out.emit(f"        add_error(p_idx, style_name, {add_error_tail}, \"line_spacing_value\", "
+                     f"{f'{expected:.2f}'!r}, f\"{{actual:.2f}}\", {location})")
+
+    for key in ("space_before_pt", "space_after_pt"):
+        if key in rules:
+            expected = rules[key]
+            out.emit(f"actual = p.{key}")
+            out.emit(f"if abs(actual - {out.const(expected)}) > PT_TOLERANCE:")
+            out.emit(f"    add_error(p_idx, style_name, {add_error_tail}, {key!r}, "
+                     f"{f'{expected:.1f} pt'!r}, f\"{{actual:.1f}} pt\", {location})")
+
+    for key in ("keep_with_next", "keep_together"):
+        if key in rules:
+            expected = out.const(rules[key])
+            out.emit(f"actual = p.{key}")
+            out.emit(f"if actual != {expected}:")
+            out.emit(f"    add_error(p_idx, style_name, {add_error_tail}, {key!r}, {expected}, actual, {location})")
+
+    if "widow_control" in rules:
+        expected = out.const(rules["widow_control"])
+        out.emit("actual = p.widow_control")
+        out.emit("if actual is None:")
+        out.emit("    actual = False")
+        out.emit(f"if actual != {expected}:")
+        out.emit(f"    add_error(p_idx, style_name, {add_error_tail}, \"widow_control\", {expected}, actual, {location})")
+
+
+def _emit_font_name_check(out, rule_key, expected, actual_expr):
+    out.emit(f"actual = {actual_expr}")
+    out.emit(f"if actual != {out.const(expected)} and "
+             f"(actual.replace(\" (正文)\", \"\").replace(\" (标题)\", \"\") if actual else None) "
+             f"!= {normalize_font_name(expected)!r}:")
+    out.emit(f"    add_error(p_idx, style_name, para_text_snippet, full_para_text, \"字体\", {rule_key!r}, "
+             f"{out.const(expected)}, actual, {_run_location})")
+
+
+_run_location = "run_idx=run.index, run_text_snippet_for_detail=run_text[:20].replace(\"\\n\", \" \"), " \
+                "error_char_location=run_loc"
+
+_WESTERN_ACTUAL = "fonts.get(\"ascii\") if fonts.get(\"ascii\") is not None else fonts.get(\"hAnsi\")"
+
+
+def _emit_western_font_check(out, rules, known_not_chinese):
+    expected = rules["western_font"]
+    out.emit("fonts = run.fonts")
+    if expected:
+        _emit_font_name_check(out, "western_font", expected, _WESTERN_ACTUAL)
+        return
+    # 期望值为空时通用路径走 fallback 分支，且只检查不含中文的 run
+    if not known_not_chinese:
+        out.emit("if not run.has_chinese:")
+        out.indent += 1
+    out.emit("actual = fonts.get(\"ascii\", fonts.get(\"hAnsi\"))")
+    out.emit(f"if actual != {out.const(expected)}:")
+    out.emit(f"    add_error(p_idx, style_name, para_text_snippet, full_para_text, \"字体\", "
+             f"\"western_font (fallback)\", {out.const(expected)}, actual, {_run_location})")
+    if not known_not_chinese:
+        out.indent -= 1
+
+
+def _emit_run_checks(out, rules):
+    has_chinese_rule = "chinese_font" in rules
+    has_western_rule = "western_font" in rules
+    if not any(key in rules for key in ("font_size_pt", "font_bold", "font_italic")) \
+            and not has_chinese_rule and not has_western_rule:
+        return
+
+    out.emit("for run in p.runs:")
+    out.indent += 1
+    out.emit("run_text = run.text")
+    out.emit("if not run_text.strip():")
+    out.emit("    continue")
+    out.emit("run_loc = [run.start, run.end]")
+
+    if "font_size_pt" in rules:
+        expected = rules["font_size_pt"]
+        out.emit("actual = run.font_size_pt")
+        out.emit(f"if abs(actual - {out.const(expected)}) > PT_TOLERANCE:")
+        out.emit(f"    add_error(p_idx, style_name, para_text_snippet, full_para_text, \"字体\", \"font_size_pt\", "
+                 f"{f'{expected:.1f} pt'!r}, f\"{{actual:.1f}} pt\", {_run_location})")
+
+    for key, attr in (("font_bold", "bold"), ("font_italic", "italic")):
+        if key in rules:
+            expected = out.const(rules[key])
+            out.emit(f"actual = run.{attr}")
+            out.emit(f"if actual != {expected}:")
+            out.emit(f"    add_error(p_idx, style_name, para_text_snippet, full_para_text, \"字体\", {key!r}, "
+                     f"{expected}, actual, {_run_location})")
+
+    # 字体名：含中文的 run 按 chinese_font 检查，其余按 western_font 检查
+    if has_chinese_rule:
+        out.emit("if run.has_chinese:")
+        out.indent += 1
+        if rules["chinese_font"]:
+            out.emit("fonts = run.fonts")
+            _emit_font_name_check(out, "chinese_font", rules["chinese_font"], "fonts.get(\"eastAsia\")")
+        else:
+            out.emit("pass")
+        out.indent -= 1
+        if has_western_rule:
+            out.emit("else:")
+            out.indent += 1
+            _emit_western_font_check(out, rules, known_not_chinese=True)
+            out.indent -= 1
+    elif has_western_rule:
+        out.emit("if run.has_western or not run.has_chinese:")
+        out.indent += 1
+        _emit_western_font_check(out, rules, known_not_chinese=False)
+        out.indent -= 1
+    out.indent -= 1
+
+
+def spacing_checks(rules):
+    """
+    内容间距规则展开成 [(正则, 高亮的分组, rule 名, expected, actual)]，
+    来自注册表中 text 作用范围的内置规则，顺序与通用路径一致。
+    """
+    return [
+        check
+        for rule in DEFAULT_REGISTRY.rules(SCOPE_TEXT)
+        if rule.applies(rules)
+        for check in rule.expand(rules)
+    ]
+
+
+def _emit_spacing_checks(out, rules):
+    checks = spacing_checks(rules)
+    if not checks:
+        return
+    out.emit("spacing_snippet = full_para_text[:50].replace(\"\\n\", \" \")")
+    for pattern, group, rule_key, expected, actual in checks:
+        compiled = out.const(re.compile(pattern))
+        out.emit(f"for match in {compiled}.finditer(full_para_text):")
+        out.emit(f"    add_error(p_idx, style_name, spacing_snippet, full_para_text, \"内容间距\", {rule_key!r}, "
+                 f"{expected!r}, {actual!r}, error_char_location=[match.start({group}), match.end({group})])")
+
+
+def generate_source(effective_rules, function_name="check"):
+    """返回 (源码, 需要绑定的常量)。"""
+    out = _Emitter()
+    out.emit("add_error = checker._add_error")
+    out.emit("full_para_text = p.text")
+    out.emit("para_text_snippet = full_para_text[:30].replace(\"\\n\", \" \")")
+    out.emit("first_line_loc = checker._get_first_line_location(full_para_text)")
+    _emit_paragraph_checks(out, effective_rules)
+    _emit_run_checks(out, effective_rules)
+    _emit_spacing_checks(out, effective_rules)
+    source = f"def {function_name}(checker, p, p_idx, style_name):\n" + "\n".join(out.lines) + "\n"
+    return source, out.constants
+
+
+def compile_style_check(effective_rules, style_name=""):
+    """
+    为一个样式的有效规则生成检查函数，等价于依次调用 check_paragraph_formatting、
+    check_font_rules_for_paragraph 和 check_spacing_rules_for_paragraph。
+    生成的源码保存在函数的 source 属性中，出错时的 traceback 也能显示源码。
+    """
+    global _compiled_count
+    _compiled_count += 1
+    source, constants = generate_source(effective_rules)
+    filename = f"<compiled rules #{_compiled_count}: {style_name}>"
+    namespace = {
+        "PT_TOLERANCE": PT_TOLERANCE,
+        "WD_ALIGN_PARAGRAPH": WD_ALIGN_PARAGRAPH,
+        "WD_LINE_SPACING": WD_LINE_SPACING,
+        **constants,
+    }
+    exec(compile(source, filename, "exec"), namespace)
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    check = namespace["check"]
+    check.source = source
+    return check
@@ -0,0 +1,292 @@
+"""
+规则集的编译：从 Python 字典、JSON 或 TOML 读取 DEFAULT_RULES 形状的规则集，
+用 rules_validation 校验 based_on 继承关系和各个键的类型，展开继承链，
+得到不可变、可哈希的 CompiledRules。编译结果可按内容哈希缓存在磁盘上，
+多个工作进程启动时直接读取，不必重新解析和校验。
+
+    python compiled_rules.py rules.toml                    # 校验并编译，打印摘要
+    python compiled_rules.py rules.toml --cache-dir .rules-cache
+    python compiled_rules.py rules:DEFAULT_RULES --export-json rules.json
+    python checking.py 论文.docx --rules rules.toml --rules-cache .rules-cache
+
+JSON / TOML 中 alignment、line_spacing_rule 可以写成枚举名（"JUSTIFY"）或整数；
+TOML 没有 null，based_on 为空时省略即可。
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+
+from enums import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+
+# 编译结果的格式版本，CompiledRules 的结构变化时加一
+COMPILED_RULES_VERSION = 1
+
+# 决定编译结果的代码，任一文件变化都会让磁盘缓存失效
+_COMPILER_MODULES = ("compiled_rules.py", "rules_validation.py", "enums.py")
+
+_ENUM_KEYS = {
+    "alignment": WD_ALIGN_PARAGRAPH,
+    "line_spacing_rule": WD_LINE_SPACING,
+}
+
+# 合并到每个样式有效规则中的全局分组，顺序与 FormatChecker._resolve_effective_rules 相同
+GLOBAL_GROUPS = ("fonts", "spacing", "section")
+
+
+class FrozenDict(dict):
+    """不能修改的字典，可哈希，序列化（json、pickle）时与普通字典相同。"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("编译后的规则集不能修改")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.items(), key=lambda item: str(item[0]))))
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def copy(self):
+        return dict(self)
+
+
+def freeze(value):
+    """字典变成 FrozenDict，列表变成元组，递归处理。"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _normalize_style(style_rules):
+    """JSON / TOML 中的枚举名和整数换成枚举成员；无法转换的值原样保留，交给校验报告。"""
+    normalized = dict(style_rules)
+    for key, enum_type in _ENUM_KEYS.items():
+        value = normalized.get(key)
+        if isinstance(value, str) and value in enum_type.__members__:
+            normalized[key] = enum_type[value]
+        elif isinstance(value, int) and not isinstance(value, bool):
+            try:
+                normalized[key] = enum_type(value)
+            except ValueError:
+                pass
+    return normalized
+
+
+def normalize_rules(rules):
+    normalized = dict(rules)
+    for group in GLOBAL_GROUPS:
+        if isinstance(rules.get(group), dict):
+            normalized[group] = _normalize_style(rules[group])
+    if isinstance(rules.get("paragraph"), dict):
+        normalized["paragraph"] = {
+            name: _normalize_style(style_rules) if isinstance(style_rules, dict) else style_rules
+            for name, style_rules in rules["paragraph"].items()
+        }
+    return normalized
+
+
+# 读取规则集时可能出现的错误：校验失败、文件不存在或无法读取、模块不存在，
+# 命令行对它们一样处理：输出错误信息并以状态 1 退出
+LOAD_ERRORS = (ValueError, OSError, ImportError)
+
+
+def load_rules_source(source):
+    """
+    source 可以是规则字典、.json / .toml 文件路径，或 "模块:变量" 形式的说明
+    （省略 ":变量" 时取 DEFAULT_RULES）。返回规则字典（枚举已转换）。
+    """
+    if isinstance(source, dict):
+        return normalize_rules(source)
+    extension = os.path.splitext(source)[1].lower()
+    if extension == ".json":
+        import json
+
+        with open(source, encoding="utf-8") as f:
+            return normalize_rules(json.load(f))
+    if extension == ".toml":
+        import tomllib
+
+        with open(source, "rb") as f:
+            return normalize_rules(tomllib.load(f))
+    import importlib
+
+    module_name, _, attr = source.partition(":")
+    module = importlib.import_module(module_name)
+    attr = attr or "DEFAULT_RULES"
+    if not hasattr(module, attr):
+        raise ValueError(f"模块 '{module_name}' 中没有规则集 '{attr}'")
+    return normalize_rules(getattr(module, attr))
+
+
+class CompiledRules:
+    """
+    编译后的规则集：
+
+    - rules：原规则集的不可变副本，FormatChecker 可以直接当作规则字典使用；
+    - styles：样式名 -> 展开 based_on 继承链并合并全局分组后的有效规则；
+    - digest：规则内容的哈希（与 result_cache.rules_fingerprint 相同），也用于比较和哈希。
+    """
+
+    __slots__ = ("rules", "styles", "digest")
+
+    def __init__(self, rules, styles, digest):
+        object.__setattr__(self, "rules", freeze(rules))
+        object.__setattr__(self, "styles", freeze(styles))
+        object.__setattr__(self, "digest", digest)
+
+    def __setattr__(self, name, value):
+        raise TypeError("编译后的规则集不能修改")
+
+    def __reduce__(self):
+        return CompiledRules, (self.rules, self.styles, self.digest)
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledRules) and other.digest == self.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return f"<CompiledRules {self.digest[:12]} 样式 {len(self.styles)} 个>"
+
+    # 让 CompiledRules 本身也能当作规则字典传给只读取规则的代码
+    def __getitem__(self, key):
+        return self.rules[key]
+
+    def get(self, key, default=None):
+        return self.rules.get(key, default)
+
+    def effective_rules(self, style_name):
+        """样式的有效规则；样式未定义时返回 None。"""
+        return self.styles.get(style_name)
+
+
+def compile_rules(rules):
+    """
+    校验并编译规则集。规则集有问题时抛出 ValueError，消息中列出所有问题。
+    """
+    from result_cache import rules_fingerprint
+    from rules_validation import validate_rules
+
+    rules = normalize_rules(rules)
+    problems = validate_rules(rules)
+    if problems:
+        raise ValueError("规则集校验失败:\n" + "\n".join(f"  - {problem}" for problem in problems))
+
+    base = {}
+    for group in GLOBAL_GROUPS:
+        base.update(rules.get(group, {}))
+    paragraph_rules = rules["paragraph"]
+    styles = {}
+    for style_name in paragraph_rules:
+        # 校验已保证继承链存在且不成环
+        chain = []
+        current_name = style_name
+        while current_name:
+            chain.append(paragraph_rules[current_name])
+            current_name = paragraph_rules[current_name].get("based_on")
+        effective = dict(base)
+        for style_rules in reversed(chain):
+            effective.update(style_rules)
+        styles[style_name] = effective
+    return CompiledRules(rules, styles, rules_fingerprint(rules))
+
+
+def _compiler_fingerprint():
+    from result_cache import code_fingerprint
+
+    return f"{COMPILED_RULES_VERSION}:{code_fingerprint(_COMPILER_MODULES)}"
+
+
+def source_key(source):
+    """磁盘缓存的键：文件内容（或规则字典的指纹）加上编译代码的指纹。"""
+    hasher = hashlib.sha256(_compiler_fingerprint().encode("ascii"))
+    if isinstance(source, dict) or not os.path.isfile(source):
+        from result_cache import rules_fingerprint
+
+        hasher.update(rules_fingerprint(load_rules_source(source)).encode("ascii"))
+    else:
+        from result_cache import hash_file
+
+        hasher.update(os.path.splitext(source)[1].lower().encode("utf-8"))
+        hash_file(source, hasher)
+    return hasher.hexdigest()
+
+
+def load_compiled_rules(source, cache_dir=None):
+    """
+    读取并编译规则集。指定 cache_dir 时先按内容哈希查找已编译的结果，
+    未命中时编译并写入缓存（写临时文件后改名，多个进程同时编译也不会读到半个文件）。
+    """
+    if cache_dir is None:
+        return compile_rules(load_rules_source(source))
+
+    key = source_key(source)
+    path = os.path.join(cache_dir, f"{key}.rules.pickle")
+    try:
+        with open(path, "rb") as f:
+            compiled = pickle.load(f)
+        if isinstance(compiled, CompiledRules):
+            return compiled
+    except FileNotFoundError:
+        pass
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        logging.warning(f"已编译的规则缓存 '{path}' 无法读取，重新编译: {e}")
+
+    compiled = compile_rules(load_rules_source(source))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return compiled
+
+
+def to_plain(rules):
+    """转成可写入 JSON 的结构，枚举写成成员名。"""
+    if isinstance(rules, dict):
+        return {key: to_plain(value) for key, value in rules.items()}
+    if isinstance(rules, (list, tuple)):
+        return [to_plain(value) for value in rules]
+    if isinstance(rules, (WD_ALIGN_PARAGRAPH, WD_LINE_SPACING)):
+        return rules.name
+    return rules
+
+
+def main(argv=None):
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description="校验并编译规则集（Python 字典、JSON 或 TOML）")
+    parser.add_argument("source", help=".json / .toml 文件，或 模块[:变量]，例如 rules:DEFAULT_RULES")
+    parser.add_argument("--cache-dir", default=None, help="已编译规则的缓存目录")
+    parser.add_argument("--export-json", default=None, help="把规则集（枚举写成名字）导出为 JSON 文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    started = time.perf_counter()
+    try:
+        if args.export_json:
+            with open(args.export_json, "w", encoding="utf-8") as f:
+                json.dump(to_plain(load_rules_source(args.source)), f, ensure_ascii=False, indent=2)
+            print(f"已导出: {args.export_json}")
+            started = time.perf_counter()
+        compiled = load_compiled_rules(args.source, args.cache_dir)
+    except LOAD_ERRORS as e:
+        print(e)
+        return 1
+    elapsed = time.perf_counter() - started
+    print(f"规则集 {compiled.digest[:12]}：{len(compiled.styles)} 个样式，用时 {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+控制台报告。输出先写入缓冲区，最后一次写出或交给分页程序（less），
+避免大文档每条错误多次 print 刷屏、通过 SSH 时输出很慢。支持：
+
+- 按类别、规则、样式过滤（可多次指定，同一项取并集，不同项取交集）；
+- 只显示前 N 条、按页显示；
+- 汇总视图：一次遍历统计每条规则、每个样式、每个类别的错误数，一屏显示。
+
+    python checking.py 论文.docx --summary
+    python checking.py 论文.docx --rule font_size --style Normal --top 20
+    python checking.py 论文.docx --page 2 --page-size 100 --pager
+"""
+import os
+import sys
+from collections import Counter
+
+from checking import ConsoleColors
+
+
+class FindingFilter:
+    """categories、rules、styles 为 None 或集合，为 None 的一项不过滤。"""
+
+    def __init__(self, categories=None, rules=None, styles=None):
+        self.categories = set(categories) if categories else None
+        self.rules = set(rules) if rules else None
+        self.styles = set(styles) if styles else None
+
+    def __bool__(self):
+        return bool(self.categories or self.rules or self.styles)
+
+    def matches_block(self, block):
+        return self.styles is None or block["style_name"] in self.styles
+
+    def matches(self, detail):
+        return ((self.categories is None or detail["category"] in self.categories)
+                and (self.rules is None or detail["rule"] in self.rules))
+
+    def describe(self):
+        parts = []
+        for label, values in (("类别", self.categories), ("规则", self.rules), ("样式", self.styles)):
+            if values:
+                parts.append(f"{label}={','.join(sorted(values))}")
+        return "，".join(parts)
+
+
+def _raw_details(block):
+    """ErrorBlock 的 details 不补 run_text，只统计或过滤时不必逐条展开。"""
+    raw_details = getattr(block, "raw_details", None)
+    return raw_details if raw_details is not None else block["details"]
+
+
+def iter_findings(errors, finding_filter=None):
+    """逐条产出 (错误块, 在段落中的序号, 错误详情)，跳过文档级错误。"""
+    for block in errors:
+        if block["para_idx"] == -1:
+            continue
+        if finding_filter and not finding_filter.matches_block(block):
+            continue
+        expand = getattr(block, "expand_detail", None)
+        for i, detail in enumerate(_raw_details(block)):
+            if finding_filter and not finding_filter.matches(detail):
+                continue
+            yield block, i, expand(detail) if expand is not None else detail
+
+
+class ConsoleReport:
+    """
+    checker 为已完成检查的 FormatChecker。detail 和 summary 把报告写入缓冲区，
+    flush 一次性输出。
+    """
+
+    def __init__(self, checker, finding_filter=None, is_tty=None):
+        self.checker = checker
+        self.finding_filter = finding_filter
+        if is_tty is None:
+            is_tty = hasattr(sys.stdout, 'isatty') and sys.stdout.isatty()
+        self.is_tty = is_tty
+        self.lines = []
+
+    def colorize(self, text, color_code):
+        return f"{color_code}{text}{ConsoleColors.ENDC}" if self.is_tty else text
+
+    def _notice(self):
+        notice = self.checker._partial_notice()
+        if notice:
+            self.lines.append(f"\n{self.colorize(notice, ConsoleColors.WARNING + ConsoleColors.BOLD)}")
+
+    def detail(self, top=None, page=None, page_size=50):
+        """
+        逐条列出错误。page 从 1 开始，每页 page_size 条；top 限制最多显示前 top 条。
+        不过滤、不分页时与原来的 print_structured_errors_to_console 输出相同。
+        """
+        Colors = ConsoleColors
+        colorize = self.colorize
+        lines = self.lines
+        self._notice()
+        if not self.checker.errors:
+            lines.append("\n--- 控制台输出：未发现格式问题 (基于当前规则) ---")
+            return
+
+        start = (page - 1) * page_size if page else 0
+        stop = start + page_size if page else None
+        if top is not None:
+            stop = top if stop is None else min(stop, top)
+
+        lines.append("\n--- 文档格式检查发现以下问题 (控制台详细输出) ---")
+        total = 0
+        current_block = None
+        for block, i, err in iter_findings(self.checker.errors, self.finding_filter):
+            position = total
+            total += 1
+            if position < start or (stop is not None and position >= stop):
+                continue
+            if block is not current_block:
+                current_block = block
+                full_para_text = block['full_text']
+                para_idx = block['para_idx']
+                lines.append(f"\n{colorize(f'▼ 段落 {para_idx + 1}', Colors.BOLD + Colors.HEADER)}")
+                lines.append(f"  {colorize('样式:', Colors.BLUE)} '{block['style_name']}'")
+                lines.append(f"  {colorize('内容片段:', Colors.BLUE)} '{block['paragraph_text_snippet']}...'")
+                lines.append(f"  {colorize('发现的错误:', Colors.BLUE)}")
+
+            category = err['category']
+            lines.append(f"    {i+1}. {colorize(f'[{category}]', Colors.WARNING + Colors.BOLD)}")
+            lines.append(f"       {colorize('规则:', Colors.GREY)} {err['rule']}")
+            if "run_idx" in err:
+                run_info = f"Run {err['run_idx'] + 1}"
+                if err.get("run_text"):
+                    run_info += f" ('{err['run_text']}')"
+                lines.append(f"       {colorize('位置:', Colors.GREY)} {run_info}")
+            lines.append(f"       {colorize('期望:', Colors.GREEN)} {err['expected']}")
+            lines.append(f"       {colorize('实际:', Colors.FAIL)} {err['actual']}")
+            if err.get("location"):
+                highlighted = self.checker._generate_highlighted_console_snippet(
+                    full_para_text, err["location"], is_tty=self.is_tty, colors_class=Colors
+                )
+                lines.append(f"         {colorize('上下文:', Colors.GREY)} {highlighted}")
+
+        if self.finding_filter or page or top is not None:
+            shown_stop = total if stop is None else min(stop, total)
+            if shown_stop > start:
+                footer = f"显示第 {start + 1}-{shown_stop} 条，共 {total} 条"
+            else:
+                footer = f"没有要显示的错误，共 {total} 条"
+            if page:
+                footer += f"（第 {page}/{max(1, -(-total // page_size))} 页）"
+            if self.finding_filter:
+                footer += f"；过滤条件：{self.finding_filter.describe()}"
+            lines.append(f"\n{colorize(footer, Colors.GREY)}")
+
+    def summary(self, limit=10):
+        """一次遍历统计各规则、样式、类别的错误数，每项最多列出 limit 行。"""
+        Colors = ConsoleColors
+        colorize = self.colorize
+        lines = self.lines
+        self._notice()
+
+        by_rule = Counter()
+        by_style = Counter()
+        by_category = Counter()
+        paragraphs = set()
+        document_errors = 0
+        for block in self.checker.errors:
+            if block["para_idx"] == -1:
+                document_errors += len(block["details"])
+                continue
+            if self.finding_filter and not self.finding_filter.matches_block(block):
+                continue
+            style_name = block["style_name"]
+            for detail in _raw_details(block):
+                if self.finding_filter and not self.finding_filter.matches(detail):
+                    continue
+                by_rule[detail["category"], detail["rule"]] += 1
+                by_style[style_name] += 1
+                by_category[detail["category"]] += 1
+                paragraphs.add(block["para_idx"])
+
+        total = sum(by_category.values())
+        title = f"--- 共 {total} 个问题，涉及 {len(paragraphs)} 个段落"
+        if document_errors:
+            title += f"，另有 {document_errors} 个文档级问题"
+        lines.append(f"\n{colorize(title + ' ---', Colors.BOLD + Colors.HEADER)}")
+        if self.finding_filter:
+            lines.append(colorize(f"过滤条件：{self.finding_filter.describe()}", Colors.GREY))
+        if not total:
+            return
+        lines.append("  " + "  ".join(f"{category} {count}" for category, count in by_category.most_common()))
+        for heading, counter, label in (
+            ("规则", by_rule, lambda key: f"[{key[0]}] {key[1]}"),
+            ("样式", by_style, lambda key: f"'{key}'"),
+        ):
+            lines.append(f"\n{colorize(f'按{heading}（前 {limit} 项，共 {len(counter)} 项）:', Colors.BLUE)}")
+            for key, count in counter.most_common(limit):
+                lines.append(f"  {colorize(f'{count:>6}', Colors.FAIL)}  {label(key)}")
+
+    def text(self):
+        return "\n".join(self.lines)
+
+    def flush(self, pager=False):
+        """一次性输出缓冲区；pager 为真且输出到终端时交给 $PAGER（默认 less -R）。"""
+        text = self.text()
+        self.lines = []
+        if pager and self.is_tty:
+            import subprocess
+
+            command = os.environ.get("PAGER") or "less -R"
+            try:
+                subprocess.run(command, shell=True, input=text + "\n", encoding="utf-8", check=False)
+                return
+            except OSError:
+                pass
+        print(text)
@@ -0,0 +1,134 @@
+"""
+常驻检查进程。
+
+启动时一次性导入 python-docx、lxml、tangled_up_in_unicode 并预先计算规则集，
+之后通过本地 Unix socket 接收检查请求，省去每次调用 checking.py 的导入开销。
+客户端见 client.py，协议为一行 JSON 请求 / 一行 JSON 回复：
+
+    {"cmd": "check", "doc_path": "/abs/path.docx", "html_report": null, "console": true,
+     "max_errors": null, "max_errors_per_rule": null, "time_budget_s": null}
+    {"cmd": "ping"}
+    {"cmd": "shutdown"}
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from client import default_socket_path
+
+
+class CheckRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line.decode("utf-8"))
+            reply = self.server.dispatch(request)
+        except Exception as e:  # pylint: disable=broad-except
+            logging.exception("处理请求失败")
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+
+class CheckDaemon(socketserver.UnixStreamServer):
+    """
+    单线程处理请求：FormatChecker 在检查过程中会写 self.errors，
+    请求串行执行即可安全复用同一个（已预热的）检查器。
+    """
+
+    def __init__(self, socket_path, rules):
+        from checking import FormatChecker, preload
+
+        preload()
+        self.socket_path = socket_path
+        self.checker = FormatChecker(rules)
+        self.checker.warm_up()
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, CheckRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def dispatch(self, request):
+        cmd = request.get("cmd", "check")
+        if cmd == "ping":
+            return {"ok": True, "message": "pong"}
+        if cmd == "shutdown":
+            # shutdown() 会等待 serve_forever 返回，不能在处理请求的线程里直接调用
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True, "message": "daemon 正在退出"}
+        if cmd == "check":
+            return self._check(request)
+        return {"ok": False, "error": f"未知命令 '{cmd}'"}
+
+    def _check(self, request):
+        doc_path = request.get("doc_path")
+        if not doc_path:
+            return {"ok": False, "error": "缺少 doc_path"}
+
+        errors = self.checker.check_document(
+            doc_path,
+            max_errors=request.get("max_errors"),
+            max_errors_per_rule=request.get("max_errors_per_rule"),
+            time_budget_s=request.get("time_budget_s"),
+        )
+        reply = {"ok": True, "errors": errors, "status": errors.status()}
+
+        # 报告输出函数直接 print，这里把它们的输出收集起来交给客户端显示
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            if request.get("console", True):
+                if errors or errors.partial:
+                    self.checker.print_structured_errors_to_console()
+                else:
+                    print(f"\n--- 文档 '{doc_path}' 未发现格式问题 (基于当前规则) ---")
+            if request.get("html_report"):
+                self.checker.generate_html_report(request["html_report"])
+        reply["console"] = buffer.getvalue()
+        return reply
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+
+def _remove_stale_socket(socket_path):
+    """删除上次异常退出留下的 socket 文件；若已有 daemon 在监听则报错。"""
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(f"已有 daemon 在 {socket_path} 上运行")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="常驻 docx 格式检查进程")
+    parser.add_argument("--socket", dest="socket_path", default=None, help="监听的 Unix socket 路径")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别，默认 WARNING")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        format="{levelname} - {message}", style="{", level=args.log_level.upper()
+    )
+
+    from rules import DEFAULT_RULES
+
+    socket_path = args.socket_path or default_socket_path()
+    with CheckDaemon(socket_path, DEFAULT_RULES) as server:
+        logging.warning(f"daemon 已启动，监听 {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+同一篇论文两个版本之间的格式问题对比：哪些问题改掉了、哪些是新出现的、哪些一直存在。
+
+1. 两个版本用同一个 watch.IncrementalChecker 检查，新版本中内容和样式都没变的段落
+   直接复用旧版本的检查结果，只检查改动过的段落；
+2. 段落按规范化文本（合并空白）的哈希对齐：先匹配首尾相同的段落，再以两边都只出现
+   一次的段落为锚点（patience diff，最长递增子序列 O(n log n)），锚点之间的区间递归处理，
+   很小的区间用 difflib 补充匹配；两边长度相同的未匹配区间按位置配对，视为"修改过的段落"；
+3. 对齐的段落之间按 (类别, 规则, 期望值, 实际值) 比较错误（多重集合），
+   只在旧版本中出现的为 removed（已修复），只在新版本中出现的为 added（新引入），
+   两边都有的为 persisting；被删除段落的错误算 removed，新增段落的错误算 added。
+   节格式的错误（记在段落 0 的错误块中）与文档级错误一样不按段落对齐，两个版本之间直接比较。
+
+    python diff_report.py 初稿.docx 二稿.docx
+    python diff_report.py 初稿.docx 二稿.docx --json diff.json --limit 100
+"""
+import difflib
+import json
+import sys
+from collections import Counter
+
+# 未匹配区间两边长度之积不超过这个值时用 difflib 补充匹配重复的段落
+SMALL_GAP = 10000
+
+ADDED = "added"
+REMOVED = "removed"
+PERSISTING = "persisting"
+
+STATUS_TEXT = {ADDED: "新引入", REMOVED: "已修复", PERSISTING: "仍存在"}
+
+# 这些类别的错误属于节（页面设置），不属于所在错误块的段落
+SECTION_CATEGORIES = ("节格式", "节")
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def _longest_increasing(pairs):
+    """pairs 按 a 下标排序，返回 b 下标严格递增的最长子序列。"""
+    import bisect
+
+    tails = []  # tails[k]: 长度为 k+1 的子序列结尾在 pairs 中的下标
+    tail_values = []
+    previous = [None] * len(pairs)
+    for index, (_, b_index) in enumerate(pairs):
+        position = bisect.bisect_left(tail_values, b_index)
+        if position > 0:
+            previous[index] = tails[position - 1]
+        if position == len(tails):
+            tails.append(index)
+            tail_values.append(b_index)
+        else:
+            tails[position] = index
+            tail_values[position] = b_index
+    result = []
+    index = tails[-1] if tails else None
+    while index is not None:
+        result.append(pairs[index])
+        index = previous[index]
+    result.reverse()
+    return result
+
+
+def align_sequences(a, b):
+    """
+    a、b 为可哈希元素的序列，返回匹配的 (i, j) 列表，i 和 j 都严格递增。
+    """
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        # 相同的开头和结尾
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo >= ahi or blo >= bhi:
+            continue
+
+        # 两边都只出现一次的元素作为锚点
+        a_counts = Counter(a[alo:ahi])
+        b_positions = {}
+        for j in range(blo, bhi):
+            b_positions[b[j]] = j if b[j] not in b_positions else None
+        anchors = [
+            (i, b_positions[a[i]])
+            for i in range(alo, ahi)
+            if a_counts[a[i]] == 1 and b_positions.get(a[i]) is not None
+        ]
+        anchors = _longest_increasing(anchors)
+        if anchors:
+            matches.extend(anchors)
+            bounds = [(alo - 1, blo - 1)] + anchors + [(ahi, bhi)]
+            for (i0, j0), (i1, j1) in zip(bounds, bounds[1:]):
+                if i1 - i0 > 1 and j1 - j0 > 1:
+                    stack.append((i0 + 1, i1, j0 + 1, j1))
+        elif (ahi - alo) * (bhi - blo) <= SMALL_GAP:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for block in matcher.get_matching_blocks():
+                for k in range(block.size):
+                    matches.append((alo + block.a + k, blo + block.b + k))
+    matches.sort()
+    return matches
+
+
+def align_paragraphs(old_texts, new_texts):
+    """
+    返回 {旧段落序号: (新段落序号, 是否文本相同)}。
+    文本相同的段落直接对齐；两次对齐之间长度相同的区间按位置配对，视为修改过的段落。
+    """
+    old_keys = [hash(normalize_text(text)) for text in old_texts]
+    new_keys = [hash(normalize_text(text)) for text in new_texts]
+    matches = align_sequences(old_keys, new_keys)
+    pairs = {}
+    bounds = [(-1, -1)] + matches + [(len(old_texts), len(new_texts))]
+    for (i0, j0), (i1, j1) in zip(bounds, bounds[1:]):
+        if i1 - i0 == j1 - j0 and i1 - i0 > 1:
+            for k in range(1, i1 - i0):
+                pairs[i0 + k] = (j0 + k, False)
+        if i1 < len(old_texts):
+            pairs[i1] = (j1, True)
+    return pairs
+
+
+def _finding_key(detail):
+    return detail["category"], detail["rule"], detail["expected"], detail["actual"]
+
+
+def _entries(block, detail, status, old_idx, new_idx):
+    return {
+        "status": status,
+        "old_para_idx": old_idx,
+        "new_para_idx": new_idx,
+        "style_name": block.get("style_name"),
+        "paragraph_text_snippet": block.get("paragraph_text_snippet"),
+        "category": detail["category"],
+        "rule": detail["rule"],
+        "expected": detail["expected"],
+        "actual": detail["actual"],
+        "run_text": detail.get("run_text"),
+        "location": detail.get("location"),
+    }
+
+
+def _group_findings(errors):
+    """
+    {段落序号: [(错误块, 错误)]}。节格式的错误不论记在哪个错误块中，都和文档级错误一起放在 -1 下，
+    它们的错误块换成不带段落信息的空块。
+    """
+    groups = {}
+    for block in errors:
+        para_idx = block["para_idx"]
+        for detail in block["details"]:
+            if detail["category"] in SECTION_CATEGORIES:
+                groups.setdefault(-1, []).append(({}, detail))
+            else:
+                groups.setdefault(para_idx, []).append((block, detail))
+    return groups
+
+
+def diff_results(old_errors, old_texts, new_errors, new_texts):
+    """
+    比较两次检查结果（按段落组织的错误列表）。返回
+    {"summary": {...}, "added": [...], "removed": [...], "persisting": [...]}。
+    """
+    old_groups = _group_findings(old_errors)
+    new_groups = _group_findings(new_errors)
+    pairs = align_paragraphs(old_texts, new_texts)
+    # 文档级和节格式的错误（都放在 -1 下）总是互相对应
+    pairs[-1] = (-1, True)
+    matched_new = {new_idx for new_idx, _ in pairs.values()}
+
+    result = {ADDED: [], REMOVED: [], PERSISTING: []}
+
+    for old_idx, old_findings in old_groups.items():
+        new_idx, _ = pairs.get(old_idx, (None, False))
+        new_findings = new_groups.get(new_idx, []) if new_idx is not None else []
+        remaining = Counter(_finding_key(detail) for _, detail in new_findings)
+        for old_block, detail in old_findings:
+            key = _finding_key(detail)
+            if remaining[key] > 0:
+                remaining[key] -= 1
+            else:
+                result[REMOVED].append(_entries(old_block, detail, REMOVED, old_idx, new_idx))
+
+    old_index_of = {new_idx: old_idx for old_idx, (new_idx, _) in pairs.items()}
+    for new_idx, new_findings in new_groups.items():
+        old_idx = old_index_of.get(new_idx)
+        old_findings = old_groups.get(old_idx, []) if old_idx is not None else []
+        remaining = Counter(_finding_key(detail) for _, detail in old_findings)
+        for new_block, detail in new_findings:
+            key = _finding_key(detail)
+            if remaining[key] > 0:
+                remaining[key] -= 1
+                result[PERSISTING].append(_entries(new_block, detail, PERSISTING, old_idx, new_idx))
+            else:
+                result[ADDED].append(_entries(new_block, detail, ADDED, old_idx, new_idx))
+
+    unchanged = sum(1 for _, same in pairs.values() if same) - 1
+    modified = len(pairs) - 1 - unchanged
+    result["summary"] = {
+        ADDED: len(result[ADDED]),
+        REMOVED: len(result[REMOVED]),
+        PERSISTING: len(result[PERSISTING]),
+        "paragraphs": {
+            "old": len(old_texts),
+            "new": len(new_texts),
+            "unchanged": unchanged,
+            "modified": modified,
+            "deleted": len(old_texts) - unchanged - modified,
+            "inserted": len(new_texts) - len(matched_new - {-1}),
+        },
+    }
+    return result
+
+
+def diff_documents(old_path, new_path, checker=None):
+    """检查两个版本并比较，返回 (diff_results 的结果, 新版本复用的段落数)。"""
+    from watch import IncrementalChecker
+
+    if checker is None:
+        from checking import FormatChecker
+        from rules import DEFAULT_RULES
+
+        checker = FormatChecker(DEFAULT_RULES)
+    incremental = IncrementalChecker(checker)
+    old_errors = incremental.check(old_path)
+    old_texts = incremental.paragraph_texts
+    new_errors = incremental.check(new_path)
+    new_texts = incremental.paragraph_texts
+    return diff_results(old_errors, old_texts, new_errors, new_texts), incremental.last_stats["reused"]
+
+
+def print_diff(diff, limit=50):
+    summary = diff["summary"]
+    paragraphs = summary["paragraphs"]
+    print(f"段落：旧版 {paragraphs['old']} 个，新版 {paragraphs['new']} 个；未改动 {paragraphs['unchanged']}，"
+          f"修改 {paragraphs['modified']}，删除 {paragraphs['deleted']}，新增 {paragraphs['inserted']}")
+    print(f"问题：已修复 {summary[REMOVED]}，新引入 {summary[ADDED]}，仍存在 {summary[PERSISTING]}")
+    for status in (ADDED, REMOVED, PERSISTING):
+        entries = diff[status]
+        if not entries:
+            continue
+        print(f"\n=== {STATUS_TEXT[status]} ({len(entries)}) ===")
+        rule_counts = Counter((entry["category"], entry["rule"]) for entry in entries)
+        for (category, rule), count in rule_counts.most_common():
+            print(f"  {count:>6}  [{category}] {rule}")
+        if status == PERSISTING:
+            continue
+        for entry in entries[:limit]:
+            para_idx = entry["new_para_idx"] if status == ADDED else entry["old_para_idx"]
+            where = f"段落 {para_idx + 1}" if para_idx is not None and para_idx >= 0 else "文档"
+            print(f"  - {where} ({entry['style_name']}) '{entry['paragraph_text_snippet']}' "
+                  f"[{entry['category']}] {entry['rule']}: 期望 {entry['expected']}，实际 {entry['actual']}")
+        if len(entries) > limit:
+            print(f"  …… 另有 {len(entries) - limit} 条")
+
+
+def main(argv=None):
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="对比同一文档两个版本的格式问题")
+    parser.add_argument("old_path", help="旧版本 .docx")
+    parser.add_argument("new_path", help="新版本 .docx")
+    parser.add_argument("--json", dest="json_path", default=None, help="把完整对比结果写入 JSON 文件")
+    parser.add_argument("--limit", type=int, default=50, help="每类最多列出的问题数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    diff, reused = diff_documents(args.old_path, args.new_path)
+    print_diff(diff, args.limit)
+    logging.info(f"新版本复用了 {reused} 个段落的检查结果")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(diff, f, ensure_ascii=False, default=str, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
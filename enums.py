@@ -0,0 +1,32 @@
+"""
+python-docx 段落枚举的轻量替身。
+
+rules.py 和 checking.py 只需要这些枚举的名字和取值，直接导入 docx.enum.text
+会连带导入整个 python-docx 与 lxml。这里的成员名和取值与 python-docx 1.x 保持一致，
+两者都是 int 子类，可以直接相互比较。
+"""
+from enum import IntEnum
+
+
+class WD_PARAGRAPH_ALIGNMENT(IntEnum):
+    LEFT = 0
+    CENTER = 1
+    RIGHT = 2
+    JUSTIFY = 3
+    DISTRIBUTE = 4
+    JUSTIFY_MED = 5
+    JUSTIFY_HI = 7
+    JUSTIFY_LOW = 8
+    THAI_JUSTIFY = 9
+
+
+WD_ALIGN_PARAGRAPH = WD_PARAGRAPH_ALIGNMENT
+
+
+class WD_LINE_SPACING(IntEnum):
+    SINGLE = 0
+    ONE_POINT_FIVE = 1
+    DOUBLE = 2
+    AT_LEAST = 3
+    EXACTLY = 4
+    MULTIPLE = 5
@@ -0,0 +1,472 @@
+"""
+把检查结果批量写入本地 SQLite 数据库，供全校/全届论文的统计查询。
+
+表结构（规范化，规则名和类别只保存一次）：
+
+    documents   一次检查的文档：路径、批次（如 "2024秋"）、内容哈希、规则集指纹、检查状态
+    paragraphs  有错误的段落：所属文档、段落序号、样式名、内容片段
+    rules       规则：规则名 + 类别
+    findings    错误：所属段落、规则、期望值、实际值、run 序号、高亮位置
+
+rules.name、paragraphs.style 和 findings.rule_id 上有索引。
+写入时先在内存中攒批，每攒够 batch_size 条错误在一个事务里用 executemany 写入。
+主键在写入事务中分配：BEGIN IMMEDIATE 取得写锁后读取各表当前最大的 id 并连续编号，
+不需要逐行取 lastrowid，百万行级别的导入只需要几秒，多个进程同时写入同一个数据库也不会冲突。
+
+同一 (路径, 批次) 的文档再次写入时替换旧结果。
+
+    python findings_store.py check findings.db 论文目录/ --batch 2024秋
+    python findings_store.py import findings.db results/*.json --batch 2024秋
+    python findings_store.py rules findings.db --style "标题 2" --batch 2024秋
+    python findings_store.py styles findings.db --rule font_size_pt
+    python findings_store.py documents findings.db --rule chinese_font --limit 20
+    python findings_store.py sql findings.db "SELECT count(*) FROM findings"
+
+只依赖标准库，查询不需要导入 python-docx。
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    batch TEXT NOT NULL DEFAULT '',
+    content_hash TEXT,
+    rules_hash TEXT,
+    checked_at REAL NOT NULL,
+    partial INTEGER NOT NULL DEFAULT 0,
+    stop_reason TEXT,
+    paragraphs_total INTEGER,
+    findings INTEGER NOT NULL DEFAULT 0,
+    elapsed_s REAL,
+    UNIQUE (path, batch)
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents (id),
+    para_idx INTEGER NOT NULL,
+    style TEXT,
+    snippet TEXT
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    UNIQUE (name, category)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    paragraph_id INTEGER NOT NULL REFERENCES paragraphs (id),
+    rule_id INTEGER NOT NULL REFERENCES rules (id),
+    expected TEXT,
+    actual TEXT,
+    run_idx INTEGER,
+    loc_start INTEGER,
+    loc_end INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_paragraphs_document ON paragraphs (document_id);
+CREATE INDEX IF NOT EXISTS idx_paragraphs_style ON paragraphs (style, document_id);
+CREATE INDEX IF NOT EXISTS idx_rules_name ON rules (name);
+CREATE INDEX IF NOT EXISTS idx_findings_rule ON findings (rule_id);
+CREATE INDEX IF NOT EXISTS idx_findings_paragraph ON findings (paragraph_id);
+"""
+
+
+def connect(db_path, readonly=False):
+    if readonly:
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"数据库 '{db_path}' 不存在")
+        # 路径中的 ?、#、% 等字符需要转义
+        uri = pathlib.Path(os.path.abspath(db_path)).as_uri()
+        return sqlite3.connect(f"{uri}?mode=ro", uri=True)
+    # 其他进程写入时最多等待 60 秒
+    conn = sqlite3.connect(db_path, timeout=60)
+    # WAL + NORMAL：批量写入时每个事务只需要一次 fsync，查询可以与写入并发
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class FindingsStore:
+    """
+    批量写入检查结果。用法：
+
+        with FindingsStore("findings.db") as store:
+            for path in paths:
+                store.add_result(path, checker.check_document(path), batch="2024秋")
+
+    batch_size: 内存中攒够这么多条错误就写入一次（一个事务）
+    """
+
+    def __init__(self, db_path, batch_size=50000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.conn = connect(db_path)
+        self._rule_ids = {
+            (name, category): rule_id
+            for rule_id, name, category in self.conn.execute("SELECT id, name, category FROM rules")
+        }
+        self._clear_pending()
+        self.documents_written = 0
+        self.findings_written = 0
+
+    def _max_id(self, table):
+        return self.conn.execute(f"SELECT coalesce(max(id), 0) FROM {table}").fetchone()[0]
+
+    def _clear_pending(self):
+        # 攒下的行不带主键：文档、段落按在本批次中的序号引用，错误按 (规则名, 类别) 引用规则，
+        # 写入时再换成数据库中的 id
+        self._documents = []
+        self._paragraphs = []
+        self._findings = []
+        # 本批次中文档的 (path, batch)，写入前先删除数据库中的旧结果
+        self._pending_keys = set()
+
+    def _insert_rules(self):
+        """写入本批次新出现的规则（可能已被其他进程写入），返回 (规则名, 类别) -> id。"""
+        rule_ids = dict(self._rule_ids)
+        for _, rule_key, *_ in self._findings:
+            if rule_key not in rule_ids:
+                self.conn.execute("INSERT OR IGNORE INTO rules (name, category) VALUES (?, ?)", rule_key)
+                rule_ids[rule_key] = self.conn.execute(
+                    "SELECT id FROM rules WHERE name = ? AND category = ?", rule_key
+                ).fetchone()[0]
+        return rule_ids
+
+    def add_result(self, doc_path, errors, batch="", content_hash=None, rules_hash=None, status=None):
+        """
+        记录一个文档的检查结果。errors 为 CheckResult 或同样结构的错误列表（如缓存的 JSON），
+        status 默认取 errors.status()。
+        """
+        if status is None:
+            status = errors.status() if hasattr(errors, "status") else {}
+        key = (str(doc_path), batch)
+        if key in self._pending_keys:
+            # 同一文档在本批次中重复出现，先写入前一次的结果，再由本次替换
+            self.flush()
+        self._pending_keys.add(key)
+        document_ref = len(self._documents)
+
+        finding_count = 0
+        for block in errors:
+            paragraph_ref = len(self._paragraphs)
+            self._paragraphs.append(
+                (document_ref, block["para_idx"], block.get("style_name"), block.get("paragraph_text_snippet"))
+            )
+            for detail in block["details"]:
+                location = detail.get("location") or (None, None)
+                self._findings.append(
+                    (paragraph_ref, (detail["rule"], detail["category"]),
+                     detail.get("expected"), detail.get("actual"), detail.get("run_idx"),
+                     location[0], location[1])
+                )
+                finding_count += 1
+
+        self._documents.append(
+            (str(doc_path), batch, content_hash, rules_hash, time.time(),
+             int(bool(status.get("partial"))), status.get("stop_reason"), status.get("paragraphs_total"),
+             finding_count, status.get("elapsed_s"))
+        )
+        if len(self._findings) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """把攒下的结果在一个事务中写入。"""
+        if not self._documents:
+            return
+        with self.conn:
+            # 先取得写锁再读取最大 id，其他进程在本事务提交前不能写入
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._delete_replaced()
+            rule_ids = self._insert_rules()
+            document_base = self._max_id("documents") + 1
+            paragraph_base = self._max_id("paragraphs") + 1
+            finding_base = self._max_id("findings") + 1
+            self.conn.executemany(
+                "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((document_base + i,) + row for i, row in enumerate(self._documents)),
+            )
+            self.conn.executemany(
+                "INSERT INTO paragraphs VALUES (?, ?, ?, ?, ?)",
+                ((paragraph_base + i, document_base + document_ref, para_idx, style, snippet)
+                 for i, (document_ref, para_idx, style, snippet) in enumerate(self._paragraphs)),
+            )
+            self.conn.executemany(
+                "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                # row 为 (段落序号, (规则名, 类别), expected, actual, run_idx, loc_start, loc_end)
+                ((finding_base + i, paragraph_base + row[0], rule_ids[row[1]]) + row[2:]
+                 for i, row in enumerate(self._findings)),
+            )
+        # 事务提交后才缓存新规则的 id
+        self._rule_ids = rule_ids
+        self.documents_written += len(self._documents)
+        self.findings_written += len(self._findings)
+        self._clear_pending()
+
+    def _delete_replaced(self):
+        old_ids = []
+        for path, batch in self._pending_keys:
+            old_ids += self.conn.execute(
+                "SELECT id FROM documents WHERE path = ? AND batch = ?", (path, batch)
+            ).fetchall()
+        if not old_ids:
+            return
+        self.conn.executemany(
+            "DELETE FROM findings WHERE paragraph_id IN (SELECT id FROM paragraphs WHERE document_id = ?)", old_ids
+        )
+        self.conn.executemany("DELETE FROM paragraphs WHERE document_id = ?", old_ids)
+        self.conn.executemany("DELETE FROM documents WHERE id = ?", old_ids)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ---------------------------------------------------------------- 查询
+
+def _filters(style=None, rule=None, batch=None, category=None):
+    clauses, params = [], []
+    if style is not None:
+        clauses.append("p.style = ?")
+        params.append(style)
+    if rule is not None:
+        clauses.append("r.name = ?")
+        params.append(rule)
+    if category is not None:
+        clauses.append("r.category = ?")
+        params.append(category)
+    if batch is not None:
+        clauses.append("d.batch = ?")
+        params.append(batch)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+_JOIN = """
+FROM findings f
+JOIN rules r ON r.id = f.rule_id
+JOIN paragraphs p ON p.id = f.paragraph_id
+JOIN documents d ON d.id = p.document_id
+"""
+
+
+def top_rules(conn, style=None, batch=None, category=None, limit=20):
+    """[(规则, 类别, 错误数, 涉及文档数)]，按错误数从多到少。"""
+    where, params = _filters(style=style, batch=batch, category=category)
+    return conn.execute(
+        f"SELECT r.name, r.category, count(*) AS n, count(DISTINCT d.id) {_JOIN} {where} "
+        f"GROUP BY r.id ORDER BY n DESC LIMIT ?",
+        params + [limit],
+    ).fetchall()
+
+
+def top_styles(conn, rule=None, batch=None, category=None, limit=20):
+    """[(样式, 错误数, 涉及文档数)]，按错误数从多到少。"""
+    where, params = _filters(rule=rule, batch=batch, category=category)
+    return conn.execute(
+        f"SELECT p.style, count(*) AS n, count(DISTINCT d.id) {_JOIN} {where} "
+        f"GROUP BY p.style ORDER BY n DESC LIMIT ?",
+        params + [limit],
+    ).fetchall()
+
+
+def top_documents(conn, rule=None, style=None, batch=None, category=None, limit=20):
+    """[(文档路径, 批次, 错误数)]，按错误数从多到少。"""
+    where, params = _filters(style=style, rule=rule, batch=batch, category=category)
+    return conn.execute(
+        f"SELECT d.path, d.batch, count(*) AS n {_JOIN} {where} "
+        f"GROUP BY d.id ORDER BY n DESC LIMIT ?",
+        params + [limit],
+    ).fetchall()
+
+
+def summary(conn, batch=None):
+    """{"documents", "partial", "paragraphs", "findings", "rules"}"""
+    where, params = ("WHERE batch = ?", [batch]) if batch is not None else ("", [])
+    documents, partial, findings = conn.execute(
+        f"SELECT count(*), coalesce(sum(partial), 0), coalesce(sum(findings), 0) FROM documents {where}", params
+    ).fetchone()
+    return {
+        "documents": documents,
+        "partial": partial,
+        "findings": findings,
+        "rules": conn.execute("SELECT count(*) FROM rules").fetchone()[0],
+        "batches": [row[0] for row in conn.execute("SELECT DISTINCT batch FROM documents ORDER BY batch")],
+    }
+
+
+def _print_table(header, rows):
+    rows = [["" if value is None else str(value) for value in row] for row in rows]
+    widths = [max([_display_width(h)] + [_display_width(row[i]) for row in rows]) for i, h in enumerate(header)]
+
+    def line(values):
+        return "  ".join(value + " " * (width - _display_width(value)) for value, width in zip(values, widths))
+
+    print(line(header))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print(line(row))
+
+
+def _display_width(text):
+    # 中文等全角字符在终端中占两列
+    return sum(2 if ord(ch) > 0x2E7F else 1 for ch in text)
+
+
+# ---------------------------------------------------------------- 导入
+
+def _iter_docx(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(".docx") and not name.startswith("~$"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def check_into_store(store, paths, rules, batch=""):
+    """逐个检查文档并写入 store，返回检查的文档数。"""
+    import hashlib
+
+    from checking import FormatChecker
+    from result_cache import hash_file, rules_fingerprint
+
+    checker = FormatChecker(rules)
+    rules_hash = rules_fingerprint(rules)
+    count = 0
+    for path in _iter_docx(paths):
+        hasher = hashlib.sha256()
+        try:
+            hash_file(path, hasher)
+            content_hash = hasher.hexdigest()
+        except OSError:
+            content_hash = None
+        errors = checker.check_document(path)
+        store.add_result(path, errors, batch=batch, content_hash=content_hash, rules_hash=rules_hash)
+        count += 1
+    return count
+
+
+def import_json_into_store(store, json_paths, batch=""):
+    """
+    导入保存下来的检查结果：错误列表本身（缓存文件），或 client.py --json 输出的
+    {"status": ..., "errors": [...]}。文档路径记为 JSON 文件路径。
+    """
+    count = 0
+    for path in json_paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            store.add_result(path, data["errors"], batch=batch, status=data.get("status") or {})
+        else:
+            store.add_result(path, data, batch=batch, status={})
+        count += 1
+    return count
+
+
+def main(argv=None):
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="检查结果的 SQLite 存储与统计查询")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("check", help="检查文档（或目录下所有 .docx）并写入数据库")
+    p.add_argument("db")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--batch", default="", help="批次标签，例如 2024秋")
+
+    p = sub.add_parser("import", help="导入保存的 JSON 检查结果")
+    p.add_argument("db")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--batch", default="")
+
+    for name, help_text in (("rules", "错误最多的规则"), ("styles", "错误最多的样式"),
+                            ("documents", "错误最多的文档")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("db")
+        p.add_argument("--style", default=None)
+        p.add_argument("--rule", default=None)
+        p.add_argument("--category", default=None)
+        p.add_argument("--batch", default=None)
+        p.add_argument("--limit", type=int, default=20)
+
+    p = sub.add_parser("summary", help="文档数、错误数和批次")
+    p.add_argument("db")
+    p.add_argument("--batch", default=None)
+
+    p = sub.add_parser("sql", help="执行只读 SQL 查询")
+    p.add_argument("db")
+    p.add_argument("query")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    if args.command in ("check", "import"):
+        started = time.perf_counter()
+        with FindingsStore(args.db) as store:
+            if args.command == "check":
+                from rules import DEFAULT_RULES
+
+                count = check_into_store(store, args.paths, DEFAULT_RULES, batch=args.batch)
+            else:
+                count = import_json_into_store(store, args.paths, batch=args.batch)
+            store.flush()
+            findings = store.findings_written
+        print(f"写入 {count} 个文档、{findings} 条错误，用时 {time.perf_counter() - started:.2f} 秒")
+        return 0
+
+    try:
+        conn = connect(args.db, readonly=True)
+    except FileNotFoundError as e:
+        print(f"Err: {e}")
+        return 1
+    with conn:
+        if args.command == "rules":
+            if args.rule is not None:
+                print("Err: rules 查询不支持 --rule，请用 styles 或 documents")
+                return 1
+            rows = top_rules(conn, style=args.style, batch=args.batch, category=args.category, limit=args.limit)
+            _print_table(["规则", "类别", "错误数", "文档数"], rows)
+        elif args.command == "styles":
+            if args.style is not None:
+                print("Err: styles 查询不支持 --style，请用 rules 或 documents")
+                return 1
+            rows = top_styles(conn, rule=args.rule, batch=args.batch, category=args.category, limit=args.limit)
+            _print_table(["样式", "错误数", "文档数"], rows)
+        elif args.command == "documents":
+            rows = top_documents(conn, rule=args.rule, style=args.style, batch=args.batch,
+                                 category=args.category, limit=args.limit)
+            _print_table(["文档", "批次", "错误数"], rows)
+        elif args.command == "summary":
+            info = summary(conn, batch=args.batch)
+            print(f"文档 {info['documents']} 个（其中不完整 {info['partial']} 个），错误 {info['findings']} 条，"
+                  f"规则 {info['rules']} 条")
+            print(f"批次: {', '.join(b or '(无)' for b in info['batches'])}")
+        else:
+            try:
+                cursor = conn.execute(args.query)
+            except sqlite3.Error as e:
+                print(f"Err: {e}")
+                return 1
+            header = [column[0] for column in cursor.description or ()]
+            _print_table(header, cursor.fetchall())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+交互式 HTML 报告：一个自包含的 HTML 文件，错误数据以紧凑的按列 JSON 形式 gzip 压缩后
+base64 内嵌，由页面中的一小段脚本解压（DecompressionStream）后渲染。
+
+- 段落文本、样式名、规则名、期望值和实际值都放进去重后的表中，错误只记编号和偏移；
+- 列表是虚拟滚动的，只创建可见的几十行，十万条错误也能立即打开；
+- 可以按类别、规则、样式过滤，点击某一行时才计算并显示高亮的上下文。
+
+    python checking.py 论文.docx --html report.html --report-format interactive
+"""
+import base64
+import gzip
+import html
+import json
+
+from result import run_text_of, snippet_of
+
+# 高亮时在错误位置前后各显示的字符数，与 FormatChecker 的文本报告一致
+CONTEXT_CHARS = 20
+
+
+def build_report_data(errors, notice=""):
+    """
+    把按段落组织的错误列表转成按列存放的字典：
+
+    - strings：样式、类别、规则、期望值、实际值共用的字符串表；texts：去重后的段落文本；
+    - paragraphs：每个出错段落一行（段落序号、样式、文本编号、摘要长度），
+      摘要不是文本开头时放在 snippet_texts 中；
+    - findings：每条错误一行（所在 paragraphs 行、类别、规则、期望、实际、run 序号、
+      高亮起止位置，缺失为 -1），run_text 不能由位置截出时放在 run_texts 中。
+    """
+    string_ids = {}
+    text_ids = {}
+    strings = []
+    texts = []
+
+    def intern(value):
+        value = str(value)
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    paragraphs = {"para_idx": [], "style": [], "text": [], "snippet": []}
+    snippet_texts = {}
+    findings = {
+        "paragraph": [], "category": [], "rule": [], "expected": [], "actual": [],
+        "run": [], "start": [], "end": [],
+    }
+    run_texts = {}
+    document_errors = []
+
+    for block in errors:
+        if block["para_idx"] == -1:
+            for detail in block["details"]:
+                document_errors.append([block.get("paragraph_text_snippet") or "", detail["rule"],
+                                        str(detail["expected"]), str(detail["actual"])])
+            continue
+
+        full_text = block.get("full_text") or ""
+        text_id = text_ids.get(full_text)
+        if text_id is None:
+            text_id = text_ids[full_text] = len(texts)
+            texts.append(full_text)
+        row = len(paragraphs["para_idx"])
+        paragraphs["para_idx"].append(block["para_idx"])
+        paragraphs["style"].append(intern(block.get("style_name")))
+        paragraphs["text"].append(text_id)
+        snippet = block.get("paragraph_text_snippet") or ""
+        paragraphs["snippet"].append(len(snippet))
+        if snippet != snippet_of(full_text, len(snippet)):
+            snippet_texts[row] = snippet
+
+        # ErrorBlock 的原始 details 不带可推导的 run_text，不必逐条展开
+        details = getattr(block, "raw_details", None)
+        if details is None:
+            details = block["details"]
+        for detail in details:
+            location = detail.get("location")
+            if "run_idx" in detail and "run_text" in detail:
+                if not location or run_text_of(full_text, location) != detail["run_text"]:
+                    run_texts[len(findings["paragraph"])] = detail["run_text"]
+            findings["paragraph"].append(row)
+            findings["category"].append(intern(detail["category"]))
+            findings["rule"].append(intern(detail["rule"]))
+            findings["expected"].append(intern(detail["expected"]))
+            findings["actual"].append(intern(detail["actual"]))
+            findings["run"].append(detail.get("run_idx", -1))
+            findings["start"].append(location[0] if location else -1)
+            findings["end"].append(location[1] if location else -1)
+
+    return {
+        "version": 1,
+        "notice": notice,
+        "context_chars": CONTEXT_CHARS,
+        "strings": strings,
+        "texts": texts,
+        "paragraphs": paragraphs,
+        "snippet_texts": snippet_texts,
+        "findings": findings,
+        "run_texts": run_texts,
+        "document_errors": document_errors,
+    }
+
+
+def encode_report_data(data, compress=True):
+    """返回 (编码方式, base64 文本)，编码方式为 "gzip" 或 "json"。"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if compress:
+        return "gzip", base64.b64encode(gzip.compress(payload, compresslevel=6, mtime=0)).decode("ascii")
+    return "json", base64.b64encode(payload).decode("ascii")
+
+
+def render_report(data, title="格式检查报告", compress=True):
+    encoding, encoded = encode_report_data(data, compress)
+    return (REPORT_TEMPLATE
+            .replace("__TITLE__", html.escape(title))
+            .replace("__ENCODING__", encoding)
+            .replace("__DATA__", encoded))
+
+
+def write_report(errors, filename, notice="", title="格式检查报告", compress=True):
+    """生成交互式报告，返回写入的字节数。"""
+    content = render_report(build_report_data(errors, notice), title, compress)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(content)
+    return len(content.encode("utf-8"))
+
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="UTF-8"><title>__TITLE__</title>
+<style>
+  body { font-family: 'Segoe UI', Arial, sans-serif; margin: 20px; background-color: #f4f4f4; color: #333; }
+  h1 { color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
+  .document-error { background-color: #e74c3c; color: white; padding: 10px 15px; margin-bottom: 10px; border-radius: 5px; }
+  #toolbar { display: flex; gap: 12px; align-items: center; flex-wrap: wrap; margin-bottom: 10px; }
+  #toolbar select { max-width: 320px; padding: 4px; }
+  #count { color: #7f8c8d; }
+  #list { height: 60vh; overflow-y: auto; position: relative; background: #fff; border: 1px solid #bdc3c7; border-radius: 5px; }
+  #spacer { position: relative; }
+  .row { position: absolute; left: 0; right: 0; height: 26px; line-height: 26px; padding: 0 10px; white-space: nowrap;
+         overflow: hidden; text-overflow: ellipsis; border-bottom: 1px solid #eee; cursor: pointer; font-size: 0.9em; box-sizing: border-box; }
+  .row:hover { background: #f1f1f1; }
+  .row.selected { background: #d6eaf8; }
+  .para { color: #3498db; display: inline-block; width: 7em; }
+  .style-name { color: #7f8c8d; display: inline-block; width: 10em; overflow: hidden; vertical-align: top; }
+  .error-category { font-weight: 500; color: #8e44ad; }
+  .error-rule { color: #7f8c8d; }
+  .expected { color: #27ae60; font-weight: 500; }
+  .actual { color: #c0392b; font-weight: 500; }
+  .run-info { font-size: 0.85em; color: #95a5a6; }
+  #detail { margin-top: 12px; background: #fff; border: 1px solid #bdc3c7; border-radius: 5px; padding: 12px 15px; min-height: 3em; }
+  .context-snippet { font-family: 'Courier New', Courier, monospace; font-size: 0.9em; color: #555; display: block; margin-top: 5px; white-space: pre-wrap; word-break: break-all; }
+  .char-highlight { background-color: #f1c40f; color: #c0392b; font-weight: bold; padding: 0.1em 0; border-radius: 0.2em; }
+</style>
+</head><body><h1>__TITLE__</h1>
+<div id="notices"></div>
+<div id="toolbar">
+  <label>类别 <select id="filter-category"></select></label>
+  <label>规则 <select id="filter-rule"></select></label>
+  <label>样式 <select id="filter-style"></select></label>
+  <span id="count">正在加载……</span>
+</div>
+<div id="list"><div id="spacer"></div></div>
+<div id="detail">点击一条错误查看上下文。</div>
+<script id="report-data" type="application/octet-stream" data-encoding="__ENCODING__">__DATA__</script>
+<script>
+(async function () {
+  "use strict";
+  const ROW_HEIGHT = 26, OVERSCAN = 10;
+  const $ = (id) => document.getElementById(id);
+  const escapeHtml = (s) => String(s).replace(/[&<>"']/g,
+    (c) => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"})[c]);
+
+  async function loadData() {
+    const node = $("report-data");
+    const binary = atob(node.textContent.trim());
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    if (node.dataset.encoding !== "gzip") return JSON.parse(new TextDecoder().decode(bytes));
+    if (typeof DecompressionStream === "undefined") throw new Error("浏览器不支持 DecompressionStream，请使用较新的浏览器打开");
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+    return JSON.parse(await new Response(stream).text());
+  }
+
+  let data;
+  try {
+    data = await loadData();
+  } catch (e) {
+    $("count").textContent = "无法读取报告数据：" + e.message;
+    return;
+  }
+  const S = data.strings, T = data.texts, P = data.paragraphs, F = data.findings;
+  const total = F.paragraph.length;
+
+  const notices = [];
+  if (data.notice) notices.push(data.notice);
+  for (const [snippet, rule, expected, actual] of data.document_errors) notices.push(snippet + ": " + actual);
+  $("notices").innerHTML = notices.map((n) => "<div class='document-error'>" + escapeHtml(n) + "</div>").join("");
+
+  const paragraphText = (row) => T[P.text[row]];
+  // 位置和摘要长度是 Python 字符串的下标（按码位），JS 字符串按 UTF-16 编码单元计数：
+  // 含有 BMP 以外字符（emoji、扩展区汉字）的文本先拆成码位数组再切片
+  const SURROGATE = /[\\uD800-\\uDFFF]/;
+  const codePoints = (text) => SURROGATE.test(text) ? Array.from(text) : text;
+  const joined = (part) => typeof part === "string" ? part : part.join("");
+  const snippetOf = (row) => (row in data.snippet_texts) ? data.snippet_texts[row]
+    : joined(codePoints(paragraphText(row)).slice(0, P.snippet[row])).replace(/\\n/g, " ");
+  function runTextOf(i) {
+    if (F.run[i] < 0) return "";
+    if (i in data.run_texts) return data.run_texts[i];
+    if (F.start[i] < 0) return "";
+    return joined(codePoints(paragraphText(F.paragraph[i])).slice(F.start[i], F.end[i]).slice(0, 20)).replace(/\\n/g, " ");
+  }
+  function highlight(text, start, end) {
+    const context = data.context_chars;
+    const chars = codePoints(text);
+    const piece = (from, to) => escapeHtml(joined(chars.slice(from, to)));
+    start = Math.max(0, Math.min(start, chars.length));
+    end = Math.max(0, Math.min(end, chars.length));
+    if (start > end) [start, end] = [end, start];
+    const from = Math.max(0, start - context), to = Math.min(chars.length, end + context);
+    const head = from > 0 ? "..." : "", tail = to < chars.length ? "..." : "";
+    const marked = start < end ? "<span class='char-highlight'>" + piece(start, end) + "</span>" : "";
+    return head + piece(from, start) + marked + piece(end, to) + tail;
+  }
+
+  // 过滤项：按出现次数从多到少
+  const FILTERS = ["category", "rule", "style"];
+  const styleOf = (i) => P.style[F.paragraph[i]];
+  function fillSelect(name, column) {
+    const counts = new Map();
+    for (let i = 0; i < total; i++) {
+      const key = column ? column[i] : styleOf(i);
+      counts.set(key, (counts.get(key) || 0) + 1);
+    }
+    const options = [...counts.entries()].sort((a, b) => b[1] - a[1]);
+    $("filter-" + name).innerHTML = "<option value=''>全部 (" + total + ")</option>" + options.map(
+      ([key, count]) => "<option value='" + key + "'>" + escapeHtml(S[key]) + " (" + count + ")</option>").join("");
+    $("filter-" + name).addEventListener("change", applyFilters);
+  }
+
+  let visible = new Int32Array(0);
+  let selected = -1;
+  const list = $("list"), spacer = $("spacer");
+
+  function applyFilters() {
+    const wanted = {};
+    for (const name of FILTERS) {
+      const value = $("filter-" + name).value;
+      wanted[name] = value === "" ? -1 : Number(value);
+    }
+    const rows = new Int32Array(total);
+    let n = 0;
+    for (let i = 0; i < total; i++) {
+      if (wanted.category >= 0 && F.category[i] !== wanted.category) continue;
+      if (wanted.rule >= 0 && F.rule[i] !== wanted.rule) continue;
+      if (wanted.style >= 0 && styleOf(i) !== wanted.style) continue;
+      rows[n++] = i;
+    }
+    visible = rows.subarray(0, n);
+    $("count").textContent = "共 " + total + " 个问题，显示 " + n + " 个";
+    spacer.style.height = (n * ROW_HEIGHT) + "px";
+    list.scrollTop = 0;
+    draw();
+  }
+
+  function rowHtml(i, position) {
+    const row = F.paragraph[i];
+    let run = "";
+    if (F.run[i] >= 0) {
+      const text = runTextOf(i);
+      run = " <span class='run-info'>Run " + (F.run[i] + 1) + (text ? " ('" + escapeHtml(text) + "')" : "") + "</span>";
+    }
+    return "<div class='row" + (i === selected ? " selected" : "") + "' data-i='" + i + "' style='top:" + (position * ROW_HEIGHT) + "px'>"
+      + "<span class='para'>段落 " + (P.para_idx[row] + 1) + "</span>"
+      + "<span class='style-name'>" + escapeHtml(S[P.style[row]]) + "</span> "
+      + "<span class='error-category'>[" + escapeHtml(S[F.category[i]]) + "]</span> "
+      + "<span class='error-rule'>" + escapeHtml(S[F.rule[i]]) + "</span>："
+      + "期望 <span class='expected'>" + escapeHtml(S[F.expected[i]]) + "</span>，"
+      + "实际 <span class='actual'>" + escapeHtml(S[F.actual[i]]) + "</span>" + run + "</div>";
+  }
+
+  let pending = false;
+  function draw() {
+    pending = false;
+    const first = Math.max(0, Math.floor(list.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(visible.length, Math.ceil((list.scrollTop + list.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+    const parts = [];
+    for (let position = first; position < last; position++) parts.push(rowHtml(visible[position], position));
+    spacer.innerHTML = parts.join("");
+  }
+  list.addEventListener("scroll", () => {
+    if (!pending) { pending = true; requestAnimationFrame(draw); }
+  });
+
+  list.addEventListener("click", (event) => {
+    const node = event.target.closest(".row");
+    if (!node) return;
+    selected = Number(node.dataset.i);
+    const row = F.paragraph[selected];
+    let html = "<div><b>段落 " + (P.para_idx[row] + 1) + "</b> <span class='style-name'>(样式: '"
+      + escapeHtml(S[P.style[row]]) + "')</span></div><div>内容预览: '" + escapeHtml(snippetOf(row)) + "...'</div>"
+      + "<div><span class='error-category'>[" + escapeHtml(S[F.category[selected]]) + "]</span> "
+      + "<span class='error-rule'>" + escapeHtml(S[F.rule[selected]]) + "</span>：期望 <span class='expected'>"
+      + escapeHtml(S[F.expected[selected]]) + "</span>，实际 <span class='actual'>" + escapeHtml(S[F.actual[selected]]) + "</span></div>";
+    if (F.start[selected] >= 0) {
+      html += "<span class='context-snippet'>" + highlight(paragraphText(row), F.start[selected], F.end[selected]) + "</span>";
+    }
+    $("detail").innerHTML = html;
+    draw();
+  });
+
+  fillSelect("category", F.category);
+  fillSelect("rule", F.rule);
+  fillSelect("style", null);
+  applyFilters();
+})();
+</script>
+</body></html>
+"""
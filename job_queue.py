@@ -0,0 +1,378 @@
+"""
+基于共享目录的检查任务队列，多台机器挂载同一目录即可一起处理，不需要消息中间件。
+
+目录结构：
+
+    incoming/  待检查的 .docx（submit 先写临时文件再改名放入）
+    leased/    正在检查的任务，文件名为 "<任务>@<第几次尝试>@<worker>"
+    done/      检查完的任务，结果写在旁边的 "<任务>.json"
+    failed/    检查时抛出异常、或多次因 worker 崩溃而超时的任务，原因写在旁边的 "<任务>.json"
+
+领取任务就是把文件从 incoming/ rename 到 leased/：rename 是原子的，多个 worker 同时
+领取同一个任务时只有一个成功，其余得到 FileNotFoundError 后继续尝试下一个。
+worker 检查期间定期更新租约文件的 mtime 作为心跳；mtime 超过 lease_timeout 没更新的
+租约视为 worker 已崩溃，由任意 worker 用同样的 rename 收回到 incoming/（超过
+max_attempts 次则移到 failed/）。判断超时时用队列目录所在文件系统的时钟，
+各节点之间的时钟偏差不影响判断。
+
+检查一个文档时抛出异常（文档内容无法解析等）的任务直接移到 failed/，结果中记录异常和
+traceback，worker 继续处理后面的任务，不会因为一个坏文档反复崩溃。
+
+租约被收回后原 worker 的心跳会失败，它会取消检查并放弃结果；结果文件都是先写临时
+文件再改名，即使两个 worker 都完成了同一个任务，done/ 中也只会有一份完整的结果。
+
+    python job_queue.py submit /mnt/queue 论文目录/*.docx
+    python job_queue.py work /mnt/queue --processes 4
+    python job_queue.py work /mnt/queue --exit-when-empty
+    python job_queue.py status /mnt/queue
+
+结果 JSON 为 {"status", "errors", "worker", "finished_at"}，可以直接用
+findings_store.py import 导入。
+"""
+import json
+import logging
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import traceback
+
+INCOMING = "incoming"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+LEASE_SEPARATOR = "@"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}".replace(LEASE_SEPARATOR, "_")
+
+
+def parse_job_name(name):
+    """incoming/ 或 leased/ 中的文件名 -> (任务名, 已尝试次数, worker)。"""
+    parts = name.split(LEASE_SEPARATOR)
+    job = parts[0]
+    attempts = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    worker = parts[2] if len(parts) > 2 else None
+    return job, attempts, worker
+
+
+class JobQueue:
+    def __init__(self, root, lease_timeout=300, max_attempts=3):
+        self.root = root
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        for name in (INCOMING, LEASED, DONE, FAILED):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def path(self, state, name=""):
+        return os.path.join(self.root, state, name)
+
+    def submit(self, doc_path, job_name=None):
+        """复制文档到 incoming/，返回任务名。同名任务已在队列中时覆盖。"""
+        job = (job_name or os.path.basename(doc_path)).replace(LEASE_SEPARATOR, "_")
+        tmp_path = self.path(INCOMING, f".{job}.{os.getpid()}.tmp")
+        shutil.copyfile(doc_path, tmp_path)
+        os.replace(tmp_path, self.path(INCOMING, job))
+        return job
+
+    def _list(self, state):
+        try:
+            return sorted(name for name in os.listdir(self.path(state)) if not name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def claim(self, worker_id):
+        """领取一个任务，返回租约文件名；队列为空时返回 None。"""
+        for name in self._list(INCOMING):
+            job, attempts, _ = parse_job_name(name)
+            lease_name = LEASE_SEPARATOR.join((job, str(attempts + 1), worker_id))
+            try:
+                os.rename(self.path(INCOMING, name), self.path(LEASED, lease_name))
+            except FileNotFoundError:
+                # 被其他 worker 抢先领取
+                continue
+            # 领取时刷新 mtime，文件的 mtime 原本是提交时间
+            os.utime(self.path(LEASED, lease_name))
+            return lease_name
+        return None
+
+    def heartbeat(self, lease_name):
+        """续租；租约已被收回时返回 False。"""
+        try:
+            os.utime(self.path(LEASED, lease_name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def filesystem_now(self):
+        """队列目录所在文件系统的当前时间（NFS 等共享目录上是服务器时钟）。"""
+        clock_path = os.path.join(self.root, ".clock")
+        with open(clock_path, "a"):
+            pass
+        os.utime(clock_path)
+        return os.stat(clock_path).st_mtime
+
+    def stale_leases(self):
+        """[(租约文件名, 已过期秒数)]"""
+        now = self.filesystem_now()
+        stale = []
+        for name in self._list(LEASED):
+            try:
+                age = now - os.stat(self.path(LEASED, name)).st_mtime
+            except FileNotFoundError:
+                continue
+            if age > self.lease_timeout:
+                stale.append((name, age - self.lease_timeout))
+        return stale
+
+    def reclaim_stale(self):
+        """收回超时的租约，返回收回的任务数。"""
+        reclaimed = 0
+        for lease_name, _ in self.stale_leases():
+            job, attempts, worker = parse_job_name(lease_name)
+            if attempts >= self.max_attempts:
+                target = self.path(FAILED, job)
+            else:
+                target = self.path(INCOMING, LEASE_SEPARATOR.join((job, str(attempts))))
+            try:
+                os.rename(self.path(LEASED, lease_name), target)
+            except FileNotFoundError:
+                # 已被其他 worker 收回，或原 worker 刚好完成
+                continue
+            reclaimed += 1
+            if attempts >= self.max_attempts:
+                _write_json(self.path(FAILED, f"{job}.json"), {
+                    "reason": f"worker 崩溃或超时 {attempts} 次",
+                    "last_worker": worker,
+                })
+                logging.warning(f"任务 '{job}' 已失败 {attempts} 次，移到 {FAILED}/")
+            else:
+                logging.info(f"收回 worker '{worker}' 超时的任务 '{job}'")
+        return reclaimed
+
+    def complete(self, lease_name, result):
+        """写入结果并把任务移到 done/；租约已被收回时返回 False。"""
+        return self._finish(lease_name, DONE, result)
+
+    def fail(self, lease_name, result):
+        """写入失败原因并把任务移到 failed/；租约已被收回时返回 False。"""
+        return self._finish(lease_name, FAILED, result)
+
+    def _finish(self, lease_name, state, result):
+        job, _, _ = parse_job_name(lease_name)
+        result_path = self.path(state, f"{job}.json")
+        # 租约移走之后才发布结果，租约已被收回时不留下结果 JSON
+        tmp_path = _write_tmp_json(result_path, result)
+        try:
+            os.rename(self.path(LEASED, lease_name), self.path(state, job))
+        except FileNotFoundError:
+            os.unlink(tmp_path)
+            return False
+        os.replace(tmp_path, result_path)
+        return True
+
+    def counts(self):
+        """各状态的任务数（done/ 和 failed/ 中的结果 JSON 不计入）。"""
+        return {
+            state: sum(1 for name in self._list(state) if not name.endswith(".json"))
+            for state in (INCOMING, LEASED, DONE, FAILED)
+        }
+
+
+def _write_tmp_json(path, data):
+    """写到 path 所在目录中的隐藏临时文件（_list 不列出），返回临时文件的路径。"""
+    tmp_path = f"{os.path.join(os.path.dirname(path), '.' + os.path.basename(path))}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    return tmp_path
+
+
+def _write_json(path, data):
+    os.replace(_write_tmp_json(path, data), path)
+
+
+class _Heartbeat(threading.Thread):
+    """检查期间定期续租；续租失败（租约被收回）时设置 lost，用作 check_document 的 cancel_event。"""
+
+    def __init__(self, queue, lease_name):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.lease_name = lease_name
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        interval = max(self.queue.lease_timeout / 3, 0.1)
+        while not self._stopped.wait(interval):
+            if not self.queue.heartbeat(self.lease_name):
+                self.lost.set()
+                return
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def work(queue, worker_id=None, rules=None, poll_interval=2.0, exit_when_empty=False,
+         time_budget_s=None, stop_event=None):
+    """worker 主循环，返回处理完的任务数。"""
+    from checking import FormatChecker
+
+    if rules is None:
+        from rules import DEFAULT_RULES
+
+        rules = DEFAULT_RULES
+    worker_id = worker_id or default_worker_id()
+    # 只记录进程最大常驻内存（几乎没有开销），结果的 status 中可以看到哪个文档让内存上涨
+    checker = FormatChecker(rules, memory_accounting="rss")
+    checker.warm_up()
+    processed = 0
+    next_reclaim = 0.0
+    while stop_event is None or not stop_event.is_set():
+        if time.monotonic() >= next_reclaim:
+            queue.reclaim_stale()
+            next_reclaim = time.monotonic() + queue.lease_timeout / 2
+
+        lease_name = queue.claim(worker_id)
+        if lease_name is None:
+            if exit_when_empty and not queue.counts()[LEASED]:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        job, attempt, _ = parse_job_name(lease_name)
+        logging.info(f"[{worker_id}] 开始检查 '{job}'（第 {attempt} 次）")
+        heartbeat = _Heartbeat(queue, lease_name)
+        heartbeat.start()
+        try:
+            errors = checker.check_document(
+                queue.path(LEASED, lease_name), time_budget_s=time_budget_s, cancel_event=heartbeat.lost
+            )
+        except Exception as e:
+            # 同一文档重试也会失败，直接移到 failed/，继续处理后面的任务
+            logging.exception(f"[{worker_id}] 检查 '{job}' 时出错")
+            errors = None
+            failure = {
+                "reason": f"检查时出错: {type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(),
+                "worker": worker_id,
+                "finished_at": time.time(),
+            }
+        finally:
+            heartbeat.stop()
+        if heartbeat.lost.is_set():
+            logging.warning(f"[{worker_id}] 任务 '{job}' 的租约已被收回，放弃结果")
+            continue
+        if errors is None:
+            if queue.fail(lease_name, failure):
+                logging.warning(f"[{worker_id}] 任务 '{job}' 移到 {FAILED}/")
+            continue
+
+        result = {"status": errors.status(), "errors": errors, "worker": worker_id, "finished_at": time.time()}
+        if queue.complete(lease_name, result):
+            processed += 1
+            logging.info(f"[{worker_id}] 完成 '{job}'：{errors.findings} 个问题")
+    return processed
+
+
+def _load_rules(rules_source, rules_cache):
+    """--rules 指定的规则集；各 worker 进程从 --rules-cache 中读取同一份编译结果。"""
+    if rules_source is None:
+        return None
+    from compiled_rules import load_compiled_rules
+
+    return load_compiled_rules(rules_source, rules_cache)
+
+
+def _work_process(root, lease_timeout, max_attempts, worker_id, rules_source, rules_cache,
+                  poll_interval, exit_when_empty, time_budget_s):
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.INFO)
+    queue = JobQueue(root, lease_timeout, max_attempts)
+    work(queue, worker_id, rules=_load_rules(rules_source, rules_cache), poll_interval=poll_interval,
+         exit_when_empty=exit_when_empty, time_budget_s=time_budget_s)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="基于共享目录的检查任务队列")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("submit", help="提交文档")
+    p.add_argument("queue")
+    p.add_argument("paths", nargs="+")
+
+    p = sub.add_parser("work", help="领取并检查任务")
+    p.add_argument("queue")
+    p.add_argument("--worker-id", default=None, help="默认为 <主机名>-<pid>")
+    p.add_argument("--processes", type=int, default=1, help="本机启动的 worker 进程数")
+    p.add_argument("--poll-interval", type=float, default=2.0, help="队列为空时的轮询间隔（秒）")
+    p.add_argument("--exit-when-empty", action="store_true", help="队列中没有待检查和检查中的任务时退出")
+    p.add_argument("--time-budget", type=float, default=None, help="单个文档的检查时间上限（秒）")
+    p.add_argument("--rules", default=None, help="规则集：.json / .toml 文件或 模块[:变量]，默认 rules.py")
+    p.add_argument("--rules-cache", default=None, help="已编译规则的缓存目录，各 worker 共用")
+
+    p = sub.add_parser("status", help="各状态的任务数和超时的租约")
+    p.add_argument("queue")
+
+    p = sub.add_parser("reclaim", help="立即收回超时的租约")
+    p.add_argument("queue")
+
+    for p in sub.choices.values():
+        p.add_argument("--lease-timeout", type=float, default=300, help="租约超时秒数")
+        p.add_argument("--max-attempts", type=int, default=3, help="超时这么多次后移到 failed/")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.INFO)
+    queue = JobQueue(args.queue, args.lease_timeout, args.max_attempts)
+
+    if args.command == "submit":
+        for path in args.paths:
+            print(f"已提交 {queue.submit(path)}")
+    elif args.command == "work":
+        from compiled_rules import LOAD_ERRORS
+
+        options = (args.poll_interval, args.exit_when_empty, args.time_budget)
+        try:
+            # 先在主进程编译一次并写入缓存，读取或校验失败时不必启动 worker
+            rules = _load_rules(args.rules, args.rules_cache)
+        except LOAD_ERRORS as e:
+            print(e)
+            return 1
+        if args.processes <= 1:
+            processed = work(queue, args.worker_id, rules=rules, poll_interval=args.poll_interval,
+                             exit_when_empty=args.exit_when_empty, time_budget_s=args.time_budget)
+            print(f"完成 {processed} 个任务")
+            return 0
+        import multiprocessing
+
+        base_id = args.worker_id or default_worker_id()
+        processes = [
+            multiprocessing.Process(
+                target=_work_process,
+                args=(args.queue, args.lease_timeout, args.max_attempts, f"{base_id}-{i}",
+                      args.rules, args.rules_cache) + options,
+            )
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    elif args.command == "status":
+        counts = queue.counts()
+        print("  ".join(f"{state}: {count}" for state, count in counts.items()))
+        for lease_name, overdue in queue.stale_leases():
+            job, attempts, worker = parse_job_name(lease_name)
+            print(f"超时租约: {job}（worker {worker}，第 {attempts} 次，已超时 {overdue:.0f} 秒）")
+    else:
+        print(f"收回 {queue.reclaim_stale()} 个任务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+检查专用的 docx 打开方式：只读取 XML 部件，图片、嵌入对象等二进制部件延迟读取。
+
+docx.Document() 会把包里所有部件一次性读进内存，论文里几百 MB 的插图也不例外，
+而格式检查只需要 document.xml、styles.xml、theme1.xml 这些 XML 部件。
+open_document() 得到的 Document 与 docx.Document() 相同，只是二进制部件
+在第一次访问 part.blob 时才从 zip 中解压，从不访问就从不读取。
+"""
+import logging
+import os
+from zipfile import ZipFile
+
+from docx.document import Document as DocumentObject
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.package import Unmarshaller
+from docx.opc.packuri import PACKAGE_URI
+from docx.opc.part import PartFactory
+from docx.opc.phys_pkg import PhysPkgReader, _ZipPkgReader
+from docx.opc.pkgreader import PackageReader, _ContentTypeMap, _SerializedPart
+from docx.package import Package
+
+
+def is_xml_content_type(content_type):
+    # application/xml、text/xml 以及 ...+xml
+    return content_type.endswith("xml")
+
+
+class ZipMember:
+    """zip 中一个尚未读取的成员。读取时重新打开 zip，不要求原来的 ZipFile 仍然打开。"""
+
+    def __init__(self, pkg_file, membername, file_size):
+        self.pkg_file = pkg_file
+        self.membername = membername
+        self.file_size = file_size
+
+    def read(self):
+        if getattr(self.pkg_file, "closed", False):
+            raise ValueError(f"文档来源已关闭，无法再读取部件 '{self.membername}'")
+        with ZipFile(self.pkg_file, "r") as zipf:
+            return zipf.read(self.membername)
+
+
+class LazyBlobPart:
+    """混入到部件类之前，让 blob 在第一次访问时才读取。"""
+
+    _member = None
+
+    @property
+    def blob(self):
+        if self._blob is None and self._member is not None:
+            logging.debug(f"读取延迟加载的部件 {self.partname} ({self._member.file_size} 字节)")
+            self._blob = self._member.read()
+            self._member = None
+        return self._blob
+
+    @property
+    def blob_loaded(self):
+        return self._member is None
+
+
+_lazy_part_classes = {}
+
+
+def _lazy_class_for(part_class):
+    lazy_class = _lazy_part_classes.get(part_class)
+    if lazy_class is None:
+        lazy_class = type(f"Lazy{part_class.__name__}", (LazyBlobPart, part_class), {})
+        _lazy_part_classes[part_class] = lazy_class
+    return lazy_class
+
+
+def lazy_part_factory(partname, content_type, reltype, blob, package):
+    """与 PartFactory 选择相同的部件类；blob 是 ZipMember 时构造延迟加载的版本。"""
+    if not isinstance(blob, ZipMember):
+        return PartFactory(partname, content_type, reltype, blob, package)
+
+    part_class = None
+    if PartFactory.part_class_selector is not None:
+        part_class = PartFactory.part_class_selector(content_type, reltype)
+    if part_class is None:
+        part_class = PartFactory._part_cls_for(content_type)
+    part = _lazy_class_for(part_class).load(partname, content_type, None, package)
+    part._member = blob
+    return part
+
+
+class LazyPackageReader(PackageReader):
+    """与 PackageReader 相同地遍历关系图，但二进制部件只记下 zip 成员，不读取内容。"""
+
+    @staticmethod
+    def from_file(pkg_file):
+        phys_reader = PhysPkgReader(pkg_file)
+        try:
+            content_types = _ContentTypeMap.from_xml(phys_reader.content_types_xml)
+            pkg_srels = PackageReader._srels_for(phys_reader, PACKAGE_URI)
+            sparts = []
+            visited_partnames = set()
+            pending = [pkg_srels]
+            while pending:
+                for srel in pending.pop():
+                    if srel.is_external or srel.target_partname in visited_partnames:
+                        continue
+                    partname = srel.target_partname
+                    visited_partnames.add(partname)
+                    content_type = content_types[partname]
+                    part_srels = PackageReader._srels_for(phys_reader, partname)
+                    blob = _blob_or_member(phys_reader, pkg_file, partname, content_type)
+                    sparts.append(_SerializedPart(partname, content_type, srel.reltype, blob, part_srels))
+                    pending.append(part_srels)
+        finally:
+            phys_reader.close()
+        return LazyPackageReader(content_types, pkg_srels, tuple(sparts))
+
+
+def _blob_or_member(phys_reader, pkg_file, partname, content_type):
+    # 目录形式的包不延迟加载
+    if is_xml_content_type(content_type) or not isinstance(phys_reader, _ZipPkgReader):
+        return phys_reader.blob_for(partname)
+    info = phys_reader._zipf.getinfo(partname.membername)
+    return ZipMember(pkg_file, partname.membername, info.file_size)
+
+
+def open_document(doc_file):
+    """
+    打开 docx 文件（路径或可 seek 的文件对象），返回 docx.document.Document。
+    以文件对象打开时，延迟加载的部件只能在文件对象关闭前读取。
+    """
+    if isinstance(doc_file, os.PathLike):
+        doc_file = os.fspath(doc_file)
+    package = Package()
+    Unmarshaller.unmarshal(LazyPackageReader.from_file(doc_file), package, lazy_part_factory)
+    document_part = package.main_document_part
+    if document_part.content_type != CT.WML_DOCUMENT_MAIN:
+        raise ValueError(f"文件 '{doc_file}' 不是 Word 文档，内容类型为 '{document_part.content_type}'")
+
+    deferred = [part for part in package.iter_parts() if isinstance(part, LazyBlobPart)]
+    if deferred:
+        logging.debug(f"延迟加载 {len(deferred)} 个二进制部件，"
+                      f"共 {sum(part._member.file_size for part in deferred)} 字节")
+    return document_part.document
+
+
+def deferred_parts(document: DocumentObject):
+    """尚未读取内容的部件名列表。"""
+    return [
+        str(part.partname)
+        for part in document.part.package.iter_parts()
+        if isinstance(part, LazyBlobPart) and not part.blob_loaded
+    ]
@@ -0,0 +1,103 @@
+"""
+check_document 各阶段的内存峰值：
+
+- load：读取文档来源、检查包结构、解析 XML 部件（或读取快照）；
+- resolve：解析节的页面设置、建立段落列表（写快照时包括全部段落属性的解析）；
+- check：节、段落和跨段落规则的检查。段落属性在规则第一次用到时才解析，
+  逐段流式检查时这部分解析计入 check；
+- render：输出报告，由调用方用 FormatChecker.memory_phase("render") 包住报告代码。
+
+Python 对象的分配用 tracemalloc 统计（peak_bytes 为阶段内相对阶段开始时的峰值增量，
+retained_bytes 为阶段结束时仍占用的增量，traced_peak_bytes 为阶段内 tracemalloc 统计到的总量峰值，
+各阶段的最大值即整个检查的峰值；每个阶段开始时都会 reset_peak）；lxml 解析树由 libxml2 分配，tracemalloc 看不到，
+因此另外记录进程的最大常驻内存 rss_peak_bytes（整个进程的历史最大值，只增不减）
+和它在阶段内的增长 rss_growth_bytes。
+
+tracemalloc 会让检查慢好几倍，FormatChecker(..., memory_accounting=True) 时开启；
+memory_accounting="rss" 只记录最大常驻内存，几乎没有开销，适合常驻的批量 worker。
+
+    python checking.py 论文.docx --memory          # tracemalloc
+    python checking.py 论文.docx --memory rss
+    python bench_memory.py            # 生成大文档，超出每段落内存预算时以非零状态退出
+"""
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+PHASES = ("load", "resolve", "check", "render")
+
+
+def max_rss_bytes():
+    """进程的最大常驻内存（字节）；不支持的平台返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class MemoryPhases:
+    """
+    按阶段记录内存，phases 为 阶段名 -> {"peak_bytes", "retained_bytes", "traced_peak_bytes",
+    "rss_peak_bytes", "rss_growth_bytes"}。trace 为 False 时不用 tracemalloc，前三项为 None。
+    """
+
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.phases = {}
+
+    @contextmanager
+    def tracing(self):
+        """没有在 tracemalloc 下运行时开启，结束时关闭。"""
+        started_here = self.trace and not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个阶段；同名阶段多次出现时各项取最大值。"""
+        with self.tracing():
+            rss_before = max_rss_bytes()
+            if self.trace:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            try:
+                yield
+            finally:
+                entry = {"peak_bytes": None, "retained_bytes": None, "traced_peak_bytes": None}
+                if self.trace:
+                    current, peak = tracemalloc.get_traced_memory()
+                    entry = {"peak_bytes": peak - base, "retained_bytes": current - base, "traced_peak_bytes": peak}
+                entry["rss_peak_bytes"] = rss_after = max_rss_bytes()
+                entry["rss_growth_bytes"] = rss_after - rss_before if rss_after is not None else None
+                previous = self.phases.get(name)
+                if previous is not None:
+                    entry = {key: max(value, previous[key]) if value is not None else None
+                             for key, value in entry.items()}
+                self.phases[name] = entry
+
+
+def _mb(value):
+    return "-" if value is None else f"{value / 1048576:.1f}"
+
+
+def format_memory(phases, paragraphs=None):
+    """控制台报告的各行；paragraphs 为段落数时另外给出每段落的峰值。"""
+    lines = ["\n--- 内存（MB） ---",
+             f"{'阶段':<8} {'峰值增量':>8} {'保留':>8} {'进程最大RSS':>10} {'RSS增长':>8}"
+             + ("  每段落峰值(KB)" if paragraphs else "")]
+    for name in sorted(phases, key=lambda name: PHASES.index(name) if name in PHASES else len(PHASES)):
+        entry = phases[name]
+        line = (f"{name:<10} {_mb(entry['peak_bytes']):>12} {_mb(entry['retained_bytes']):>10} "
+                f"{_mb(entry['rss_peak_bytes']):>15} {_mb(entry['rss_growth_bytes']):>11}")
+        if paragraphs and entry["peak_bytes"] is not None:
+            line += f"  {entry['peak_bytes'] / paragraphs / 1024:>14.1f}"
+        lines.append(line)
+    return lines
@@ -0,0 +1,129 @@
+"""
+一次遍历文档，同时按多套规则集检查。
+
+每套规则集（本科、硕士、期刊模板……）对应一个 FormatChecker。文档只打开一次，
+每个段落只构造一个 ResolvedParagraph，它的有效格式属性在第一次被某套规则用到时解析，
+之后其余规则集直接复用，各规则集的错误分别记录在各自的 CheckResult 中。
+"""
+import sys
+import time
+
+from checking import FormatChecker
+
+
+class MultiProfileChecker:
+    def __init__(self, profiles):
+        """profiles: {配置名: DEFAULT_RULES 形状的规则字典}"""
+        self.checkers = {name: FormatChecker(rules) for name, rules in profiles.items()}
+
+    def check_document(
+        self,
+        doc_path,
+        max_errors=None,
+        max_errors_per_rule=None,
+        time_budget_s=None,
+        cancel_event=None,
+    ):
+        """
+        检查文档，返回 {配置名: CheckResult}。doc_path 可以是路径或内存中的文档内容。
+        提前结束条件的含义与 FormatChecker.check_document 相同，
+        错误数上限按配置分别计算，某个配置达到上限后其余配置继续检查。
+        """
+        from lazy_package import open_document
+        from resolved import ResolvedParagraph, resolve_sections
+        from preflight import check_package
+        from source import open_source
+
+        started = time.perf_counter()
+        checkers = list(self.checkers.values())
+        for checker in checkers:
+            checker.start_check(max_errors, max_errors_per_rule)
+
+        try:
+            with open_source(doc_path) as doc_file:
+                problem = check_package(doc_file)
+                if problem is None:
+                    doc = open_document(doc_file)
+        except Exception as e:
+            for checker in checkers:
+                checker.add_document_error(doc_path, e)
+                checker.errors.elapsed_s = time.perf_counter() - started
+            return self.results()
+        if problem is not None:
+            for checker in checkers:
+                checker.add_preflight_error(doc_path, problem)
+                checker.errors.elapsed_s = time.perf_counter() - started
+            return self.results()
+
+        section_margins = resolve_sections(doc)
+        for checker in checkers:
+            checker.check_sections(section_margins)
+
+        paragraphs = doc.paragraphs
+        for checker in checkers:
+            checker.errors.paragraphs_total = len(paragraphs)
+
+        active = checkers
+        for p_idx, p in enumerate(paragraphs):
+            for checker in active:
+                checker.errors.paragraphs_checked = p_idx
+            active = [c for c in active if not c.should_stop(started, time_budget_s, cancel_event)]
+            if not active:
+                break
+            resolved_paragraph = ResolvedParagraph(p, p_idx, doc)
+            for checker in active:
+                checker.check_resolved_paragraph(resolved_paragraph)
+        else:
+            for checker in active:
+                checker.errors.paragraphs_checked = len(paragraphs)
+
+        for checker in checkers:
+            checker.finish_check(started)
+        return self.results()
+
+    def results(self):
+        """{配置名: CheckResult}，即各检查器最近一次检查的结果。"""
+        return {name: checker.errors for name, checker in self.checkers.items()}
+
+
+def load_profile(spec):
+    """
+    解析 "名称=模块:变量" 形式的配置说明，例如 "本科=rules:DEFAULT_RULES"。
+    省略 ":变量" 时取模块中的 DEFAULT_RULES。
+    """
+    import importlib
+
+    name, _, target = spec.partition("=")
+    if not target:
+        raise ValueError(f"配置 '{spec}' 的格式应为 名称=模块[:变量]")
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return name, getattr(module, attr or "DEFAULT_RULES")
+
+
+def main(argv=None):
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="一次遍历文档，同时按多套规则集检查")
+    parser.add_argument("doc_path", help="待检查的 .docx 文件")
+    parser.add_argument("--profile", action="append", required=True,
+                        help="名称=模块[:变量]，可重复指定，例如 本科=rules:DEFAULT_RULES")
+    parser.add_argument("--html-prefix", default="format_checker_report",
+                        help="HTML 报告文件名前缀，每个配置生成 <前缀>.<名称>.html")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    profiles = dict(load_profile(spec) for spec in args.profile)
+    multi_checker = MultiProfileChecker(profiles)
+    multi_checker.check_document(args.doc_path)
+    for name, checker in multi_checker.checkers.items():
+        print(f"\n===== 配置 '{name}'：{sum(len(b['details']) for b in checker.errors)} 个问题 =====")
+        checker.print_structured_errors_to_console()
+        checker.generate_html_report(f"{args.html_prefix}.{name}.html")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+逐段落的检查开销：每个段落的耗时、run 数、字符数、正则匹配数和错误数，
+按耗时排出最慢的段落（"热点段落"），用来告诉学生文档的哪些部分有问题
+（几千个 run 的段落、粘贴进来的大段表格文字等），也用来发现检查引擎的性能退化。
+
+    python paragraph_profile.py 论文.docx --top 20
+    python paragraph_profile.py 论文.docx --json hot.json
+    python checking.py 论文.docx --hot-paragraphs 20
+
+需要 FormatChecker(..., paragraph_timing=True)，逐段计时时总是串行检查。
+"""
+import heapq
+import sys
+from array import array
+
+# 内容间距规则对每个正则匹配调用一次 ParagraphContext.text_error，错误数即匹配数
+TEXT_CATEGORY = "内容间距"
+
+DEFAULT_TOP = 20
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class ParagraphTimings:
+    """
+    记录每个段落的耗时（只保存耗时数组，用于分位数），并保留最慢的 top 个段落的详细信息。
+    耗时包括段落属性的解析和跨段落规则在这个段落上的开销。
+    """
+
+    def __init__(self, top=DEFAULT_TOP):
+        self.top = top
+        self.reset()
+
+    def reset(self):
+        self.seconds = array("d")
+        self.runs = 0
+        self.regex_matches = 0
+        # (耗时, 段落序号, 详情) 的小顶堆
+        self._heap = []
+
+    def add(self, p, seconds, records):
+        """p 为 ResolvedParagraph，records 为这个段落的 _finding_recorder 记录。"""
+        self.seconds.append(seconds)
+        runs = len(p.runs)
+        regex_matches = sum(1 for record in records if record[3] == TEXT_CATEGORY)
+        self.runs += runs
+        self.regex_matches += regex_matches
+        heap = self._heap
+        if self.top <= 0 or len(heap) >= self.top and seconds <= heap[0][0]:
+            return
+        text = p.text
+        entry = {
+            "para_idx": p.index,
+            "style_name": p.style_name,
+            "seconds": seconds,
+            "runs": runs,
+            "chars": len(text),
+            "regex_matches": regex_matches,
+            "findings": len(records),
+            "text_snippet": text[:30].replace("\n", " "),
+        }
+        if len(heap) < self.top:
+            heapq.heappush(heap, (seconds, p.index, entry))
+        else:
+            heapq.heapreplace(heap, (seconds, p.index, entry))
+
+    def rows(self):
+        """最慢的段落，按耗时从高到低。"""
+        return [entry for _, _, entry in sorted(self._heap, key=lambda item: (-item[0], item[1]))]
+
+    def summary(self):
+        values = sorted(self.seconds)
+        total = sum(values)
+        return {
+            "paragraphs": len(values),
+            "total_s": total,
+            "p50_s": _percentile(values, 0.5),
+            "p95_s": _percentile(values, 0.95),
+            "p99_s": _percentile(values, 0.99),
+            "max_s": values[-1] if values else 0.0,
+            "runs": self.runs,
+            "regex_matches": self.regex_matches,
+        }
+
+    def as_dict(self):
+        return {"summary": self.summary(), "hot_paragraphs": self.rows()}
+
+
+def format_hot_paragraphs(timings, limit=None):
+    """控制台报告的各行。"""
+    summary = timings.summary()
+    total = summary["total_s"]
+    lines = [
+        f"\n--- 最慢的段落（共 {summary['paragraphs']} 个段落，检查 {total:.2f} 秒；"
+        f"中位数 {summary['p50_s'] * 1000:.1f} ms，P95 {summary['p95_s'] * 1000:.1f} ms，"
+        f"P99 {summary['p99_s'] * 1000:.1f} ms）---",
+        f"{'排名':>4} {'段落':>6} {'耗时(ms)':>9} {'占比':>6} {'run':>6} {'字符':>7} {'正则匹配':>8} {'错误':>5}  样式 / 内容",
+    ]
+    for rank, entry in enumerate(timings.rows()[:limit], 1):
+        share = entry["seconds"] / total * 100 if total else 0.0
+        lines.append(
+            f"{rank:>6} {entry['para_idx'] + 1:>8} {entry['seconds'] * 1000:>11.1f} {share:>7.1f}% "
+            f"{entry['runs']:>6} {entry['chars']:>8} {entry['regex_matches']:>10} {entry['findings']:>6}  "
+            f"'{entry['style_name']}' {entry['text_snippet']}"
+        )
+    return lines
+
+
+def main(argv=None):
+    import argparse
+    import json
+    import logging
+
+    from checking import FormatChecker
+
+    parser = argparse.ArgumentParser(description="检查文档并列出最慢的段落")
+    parser.add_argument("doc_path", help="待检查的 .docx 文件")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="列出最慢的多少个段落")
+    parser.add_argument("--rules", default=None, help="规则集：.json / .toml 文件或 模块[:变量]，默认 rules.py")
+    parser.add_argument("--json", dest="json_path", default=None, help="把统计写入 JSON 文件")
+    args = parser.parse_args(argv)
+    if args.top < 1:
+        parser.error("--top 必须是正整数")
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    if args.rules:
+        from compiled_rules import LOAD_ERRORS, load_compiled_rules
+
+        try:
+            rules = load_compiled_rules(args.rules)
+        except LOAD_ERRORS as e:
+            print(e)
+            return 1
+    else:
+        from rules import DEFAULT_RULES as rules
+
+    checker = FormatChecker(rules, paragraph_timing=True)
+    checker.paragraph_timings.top = args.top
+    errors = checker.check_document(args.doc_path)
+    if errors and errors[0]["para_idx"] == -1:
+        print(f"Err: {errors[0]['details'][0]['actual']}")
+        return 1
+    print("\n".join(format_hot_paragraphs(checker.paragraph_timings)))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(checker.paragraph_timings.as_dict(), f, ensure_ascii=False, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
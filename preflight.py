@@ -0,0 +1,121 @@
+"""
+打开文档之前的快速预检查。
+
+只读取文件头、zip 中央目录、[Content_Types].xml 和 _rels/.rels（都只有几 KB），
+在毫秒级别内识别出改了扩展名的 .doc、加密文档、Strict Open XML、损坏的 zip 等输入，
+不必等到 python-docx 解析整个包才失败。只使用标准库。
+"""
+import os
+import zipfile
+from xml.etree import ElementTree
+
+# 问题分类
+NOT_FOUND = "not_found"
+EMPTY = "empty"
+OLE_COMPOUND = "ole_compound"
+RTF = "rtf"
+PDF = "pdf"
+NOT_ZIP = "not_zip"
+CORRUPT_ZIP = "corrupt_zip"
+MISSING_PART = "missing_part"
+STRICT_OOXML = "strict_ooxml"
+WRONG_CONTENT_TYPE = "wrong_content_type"
+
+MAGIC_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+MAGIC_ZIP = b"PK"
+
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+RT_STRICT_OFFICE_DOCUMENT = "http://purl.oclc.org/ooxml/officeDocument/relationships/officeDocument"
+
+CT_DOCUMENT_MAIN = "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"
+# 不是 .docx 但同样基于 Open XML 的主文档内容类型
+OTHER_MAIN_CONTENT_TYPES = {
+    "application/vnd.ms-word.document.macroEnabled.main+xml": "启用宏的文档 (.docm)",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.template.main+xml": "Word 模板 (.dotx)",
+    "application/vnd.ms-word.template.macroEnabledTemplate.main+xml": "启用宏的模板 (.dotm)",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml": "PowerPoint 演示文稿",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml": "Excel 工作簿",
+}
+
+EXPECTED = "docx (Office Open XML) 文档"
+
+
+def _problem(code, actual):
+    return {"code": code, "expected": EXPECTED, "actual": actual}
+
+
+def check_package(doc_file):
+    """
+    预检查 doc_file（路径或可 seek 的文件对象）。
+    没有发现问题时返回 None，否则返回 {"code", "expected", "actual"}。
+    文件对象检查完后会回到原来的位置。
+    """
+    if isinstance(doc_file, (str, os.PathLike)):
+        if not os.path.isfile(doc_file):
+            return _problem(NOT_FOUND, "文件不存在")
+        with open(doc_file, "rb") as f:
+            return _check_stream(f)
+
+    position = doc_file.tell()
+    try:
+        return _check_stream(doc_file)
+    finally:
+        doc_file.seek(position)
+
+
+def _check_stream(f):
+    f.seek(0)
+    head = f.read(8)
+    if not head:
+        return _problem(EMPTY, "空文件")
+    if head == MAGIC_OLE:
+        return _problem(OLE_COMPOUND, "OLE 复合文档：旧版 .doc 或加密的 docx，请用 Word 另存为 .docx 并取消密码")
+    if head.startswith(b"{\\rtf"):
+        return _problem(RTF, "RTF 文档，请用 Word 另存为 .docx")
+    if head.startswith(b"%PDF"):
+        return _problem(PDF, "PDF 文档")
+    if not head.startswith(MAGIC_ZIP):
+        return _problem(NOT_ZIP, f"不是 zip 文件（文件头 {head[:4].hex()}）")
+
+    try:
+        with zipfile.ZipFile(f) as zipf:  # 只读取中央目录
+            names = set(zipf.namelist())
+            for member in ("[Content_Types].xml", "_rels/.rels"):
+                if member not in names:
+                    return _problem(MISSING_PART, f"缺少 {member}")
+            content_types = zipf.read("[Content_Types].xml")
+            package_rels = zipf.read("_rels/.rels")
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError, OSError) as e:
+        return _problem(CORRUPT_ZIP, f"zip 文件已损坏: {e}")
+
+    try:
+        rels_root = ElementTree.fromstring(package_rels)
+        types_root = ElementTree.fromstring(content_types)
+    except ElementTree.ParseError as e:
+        return _problem(CORRUPT_ZIP, f"包结构 XML 无法解析: {e}")
+
+    main_target = None
+    for rel in rels_root.iter(f"{{{RELS_NS}}}Relationship"):
+        rel_type = rel.get("Type")
+        if rel_type == RT_STRICT_OFFICE_DOCUMENT:
+            return _problem(STRICT_OOXML, "Strict Open XML 文档，请用 Word 另存为 .docx")
+        if rel_type == RT_OFFICE_DOCUMENT:
+            main_target = rel.get("Target", "")
+    if main_target is None:
+        return _problem(MISSING_PART, "_rels/.rels 中没有主文档关系")
+
+    main_partname = "/" + main_target.lstrip("/")
+    if main_partname[1:] not in names:
+        return _problem(MISSING_PART, f"缺少主文档部件 {main_partname[1:]}")
+
+    main_content_type = None
+    for override in types_root.iter(f"{{{CT_NS}}}Override"):
+        if override.get("PartName", "").lower() == main_partname.lower():
+            main_content_type = override.get("ContentType")
+            break
+    if main_content_type != CT_DOCUMENT_MAIN:
+        kind = OTHER_MAIN_CONTENT_TYPES.get(main_content_type, f"内容类型 '{main_content_type}'")
+        return _problem(WRONG_CONTENT_TYPE, f"{kind}，不是 .docx 文档")
+    return None
@@ -0,0 +1,606 @@
+"""
+规则注册表。
+
+每条格式规则（页边距、对齐、缩进、字号、中英文间距……）都是一个注册的 Rule 对象，声明：
+- scope:    作用范围，section / paragraph / run / text
+- keys:     规则集中启用它的键，有效规则中出现任一键时规则生效
+- requires: 需要的已解析属性（ResolvedParagraph / ResolvedRun 的属性名），
+            有规则需要快照（snapshot.py）中没有的属性时，检查不使用快照
+- cost:     开销等级，cheap 只比较已解析的段落属性，moderate 要逐个 run 解析属性，
+            expensive 要在段落文本上跑正则
+
+FormatChecker 为每个样式生成一个 RulePlan：适用的规则按 (cost, 注册顺序) 排序，
+相邻的同一作用范围的规则合并成一步（run 规则共用一次 run 遍历）。
+内置规则的注册顺序与开销等级保证了执行顺序与原来三个检查方法的顺序一致。
+
+自定义规则：
+
+    from registry import Rule, register, SCOPE_PARAGRAPH, COST_CHEAP
+
+    @register
+    class TitleLengthRule(Rule):
+        name = "title_max_chars"
+        scope = SCOPE_PARAGRAPH
+        keys = ("title_max_chars",)
+        requires = ("text",)
+
+        def check(self, ctx):
+            if len(ctx.full_text) > ctx.rules["title_max_chars"]:
+                ctx.error("段落格式", self.name, ctx.rules["title_max_chars"], len(ctx.full_text))
+"""
+import re
+import time
+
+from enums import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+from rules import CM_TOLERANCE, PT_TOLERANCE
+from rules import RE_CHINESE, RE_WESTERN, RE_NUMBER, RE_CHINESE_PUNCTUATION
+from rules import RE_FULL_WIDTH_BRACKETS_LEFT, RE_FULL_WIDTH_BRACKETS_RIGHT
+
+SCOPE_SECTION = "section"
+SCOPE_PARAGRAPH = "paragraph"
+SCOPE_RUN = "run"
+SCOPE_TEXT = "text"
+
+COST_CHEAP = 0
+COST_MODERATE = 1
+COST_EXPENSIVE = 2
+
+COST_NAMES = {COST_CHEAP: "cheap", COST_MODERATE: "moderate", COST_EXPENSIVE: "expensive"}
+
+
+class Rule:
+    name = ""
+    scope = SCOPE_PARAGRAPH
+    keys = ()
+    requires = ()
+    cost = COST_CHEAP
+
+    def applies(self, rules):
+        return any(key in rules for key in self.keys)
+
+    def bind(self, rules):
+        """返回用于某个样式有效规则的检查函数，可以在这里预先计算只与规则有关的内容。"""
+        return self.check
+
+    def check(self, ctx, *target):
+        """
+        section 规则: check(ctx, margins)，margins 为 resolve_sections 中的一项
+        paragraph / text 规则: check(ctx)
+        run 规则: check(ctx, run)，run 为 resolved.ResolvedRun，空白 run 不会传入
+        """
+        raise NotImplementedError
+
+
+class SectionContext:
+    def __init__(self, checker, rules):
+        self.checker = checker
+        self.rules = rules
+        self.findings = 0
+
+    def error(self, category, rule_key, expected, actual):
+        self.findings += 1
+        self.checker._add_error(0, None, None, None, category, rule_key, expected, actual)
+
+
+class ParagraphContext:
+    """一个段落的检查上下文，规则通过它记录错误。"""
+
+    def __init__(self, checker, p, p_idx, style_name, rules):
+        self.checker = checker
+        self.p = p
+        self.p_idx = p_idx
+        self.style_name = style_name
+        self.rules = rules
+        self.full_text = p.text
+        self.snippet = self.full_text[:30].replace("\n", " ")
+        self.first_line_loc = checker._get_first_line_location(self.full_text)
+        self.findings = 0
+
+    def error(self, category, rule_key, expected, actual, location=None):
+        """段落级错误，默认高亮段落首行。"""
+        self.findings += 1
+        self.checker._add_error(
+            self.p_idx, self.style_name, self.snippet, self.full_text, category, rule_key,
+            expected, actual, error_char_location=location if location is not None else self.first_line_loc,
+        )
+
+    def run_error(self, run, category, rule_key, expected, actual):
+        self.findings += 1
+        self.checker._add_error(
+            self.p_idx, self.style_name, self.snippet, self.full_text, category, rule_key,
+            expected, actual,
+            run_idx=run.index,
+            run_text_snippet_for_detail=run.text[:20].replace("\n", " "),
+            error_char_location=[run.start, run.end],
+        )
+
+    def text_error(self, rule_key, expected, actual, location):
+        """内容间距错误，摘要取段落前 50 个字符。"""
+        self.findings += 1
+        self.checker._add_error(
+            self.p_idx, self.style_name, self.full_text[:50].replace("\n", " "), self.full_text,
+            "内容间距", rule_key, expected, actual, error_char_location=location,
+        )
+
+
+class RulePlan:
+    """
+    一个样式适用的规则，按开销排序后分成若干步，每一步是开销相同的同一作用范围的连续规则。
+    规则在生成计划时用 bind 绑定到这个样式的有效规则上。
+    """
+
+    def __init__(self, rules, effective_rules):
+        self.rules = rules
+        self.steps = []
+        for rule in rules:
+            entry = (rule, rule.bind(effective_rules))
+            if self.steps and self.steps[-1][0] == rule.scope and self.steps[-1][1] == rule.cost:
+                self.steps[-1][2].append(entry)
+            else:
+                self.steps.append((rule.scope, rule.cost, [entry]))
+
+    def run(self, ctx, skip_expensive_after_failure=False, timings=None):
+        for scope, cost, checks in self.steps:
+            if skip_expensive_after_failure and cost >= COST_EXPENSIVE and ctx.findings:
+                if timings is not None:
+                    for rule, _ in checks:
+                        timings.skip(rule)
+                continue
+            if timings is not None:
+                self._run_timed(scope, checks, ctx, timings)
+            elif scope == SCOPE_RUN:
+                for run in ctx.p.runs:
+                    if not run.text.strip():
+                        continue
+                    for _, check in checks:
+                        check(ctx, run)
+            else:
+                for _, check in checks:
+                    check(ctx)
+
+    @staticmethod
+    def _run_timed(scope, checks, ctx, timings):
+        targets = [(run,) for run in ctx.p.runs if run.text.strip()] if scope == SCOPE_RUN else [()]
+        for target in targets:
+            for rule, check in checks:
+                before = ctx.findings
+                started = time.perf_counter()
+                check(ctx, *target)
+                timings.add(rule, time.perf_counter() - started, ctx.findings - before)
+
+
+class RuleTimings:
+    """
+    每条规则的调用次数、累计耗时、发现的错误数和被跳过的次数。
+    段落和 run 的属性在第一次访问时才解析，耗时包括规则第一次用到的属性的解析时间。
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    def _entry(self, rule):
+        entry = self.stats.get(rule.name)
+        if entry is None:
+            entry = self.stats[rule.name] = {
+                "scope": rule.scope, "cost": COST_NAMES.get(rule.cost, rule.cost),
+                "calls": 0, "seconds": 0.0, "findings": 0, "skipped": 0,
+            }
+        return entry
+
+    def add(self, rule, seconds, findings):
+        entry = self._entry(rule)
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["findings"] += findings
+
+    def skip(self, rule):
+        self._entry(rule)["skipped"] += 1
+
+    def rows(self):
+        """按累计耗时从高到低排列的 (规则名, 统计) 列表。"""
+        return sorted(self.stats.items(), key=lambda item: -item[1]["seconds"])
+
+
+class RuleRegistry:
+    def __init__(self):
+        self._rules = []
+        # 注册了内置规则以外的规则后，codegen 生成的函数不再覆盖全部规则
+        self.customized = False
+        # 每次注册或移除规则时加一，FormatChecker 据此丢弃缓存的 RulePlan
+        self.version = 0
+
+    def register(self, rule):
+        """注册规则（类或实例），可用作类装饰器，返回原对象。"""
+        self._add(rule)
+        self.customized = True
+        self.version += 1
+        return rule
+
+    def _add(self, rule):
+        instance = rule() if isinstance(rule, type) else rule
+        if any(existing.name == instance.name for existing in self._rules):
+            raise ValueError(f"规则 '{instance.name}' 已经注册")
+        self._rules.append(instance)
+        return rule
+
+    def copy(self):
+        """复制注册表，在副本上注册或移除规则不影响原注册表。"""
+        registry = RuleRegistry()
+        registry._rules = list(self._rules)
+        registry.customized = self.customized
+        registry.version = self.version
+        return registry
+
+    def unregister(self, name):
+        self._rules = [rule for rule in self._rules if rule.name != name]
+        self.customized = True
+        self.version += 1
+
+    def rules(self, scope=None):
+        return [rule for rule in self._rules if scope is None or rule.scope == scope]
+
+    def plan(self, rules, scopes=(SCOPE_PARAGRAPH, SCOPE_RUN, SCOPE_TEXT)):
+        """rules 为某个样式的有效规则（或 section 分组），返回适用规则的 RulePlan。"""
+        order = {id(rule): i for i, rule in enumerate(self._rules)}
+        applicable = [rule for rule in self._rules if rule.scope in scopes and rule.applies(rules)]
+        applicable.sort(key=lambda rule: (rule.cost, order[id(rule)]))
+        return RulePlan(applicable, rules)
+
+    def required_properties(self, rules):
+        """适用规则需要的全部已解析属性名。"""
+        return {name for rule in self.plan(rules).rules for name in rule.requires}
+
+
+DEFAULT_REGISTRY = RuleRegistry()
+register = DEFAULT_REGISTRY.register
+
+
+def builtin(rule):
+    DEFAULT_REGISTRY._add(rule)
+    return rule
+
+
+# ---------------------------------------------------------------- 节
+
+class MarginRule(Rule):
+    scope = SCOPE_SECTION
+
+    def __init__(self, key, category):
+        self.name = key
+        self.keys = (key,)
+        self.category = category
+
+    def check(self, ctx, margins):
+        expected = ctx.rules[self.name]
+        actual = margins[self.name]
+        if abs(actual - expected) > CM_TOLERANCE:
+            ctx.error(self.category, "页面大小", expected, actual)
+
+
+builtin(MarginRule("left_margin_cm", "节格式"))
+builtin(MarginRule("right_margin_cm", "节格式"))
+builtin(MarginRule("top_margin_cm", "节"))
+builtin(MarginRule("bottom_margin_cm", "节格式"))
+
+
+# ---------------------------------------------------------------- 段落格式
+
+@builtin
+class AlignmentRule(Rule):
+    name = "alignment"
+    keys = ("alignment",)
+    requires = ("alignment",)
+
+    def check(self, ctx):
+        actual = ctx.p.alignment
+        expected = ctx.rules["alignment"]
+        if actual != expected:
+            ctx.error("段落格式", "alignment", WD_ALIGN_PARAGRAPH(expected).name,
+                      WD_ALIGN_PARAGRAPH(actual).name if actual is not None else "None")
+
+
+@builtin
+class FirstLineIndentRule(Rule):
+    name = "first_line_indent_pt"
+    keys = ("first_line_indent_pt",)
+    requires = ("first_line_indent_pt",)
+
+    def check(self, ctx):
+        expected = ctx.rules["first_line_indent_pt"]
+        actual = ctx.p.first_line_indent_pt
+        if actual is None:
+            actual = 0
+        if abs(actual - expected) > PT_TOLERANCE:
+            ctx.error("段落格式", "first_line_indent_pt", f"{expected:.2f} pt", f"{actual:.2f} pt")
+
+
+@builtin
+class LineSpacingRuleRule(Rule):
+    name = "line_spacing_rule"
+    keys = ("line_spacing_rule",)
+    requires = ("line_spacing_rule",)
+
+    def check(self, ctx):
+        actual = ctx.p.line_spacing_rule
+        expected = ctx.rules["line_spacing_rule"]
+        if actual != expected:
+            ctx.error("段落格式", "line_spacing_rule", WD_LINE_SPACING(expected).name,
+                      WD_LINE_SPACING(actual).name if actual is not None else "None")
+
+
+# 只有这几种行距规则才检查行距值
+LINE_SPACING_VALUE_RULES = (WD_LINE_SPACING.MULTIPLE, WD_LINE_SPACING.AT_LEAST, WD_LINE_SPACING.EXACTLY)
+
+
+@builtin
+class LineSpacingValueRule(Rule):
+    """行距值只在实际行距规则与期望一致、且期望规则带数值时检查。"""
+
+    name = "line_spacing_value"
+    keys = ("line_spacing_value",)
+    requires = ("line_spacing_rule", "line_spacing")
+
+    def applies(self, rules):
+        return (
+            "line_spacing_value" in rules
+            and rules.get("line_spacing_rule") in LINE_SPACING_VALUE_RULES
+        )
+
+    def check(self, ctx):
+        if ctx.p.line_spacing_rule != ctx.rules["line_spacing_rule"]:
+            return
+        expected = float(ctx.rules["line_spacing_value"])
+        actual = ctx.p.line_spacing
+        if actual is None:
+            actual = 1.0
+        if abs(actual - expected) > PT_TOLERANCE:
+            ctx.error("段落格式", "line_spacing_value", f"{expected:.2f}", f"{actual:.2f}")
+
+
+class SpacingPtRule(Rule):
+    def __init__(self, key):
+        self.name = key
+        self.keys = (key,)
+        self.requires = (key,)
+
+    def check(self, ctx):
+        expected = ctx.rules[self.name]
+        actual = getattr(ctx.p, self.name)
+        if abs(actual - expected) > PT_TOLERANCE:
+            ctx.error("段落格式", self.name, f"{expected:.1f} pt", f"{actual:.1f} pt")
+
+
+builtin(SpacingPtRule("space_before_pt"))
+builtin(SpacingPtRule("space_after_pt"))
+
+
+class FlagRule(Rule):
+    """布尔型段落属性；none_as 不为 None 时，未设置的值按 none_as 比较。"""
+
+    def __init__(self, key, none_as=None):
+        self.name = key
+        self.keys = (key,)
+        self.requires = (key,)
+        self.none_as = none_as
+
+    def check(self, ctx):
+        expected = ctx.rules[self.name]
+        actual = getattr(ctx.p, self.name)
+        if actual is None and self.none_as is not None:
+            actual = self.none_as
+        if actual != expected:
+            ctx.error("段落格式", self.name, expected, actual)
+
+
+builtin(FlagRule("keep_with_next"))
+builtin(FlagRule("keep_together"))
+builtin(FlagRule("widow_control", none_as=False))
+
+
+# ---------------------------------------------------------------- 字体（逐 run）
+
+@builtin
+class FontSizeRule(Rule):
+    name = "font_size_pt"
+    scope = SCOPE_RUN
+    cost = COST_MODERATE
+    keys = ("font_size_pt",)
+    requires = ("runs", "font_size_pt")
+
+    def check(self, ctx, run):
+        expected = ctx.rules["font_size_pt"]
+        actual = run.font_size_pt
+        if abs(actual - expected) > PT_TOLERANCE:
+            ctx.run_error(run, "字体", "font_size_pt", f"{expected:.1f} pt", f"{actual:.1f} pt")
+
+
+class RunFlagRule(Rule):
+    scope = SCOPE_RUN
+    cost = COST_MODERATE
+
+    def __init__(self, key, attr):
+        self.name = key
+        self.keys = (key,)
+        self.requires = ("runs", attr)
+        self.attr = attr
+
+    def check(self, ctx, run):
+        expected = ctx.rules[self.name]
+        actual = getattr(run, self.attr)
+        if actual != expected:
+            ctx.run_error(run, "字体", self.name, expected, actual)
+
+
+builtin(RunFlagRule("font_bold", "bold"))
+builtin(RunFlagRule("font_italic", "italic"))
+
+
+def normalize_font_name(name):
+    return name.replace(" (正文)", "").replace(" (标题)", "") if name else None
+
+
+@builtin
+class FontNameRule(Rule):
+    """含中文的 run 检查 chinese_font（东亚字体），其余检查 western_font（ascii / hAnsi 字体）。"""
+
+    name = "font_name"
+    scope = SCOPE_RUN
+    cost = COST_MODERATE
+    keys = ("chinese_font", "western_font")
+    requires = ("runs", "fonts", "has_chinese", "has_western")
+
+    def check(self, ctx, run):
+        rules = ctx.rules
+        is_chinese = run.has_chinese
+        fonts = run.fonts
+        target_key = target_value = actual = None
+        if is_chinese and "chinese_font" in rules:
+            target_key = "chinese_font"
+            target_value = rules["chinese_font"]
+            actual = fonts.get("eastAsia")
+        elif (run.has_western or not is_chinese) and "western_font" in rules:
+            target_key = "western_font"
+            target_value = rules["western_font"]
+            actual = fonts.get("ascii")
+            if actual is None:
+                actual = fonts.get("hAnsi")
+
+        if target_key and target_value:
+            if actual != target_value and normalize_font_name(actual) != normalize_font_name(target_value):
+                ctx.run_error(run, "字体", target_key, target_value, actual)
+        elif "western_font" in rules and not is_chinese:
+            # 期望的西文字体为空时的兜底检查
+            actual = fonts.get("ascii", fonts.get("hAnsi"))
+            if actual != rules["western_font"]:
+                ctx.run_error(run, "字体", "western_font (fallback)", rules["western_font"], actual)
+
+
+# ---------------------------------------------------------------- 内容间距（正则）
+
+_pattern_cache = {}
+
+
+def compile_pattern(pattern):
+    compiled = _pattern_cache.get(pattern)
+    if compiled is None:
+        compiled = _pattern_cache[pattern] = re.compile(pattern)
+    return compiled
+
+
+class TextPatternRule(Rule):
+    """
+    在段落文本上匹配正则的规则。expand(rules) 返回
+    [(正则, 高亮的分组, rule 名, expected, actual)]，codegen 也用它生成代码。
+    """
+
+    scope = SCOPE_TEXT
+    cost = COST_EXPENSIVE
+    requires = ("text",)
+
+    def expand(self, rules):
+        raise NotImplementedError
+
+    def fixes(self, rules):
+        """
+        自动修正（autofix.py）用的 [(rule 名, 正则, 分组, 替换文本)]：
+        把每个匹配的该分组替换成替换文本。默认删除高亮的分组（多余的空格）。
+        """
+        return [(rule_key, pattern, group, "") for pattern, group, rule_key, _, _ in self.expand(rules)]
+
+    def check(self, ctx):
+        self.bind(ctx.rules)(ctx)
+
+    def bind(self, rules):
+        checks = [
+            (compile_pattern(pattern), group, rule_key, expected, actual)
+            for pattern, group, rule_key, expected, actual in self.expand(rules)
+        ]
+
+        def check(ctx):
+            text = ctx.full_text
+            for compiled, group, rule_key, expected, actual in checks:
+                for match in compiled.finditer(text):
+                    ctx.text_error(rule_key, expected, actual, [match.start(group), match.end(group)])
+
+        return check
+
+
+class PairSpacingRule(TextPatternRule):
+    """两类字符之间要求（True）或禁止（其他非 None 值）空格。"""
+
+    def __init__(self, key, left, right, left_desc, right_desc):
+        self.name = key
+        self.keys = (key,)
+        self.left, self.right = left, right
+        self.left_desc, self.right_desc = left_desc, right_desc
+
+    def applies(self, rules):
+        return rules.get(self.name) is not None
+
+    def expand(self, rules):
+        left, right = self.left, self.right
+        if rules[self.name] is True:  # 需要空格，发现没有空格
+            return [
+                (f"({left})({right})", 0, f"{self.name} {self.left_desc}", "需要空格", "无空格"),
+                (f"({right})({left})", 0, f"{self.name} {self.right_desc}", "需要空格", "无空格"),
+            ]
+        # 不需要空格，但是发现存在空格
+        return [
+            (f"({left})(\\s+)({right})", 2, f"{self.name} {self.left_desc}", "不允许空格", "有空格"),
+            (f"({right})(\\s+)({left})", 2, f"{self.name} {self.right_desc}", "不允许空格", "有空格"),
+        ]
+
+    def fixes(self, rules):
+        if rules[self.name] is not True:
+            return super().fixes(rules)
+        # 需要空格时在两个字符之间插入一个空格
+        left, right = self.left, self.right
+        return [
+            (f"{self.name} {self.left_desc}", f"(?<={left})(?={right})", 0, " "),
+            (f"{self.name} {self.right_desc}", f"(?<={right})(?={left})", 0, " "),
+        ]
+
+
+builtin(PairSpacingRule("require_space_between_cn_en", RE_CHINESE, RE_WESTERN, "(中->英)", "(英->中)"))
+builtin(PairSpacingRule("require_space_between_cn_number", RE_CHINESE, RE_NUMBER, "(中->数)", "(数->中)"))
+builtin(PairSpacingRule("require_space_between_en_number", RE_WESTERN, RE_NUMBER, "(英->数)", "(数->英)"))
+
+
+@builtin
+class SpaceAfterChinesePunctuationRule(TextPatternRule):
+    name = "space_after_chinese_punctuation"
+    keys = ("space_after_chinese_punctuation",)
+
+    def applies(self, rules):
+        return rules.get(self.name) == "none"
+
+    def expand(self, rules):
+        return [(f"({RE_CHINESE_PUNCTUATION})(\\s+)", 2, self.name, "none (无空格)", "有空格")]
+
+
+@builtin
+class FullWidthBracketSpacingRule(TextPatternRule):
+    name = "no_space_around_full_width_brackets"
+    keys = ("no_space_around_full_width_brackets",)
+
+    def applies(self, rules):
+        return rules.get(self.name) is True
+
+    def expand(self, rules):
+        return [
+            (f"({RE_FULL_WIDTH_BRACKETS_LEFT})(\\s+)", 2, f"{self.name} (左括号后)", "括号内侧无空格", "有空格"),
+            (f"(\\s+)({RE_FULL_WIDTH_BRACKETS_RIGHT})", 1, f"{self.name} (右括号前)", "括号内侧无空格", "有空格"),
+        ]
+
+
+@builtin
+class FullWidthPunctuationToEnNumRule(TextPatternRule):
+    name = "no_space_after_full_width_punctuation_to_en_num"
+    keys = ("no_space_after_full_width_punctuation_to_en_num",)
+
+    def applies(self, rules):
+        return rules.get(self.name) is True
+
+    def expand(self, rules):
+        pattern = f"({RE_CHINESE_PUNCTUATION})(\\s+)([{RE_WESTERN.strip('[]')}{RE_NUMBER.strip('[]')}])"
+        return [(pattern, 2, self.name, "全角标点后接英文/数字时无空格", "有空格")]
@@ -0,0 +1,164 @@
+"""
+段落和 run 的有效格式属性（已解析样式继承）。
+
+属性在第一次访问时解析并缓存，同一段落无论被多少套规则检查，
+每个属性都只沿样式链查找一次。FormatChecker 的各个 check_* 方法都基于这里的对象工作。
+"""
+from functools import cached_property
+
+from rules import RE_CHINESE, RE_WESTERN
+
+import re
+
+
+def resolve_sections(doc):
+    """每个节的页边距（厘米）。"""
+    return [
+        {
+            "left_margin_cm": section.left_margin.cm,
+            "right_margin_cm": section.right_margin.cm,
+            "top_margin_cm": section.top_margin.cm,
+            "bottom_margin_cm": section.bottom_margin.cm,
+        }
+        for section in doc.sections
+    ]
+
+
+class ResolvedRun:
+    def __init__(self, run, paragraph, document, index, start):
+        self.run = run
+        self.paragraph = paragraph
+        self.document = document
+        self.index = index
+        self.text = run.text
+        # run 在所属段落文本中的位置 [start, end)
+        self.start = start
+        self.end = start + len(self.text)
+
+    @cached_property
+    def font_size_pt(self):
+        from font import get_effective_font_property
+
+        return get_effective_font_property(self.paragraph, self.run, "size")
+
+    @cached_property
+    def bold(self):
+        from font import get_effective_font_property
+
+        return get_effective_font_property(self.paragraph, self.run, "bold")
+
+    @cached_property
+    def italic(self):
+        from font import get_effective_font_property
+
+        return get_effective_font_property(self.paragraph, self.run, "italic")
+
+    @cached_property
+    def fonts(self):
+        """{"ascii", "hAnsi", "eastAsia", "cs"} -> 字体名"""
+        from utils import get_effective_run_fonts
+
+        return get_effective_run_fonts(self.run, self.paragraph, self.document)
+
+    @cached_property
+    def has_chinese(self):
+        return bool(re.search(RE_CHINESE, self.text))
+
+    @cached_property
+    def has_western(self):
+        return bool(re.search(RE_WESTERN, self.text))
+
+
+class ResolvedParagraph:
+    def __init__(self, paragraph, index, document=None):
+        self.paragraph = paragraph
+        self.index = index
+        self.document = document if document is not None else paragraph.part.document
+
+    @cached_property
+    def text(self):
+        return self.paragraph.text
+
+    @cached_property
+    def style(self):
+        # python-docx 每次访问 paragraph.style 都要在 styles.xml 中重新查找
+        return self.paragraph.style
+
+    @cached_property
+    def style_name(self):
+        return self.style.name
+
+    @cached_property
+    def runs(self):
+        resolved_runs = []
+        offset = 0
+        for r_idx, run in enumerate(self.paragraph.runs):
+            resolved_run = ResolvedRun(run, self.paragraph, self.document, r_idx, offset)
+            offset = resolved_run.end
+            resolved_runs.append(resolved_run)
+        return resolved_runs
+
+    @cached_property
+    def alignment(self):
+        from paragraph import get_effective_alignment
+
+        return get_effective_alignment(self.paragraph)
+
+    @cached_property
+    def first_line_indent_pt(self):
+        from paragraph import get_effective_first_line_indent
+
+        return get_effective_first_line_indent(self.paragraph)
+
+    @cached_property
+    def line_spacing_rule(self):
+        from paragraph import get_effective_line_spacing_rule
+
+        return get_effective_line_spacing_rule(self.paragraph)
+
+    @cached_property
+    def line_spacing(self):
+        from paragraph import get_effective_line_spacing
+
+        return get_effective_line_spacing(self.paragraph)
+
+    def _format_value(self, attribute_name, default_value):
+        """
+        获取有效的格式值。
+        首先检查直接格式，然后检查样式格式，最后使用默认值。
+        """
+        value = getattr(self.paragraph.paragraph_format, attribute_name, None)
+        if value is None and self.style:
+            value = getattr(self.style.paragraph_format, attribute_name, None)
+
+        if value is None:
+            return default_value
+        return value
+
+    @cached_property
+    def space_before_pt(self):
+        value = self._format_value("space_before", None)
+        return value.pt if value is not None else 0
+
+    @cached_property
+    def space_after_pt(self):
+        value = self._format_value("space_after", None)
+        return value.pt if value is not None else 0
+
+    @cached_property
+    def keep_with_next(self):
+        return self._format_value("keep_with_next", False)  # Word 默认可能是 False
+
+    @cached_property
+    def keep_together(self):
+        return self._format_value("keep_together", False)  # Word 默认可能是 False
+
+    @cached_property
+    def widow_control(self):
+        # Word 的默认 widow_control 通常是 True (如果样式中未指定)
+        return self._format_value("widow_control", True)
+
+    @cached_property
+    def has_drawing(self):
+        # 段落中有图片（DrawingML 的 w:drawing 或 VML 的 w:pict，包括 mc:AlternateContent 中的）
+        return bool(self.paragraph._p.xpath(".//w:drawing | .//w:pict"))
@@ -0,0 +1,200 @@
+"""
+FormatChecker.check_document 的返回值。
+"""
+
+# 提前结束检查的原因
+STOP_MAX_ERRORS = "max_errors"
+STOP_MAX_ERRORS_PER_RULE = "max_errors_per_rule"
+STOP_TIME_BUDGET = "time_budget"
+STOP_CANCELLED = "cancelled"
+
+STOP_REASON_TEXT = {
+    STOP_MAX_ERRORS: "错误数达到上限",
+    STOP_MAX_ERRORS_PER_RULE: "单条规则的错误数达到上限",
+    STOP_TIME_BUDGET: "超出检查时间预算",
+    STOP_CANCELLED: "检查被取消",
+}
+
+
+class CheckResult(list):
+    """
+    仍是按段落组织的错误列表（与原来的 self.errors 结构相同），
+    另外记录本次检查是否完整以及检查到了哪里。
+    """
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self.partial = False
+        self.stop_reason = None
+        self.stop_detail = None
+        self.paragraphs_checked = 0
+        self.paragraphs_total = None
+        self.findings = 0
+        self.elapsed_s = 0.0
+        # 使用执行计划检查时为 planner.ExecutionPlan.as_dict() 的结果
+        self.plan = None
+        # memory_accounting=True 时为各阶段的内存统计，见 memory_usage.py
+        self.memory = None
+        # 错误块引用的段落文本，见 ErrorBlock
+        self.texts = TextStore()
+
+    def mark_stopped(self, reason, detail=None):
+        self.partial = True
+        self.stop_reason = reason
+        self.stop_detail = detail
+
+    def status(self):
+        """可 JSON 序列化的检查状态。"""
+        return {
+            "partial": self.partial,
+            "stop_reason": self.stop_reason,
+            "stop_detail": self.stop_detail,
+            "paragraphs_checked": self.paragraphs_checked,
+            "paragraphs_total": self.paragraphs_total,
+            "findings": self.findings,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "plan": self.plan,
+            "memory": self.memory,
+        }
+
+    def describe(self):
+        """一行中文描述，供控制台和报告使用；完整检查时返回空字符串。"""
+        if not self.partial:
+            return ""
+        reason = STOP_REASON_TEXT.get(self.stop_reason, self.stop_reason)
+        if self.stop_detail:
+            reason += f" ({self.stop_detail})"
+        total = self.paragraphs_total if self.paragraphs_total is not None else "?"
+        return (f"检查提前结束：{reason}，已检查 {self.paragraphs_checked}/{total} 个段落，"
+                f"记录 {self.findings} 个问题，用时 {self.elapsed_s:.2f} 秒")
+
+
+class TextStore:
+    """
+    一次检查中出错段落的文本，相同的文本只保存一份。错误块只记录文本编号，
+    摘要、run_text 和高亮都在需要时再从这里截取。
+    """
+
+    def __init__(self):
+        self.texts = []
+        self._ids = {}
+
+    def add(self, text):
+        text_id = self._ids.get(text)
+        if text_id is None:
+            text_id = self._ids[text] = len(self.texts)
+            self.texts.append(text)
+        return text_id
+
+    def __getitem__(self, text_id):
+        return self.texts[text_id]
+
+    def __len__(self):
+        return len(self.texts)
+
+
+def snippet_of(text, length):
+    return text[:length].replace("\n", " ")
+
+
+def run_text_of(text, location):
+    """run 错误的 run_text：location 是 run 在段落文本中的 [起点, 终点]，取前 20 个字符。"""
+    return snippet_of(text[location[0]:location[1]], 20)
+
+
+class ErrorBlock(dict):
+    """
+    一个段落的错误块，对外仍是原来的
+    {"para_idx", "style_name", "paragraph_text_snippet", "full_text", "details"} 字典
+    （下标访问、get、items、json.dump、pickle 都得到原来的结构），但内部只保存
+    para_idx、style_name、details 以及段落文本在 TextStore 中的编号：
+
+    - paragraph_text_snippet 记为截取长度，访问时再截取；
+    - details 中 run 错误的 run_text 能由 location 从段落文本截出时不保存，
+      访问 details 时再补上。
+
+    details 的原始列表在 raw_details 中，只有 FormatChecker._add_error 向其中追加。
+    """
+
+    __slots__ = ("_texts", "_text_id", "_snippet")
+
+    KEYS = ("para_idx", "style_name", "paragraph_text_snippet", "full_text", "details")
+
+    def __init__(self, para_idx, style_name, texts, text_id, snippet):
+        super().__init__(para_idx=para_idx, style_name=style_name, details=[])
+        self._texts = texts
+        self._text_id = text_id
+        # int 表示摘要是段落文本的前若干个字符，否则是摘要本身
+        self._snippet = snippet
+
+    @property
+    def full_text(self):
+        return self._texts[self._text_id]
+
+    @property
+    def snippet(self):
+        if isinstance(self._snippet, int):
+            return snippet_of(self.full_text, self._snippet)
+        return self._snippet
+
+    @property
+    def raw_details(self):
+        return dict.__getitem__(self, "details")
+
+    def expand_detail(self, detail):
+        if "run_idx" not in detail or "run_text" in detail:
+            return detail
+        expanded = {}
+        for key, value in detail.items():
+            if key == "location":
+                expanded["run_text"] = run_text_of(self.full_text, value)
+            expanded[key] = value
+        return expanded
+
+    def __getitem__(self, key):
+        if key == "full_text":
+            return self.full_text
+        if key == "paragraph_text_snippet":
+            return self.snippet
+        if key == "details":
+            return [self.expand_detail(detail) for detail in self.raw_details]
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self.KEYS else default
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def keys(self):
+        return list(self.KEYS)
+
+    def values(self):
+        return [self[key] for key in self.KEYS]
+
+    def items(self):
+        return [(key, self[key]) for key in self.KEYS]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        # 传给其他进程或写入缓存时还原成普通字典
+        return dict, (dict(self.items()),)
@@ -0,0 +1,63 @@
+"""
+检查结果的磁盘缓存。
+
+缓存键由文档内容、规则集和检查代码三者的哈希组成，任一变化都会失效。
+命中时直接读取 JSON 结果，不需要导入 python-docx。
+"""
+import hashlib
+import json
+import os
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def hash_file(path, hasher):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+
+
+def rules_fingerprint(rules):
+    """规则集的稳定指纹（枚举值按整数序列化）。compiled_rules.CompiledRules 直接使用编译时算好的值。"""
+    digest = getattr(rules, "digest", None)
+    if digest is not None:
+        return digest
+    encoded = json.dumps(rules, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def code_fingerprint(module_files=None):
+    """检查代码的指纹；module_files 为 None 时包含本目录下所有 .py 文件。"""
+    hasher = hashlib.sha256()
+    names = module_files if module_files is not None else os.listdir(_PACKAGE_DIR)
+    for name in sorted(names):
+        if name.endswith(".py"):
+            hash_file(os.path.join(_PACKAGE_DIR, name), hasher)
+    return hasher.hexdigest()
+
+
+def cache_key(doc_path, rules):
+    hasher = hashlib.sha256()
+    hash_file(doc_path, hasher)
+    hasher.update(rules_fingerprint(rules).encode("ascii"))
+    hasher.update(code_fingerprint().encode("ascii"))
+    return hasher.hexdigest()
+
+
+def load_cached_errors(cache_dir, key):
+    """返回缓存的错误列表；未命中返回 None。"""
+    path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def store_errors(cache_dir, key, errors):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(errors, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
@@ -1,4 +1,4 @@
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+from enums import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
 
 DEFAULT_RULES = {
     "section": {
@@ -291,7 +291,7 @@ DEFAULT_RULES = {
             "require_space_between_cn_en": False,
         },
         "摘要正文": {
-            "based_on": "论文正文",
+            "based_on": "正文",
             "chinese_font": "楷体_GB2312",
             "western_font": "Times New Roman",
             "common_script_font": "楷体_GB2312",
@@ -305,6 +305,14 @@ DEFAULT_RULES = {
         },
     },
 }
+
+# 跨段落规则（见 window.py），值为 True 时使用默认配置。默认不启用：
+# python checking.py --cross-paragraph 或在规则集中加入 "cross_paragraph" 分组时才检查
+CROSS_PARAGRAPH_RULES = {
+    "heading_numbering": True,
+    "figure_keep_with_caption": {"caption_styles": {"图标题": "below"}, "figure_styles": ["图"]},
+    "reference_numbering": {"styles": ["参考文献"]},
+}
 # --- 规则定义结束 ---
 
 # 用于浮点数比较的容差
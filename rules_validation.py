@@ -0,0 +1,145 @@
+"""
+规则集静态校验。
+
+在不打开任何文档的情况下检查 DEFAULT_RULES 形状的规则字典：
+based_on 是否指向存在的样式、继承链是否成环、各个键的取值类型是否正确，
+跨段落规则的名字和配置（见 window.py 中各规则的 config_types）。
+只依赖标准库和 enums.py，不会导入 python-docx。
+"""
+from enums import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+
+_NUMBER = (int, float)
+
+# 规则键 -> 允许的取值类型；枚举类型的值也可以写成对应的整数
+RULE_KEY_TYPES = {
+    "based_on": (str, type(None)),
+    "is_default": bool,
+    "aliases": (list, tuple),
+    "chinese_font": str,
+    "western_font": str,
+    "common_script_font": str,
+    "chinese": str,
+    "western": str,
+    "font_size_pt": _NUMBER,
+    "font_bold": bool,
+    "font_italic": bool,
+    "first_line_indent_pt": _NUMBER,
+    "hanging_indent_cm": _NUMBER,
+    "line_spacing_rule": WD_LINE_SPACING,
+    "line_spacing_value": _NUMBER,
+    "alignment": WD_ALIGN_PARAGRAPH,
+    "space_before_pt": _NUMBER,
+    "space_after_pt": _NUMBER,
+    "keep_with_next": bool,
+    "keep_together": bool,
+    "widow_control": bool,
+    "left_margin_cm": _NUMBER,
+    "right_margin_cm": _NUMBER,
+    "top_margin_cm": _NUMBER,
+    "bottom_margin_cm": _NUMBER,
+    "require_space_between_cn_en": bool,
+    "require_space_between_cn_number": bool,
+    "require_space_between_en_number": bool,
+    "space_after_chinese_punctuation": str,
+    "space_before_chinese_punctuation": str,
+    "no_space_around_full_width_brackets": bool,
+    "no_space_after_full_width_punctuation_to_en_num": bool,
+}
+
+REQUIRED_SECTIONS = ("section", "paragraph")
+
+
+def _check_value_type(key, value):
+    expected = RULE_KEY_TYPES.get(key)
+    if expected is None:
+        return f"未知的规则键 '{key}'"
+    if expected in (WD_ALIGN_PARAGRAPH, WD_LINE_SPACING):
+        try:
+            expected(value)
+        except ValueError:
+            return f"'{key}' 的取值 {value!r} 不是合法的 {expected.__name__}"
+        return None
+    # bool 是 int 的子类，数值键不接受 True/False
+    if isinstance(value, bool) and expected is _NUMBER:
+        return f"'{key}' 应为数值，实际为 {value!r}"
+    if not isinstance(value, expected):
+        return f"'{key}' 的取值 {value!r} 类型不正确"
+    return None
+
+
+def _check_window_config(name, rule_config, config_types):
+    problems = []
+    for key, value in rule_config.items():
+        spec = config_types.get(key)
+        if spec is None:
+            problems.append(f"[cross_paragraph/{name}] 未知的配置键 '{key}'")
+            continue
+        container, element_type = spec
+        if not isinstance(value, (list, tuple, set) if container is list else container):
+            problems.append(f"[cross_paragraph/{name}] '{key}' 的取值 {value!r} 类型不正确")
+            continue
+        if isinstance(value, dict):
+            if not all(isinstance(style_name, str) for style_name in value):
+                problems.append(f"[cross_paragraph/{name}] '{key}' 的键应为样式名")
+            value = value.values()
+        for element in value:
+            if isinstance(element_type, tuple):
+                valid = element in element_type
+            else:
+                # bool 是 int 的子类，不能当作级别
+                valid = isinstance(element, element_type) and not isinstance(element, bool)
+            if not valid:
+                problems.append(f"[cross_paragraph/{name}] '{key}' 中的取值 {element!r} 不合法")
+    return problems
+
+
+def validate_rules(rules):
+    """
+    校验规则集，返回问题描述字符串的列表；列表为空表示规则集可用。
+    """
+    problems = []
+    for section in REQUIRED_SECTIONS:
+        if not isinstance(rules.get(section), dict):
+            problems.append(f"缺少规则分组 '{section}'")
+    if problems:
+        return problems
+
+    for group in ("section", "fonts", "spacing"):
+        for key, value in rules.get(group, {}).items():
+            problem = _check_value_type(key, value)
+            if problem:
+                problems.append(f"[{group}] {problem}")
+
+    from window import WINDOW_RULES
+
+    for name, rule_config in rules.get("cross_paragraph", {}).items():
+        if name not in WINDOW_RULES:
+            problems.append(f"[cross_paragraph] 未知的跨段落规则 '{name}'")
+        elif not isinstance(rule_config, (dict, bool, type(None))):
+            problems.append(f"[cross_paragraph/{name}] 配置应为字典或 True/False")
+        elif isinstance(rule_config, dict):
+            problems += _check_window_config(name, rule_config, WINDOW_RULES[name].config_types)
+
+    paragraph_rules = rules["paragraph"]
+    for style_name, style_rules in paragraph_rules.items():
+        for key, value in style_rules.items():
+            problem = _check_value_type(key, value)
+            if problem:
+                problems.append(f"[paragraph/{style_name}] {problem}")
+
+        # based_on 必须指向已定义的样式，且继承链不能成环
+        chain = [style_name]
+        base_name = style_rules.get("based_on")
+        while base_name:
+            if base_name not in paragraph_rules:
+                problems.append(
+                    f"[paragraph/{style_name}] based_on 引用了不存在的样式 '{base_name}'")
+                break
+            if base_name in chain:
+                problems.append(
+                    f"[paragraph/{style_name}] based_on 继承链成环: {' -> '.join(chain + [base_name])}")
+                break
+            chain.append(base_name)
+            base_name = paragraph_rules[base_name].get("based_on")
+
+    return problems
@@ -0,0 +1,338 @@
+"""
+解析后文档模型的磁盘快照。
+
+调整 rules.py 后反复检查同一份文档时，打开 docx 并沿样式链解析每个段落和 run
+的有效格式占了几乎全部时间，而这部分结果与规则集无关。快照把解析结果保存下来，
+之后按任意规则集检查都直接读取快照，不再打开 docx。
+
+文件布局（整数均为小端 uint32）：
+
+    MAGIC (8 字节) | 头部长度 (4 字节) | 头部 JSON | 填充到 4 字节对齐
+    段落表: 每段 6 个整数 [文本偏移, 文本字节数, 样式序号, 段落属性序号, 首个 run 序号, run 数]
+    run 表: 每个 run 5 个整数 [文本偏移, 文本字节数, 起始字符, 结束字符, run 属性序号]
+    文本区: 所有段落和 run 文本的 UTF-8
+
+段落属性和 run 属性在头部中去重成表，段落/run 只记录表中的序号。
+快照以 mmap 方式打开，段落对象在遍历时才构造，文本在访问时才解码。
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from enums import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+from resolved import ResolvedParagraph, ResolvedRun
+
+MAGIC = b"WCSNAP1\0"
+SNAPSHOT_VERSION = 2
+
+PARAGRAPH_FIELDS = 6
+RUN_FIELDS = 5
+
+# 段落属性表每一项的字段顺序，与 ResolvedParagraph 的属性同名
+PARAGRAPH_PROPERTIES = (
+    "alignment",
+    "first_line_indent_pt",
+    "line_spacing_rule",
+    "line_spacing",
+    "space_before_pt",
+    "space_after_pt",
+    "keep_with_next",
+    "keep_together",
+    "widow_control",
+    "has_drawing",
+)
+# 保存为整数、读取时还原成枚举的字段
+ENUM_PROPERTIES = {
+    "alignment": WD_ALIGN_PARAGRAPH,
+    "line_spacing_rule": WD_LINE_SPACING,
+}
+RUN_PROPERTIES = ("font_size_pt", "bold", "italic")
+RUN_FONT_KEYS = ("ascii", "hAnsi", "eastAsia", "cs")
+# 快照段落 / run 能提供的全部属性；规则的 requires 超出这个范围时不能用快照检查
+SNAPSHOT_PROPERTIES = frozenset(
+    ("index", "text", "style_name", "runs", "start", "end", "fonts", "has_chinese", "has_western")
+    + PARAGRAPH_PROPERTIES + RUN_PROPERTIES
+)
+
+
+# 决定快照内容的模块；rules.py 不在其中，修改规则不会使快照失效
+RESOLVER_MODULES = (
+    "enums.py", "font.py", "lazy_package.py", "paragraph.py",
+    "resolved.py", "snapshot.py", "utils.py",
+)
+
+
+def snapshot_key(doc_path):
+    """快照与文档内容和解析代码有关，与规则集无关。"""
+    from result_cache import code_fingerprint, hash_file
+
+    hasher = hashlib.sha256()
+    hash_file(doc_path, hasher)
+    hasher.update(code_fingerprint(RESOLVER_MODULES).encode("ascii"))
+    return hasher.hexdigest()
+
+
+def snapshot_path(snapshot_dir, key):
+    return os.path.join(snapshot_dir, f"{key}.snap")
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, int):
+        return int(value)  # 枚举和 Length 都是 int 的子类
+    return float(value)
+
+
+def _uint32_bytes(values):
+    table = array("I", values)
+    if sys.byteorder == "big":
+        table.byteswap()
+    return table.tobytes()
+
+
+def write_snapshot(path, section_margins, paragraphs):
+    """
+    把 resolve_sections 的结果和 ResolvedParagraph 列表写入快照（原子替换）。
+    会解析每个段落和 run 尚未访问过的全部属性。
+    """
+    styles, style_index = [], {}
+    paragraph_props, paragraph_props_index = [], {}
+    run_props, run_props_index = [], {}
+    paragraph_table, run_table = [], []
+    text_chunks, text_offset = [], 0
+
+    def add_text(text):
+        nonlocal text_offset
+        encoded = text.encode("utf-8")
+        text_chunks.append(encoded)
+        offset = text_offset
+        text_offset += len(encoded)
+        return offset, len(encoded)
+
+    def intern(value, table, index):
+        position = index.get(value)
+        if position is None:
+            position = index[value] = len(table)
+            table.append(value)
+        return position
+
+    for p in paragraphs:
+        text_off, text_len = add_text(p.text)
+        style_idx = intern(p.style_name, styles, style_index)
+        props = tuple(_encode_value(getattr(p, name)) for name in PARAGRAPH_PROPERTIES)
+        props_idx = intern(props, paragraph_props, paragraph_props_index)
+        first_run = len(run_table) // RUN_FIELDS
+        for run in p.runs:
+            run_off, run_len = add_text(run.text)
+            fonts = run.fonts
+            props = tuple(_encode_value(getattr(run, name)) for name in RUN_PROPERTIES) + tuple(
+                fonts.get(key) for key in RUN_FONT_KEYS
+            )
+            run_table += (run_off, run_len, run.start, run.end, intern(props, run_props, run_props_index))
+        paragraph_table += (text_off, text_len, style_idx, props_idx, first_run, len(p.runs))
+
+    header = json.dumps(
+        {
+            "version": SNAPSHOT_VERSION,
+            "sections": section_margins,
+            "styles": styles,
+            "paragraph_props": paragraph_props,
+            "run_props": run_props,
+            "paragraphs": len(paragraph_table) // PARAGRAPH_FIELDS,
+            "runs": len(run_table) // RUN_FIELDS,
+            "text_bytes": text_offset,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    padding = b"\0" * (-(len(MAGIC) + 4 + len(header)) % 4)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(padding)
+        f.write(_uint32_bytes(paragraph_table))
+        f.write(_uint32_bytes(run_table))
+        for chunk in text_chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+class SnapshotRun(ResolvedRun):
+    """从快照还原的 run，属性预先填入 cached_property 的缓存。"""
+
+    def __init__(self, index, text, start, end, props):
+        self.run = self.paragraph = self.document = None
+        self.index = index
+        self.text = text
+        self.start = start
+        self.end = end
+        values = self.__dict__
+        for name, value in zip(RUN_PROPERTIES, props):
+            values[name] = value
+        values["fonts"] = dict(zip(RUN_FONT_KEYS, props[len(RUN_PROPERTIES):]))
+
+
+class SnapshotParagraph(ResolvedParagraph):
+    """从快照还原的段落，可以直接交给 FormatChecker.check_resolved_paragraph。"""
+
+    def __init__(self, snapshot, index):
+        self.paragraph = self.document = None
+        self.index = index
+        self._snapshot = snapshot
+        record = snapshot._paragraph_record(index)
+        values = self.__dict__
+        values["style_name"] = snapshot.styles[record[2]]
+        values.update(zip(PARAGRAPH_PROPERTIES, snapshot.paragraph_props[record[3]]))
+
+    @property
+    def text(self):
+        text = self.__dict__.get("text")
+        if text is None:
+            text = self.__dict__["text"] = self._snapshot._paragraph_text(self.index)
+        return text
+
+    @property
+    def runs(self):
+        runs = self.__dict__.get("runs")
+        if runs is None:
+            runs = self.__dict__["runs"] = self._snapshot._paragraph_runs(self.index)
+        return runs
+
+
+class SnapshotParagraphs(Sequence):
+    """DocumentSnapshot.paragraphs：按需创建 SnapshotParagraph 的只读序列，逐段检查时不会同时保留全部段落。"""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return self._snapshot.paragraph_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("段落序号超出范围")
+        return SnapshotParagraph(self._snapshot, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield SnapshotParagraph(self._snapshot, index)
+
+
+class DocumentSnapshot:
+    """以 mmap 方式打开的快照。用完后调用 close()，或作为上下文管理器使用。"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self):
+        view = memoryview(self._mmap)
+        self._views.append(view)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"'{self.path}' 不是快照文件")
+        (header_len,) = struct.unpack_from("<I", view, len(MAGIC))
+        offset = len(MAGIC) + 4
+        header = json.loads(bytes(view[offset:offset + header_len]).decode("utf-8"))
+        if header["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"快照版本 {header['version']} 与当前版本 {SNAPSHOT_VERSION} 不兼容")
+        offset += header_len
+        offset += -offset % 4
+
+        self.sections = header["sections"]
+        self.styles = header["styles"]
+        self.paragraph_props = [self._decode_paragraph_props(props) for props in header["paragraph_props"]]
+        self.run_props = [tuple(props) for props in header["run_props"]]
+
+        paragraph_bytes = header["paragraphs"] * PARAGRAPH_FIELDS * 4
+        run_bytes = header["runs"] * RUN_FIELDS * 4
+        if sys.byteorder == "big":
+            # 大端机器上不能直接 cast，复制一份并交换字节序
+            self._paragraph_table = array("I")
+            self._paragraph_table.frombytes(view[offset:offset + paragraph_bytes])
+            self._paragraph_table.byteswap()
+            self._run_table = array("I")
+            self._run_table.frombytes(view[offset + paragraph_bytes:offset + paragraph_bytes + run_bytes])
+            self._run_table.byteswap()
+        else:
+            self._paragraph_table = view[offset:offset + paragraph_bytes].cast("I")
+            self._run_table = view[offset + paragraph_bytes:offset + paragraph_bytes + run_bytes].cast("I")
+        offset += paragraph_bytes + run_bytes
+        self._text = view[offset:offset + header["text_bytes"]]
+        self._views += [self._text, self._paragraph_table, self._run_table]
+        self.paragraph_count = header["paragraphs"]
+
+    @staticmethod
+    def _decode_paragraph_props(props):
+        decoded = list(props)
+        for i, name in enumerate(PARAGRAPH_PROPERTIES):
+            enum_class = ENUM_PROPERTIES.get(name)
+            if enum_class is not None and decoded[i] is not None:
+                decoded[i] = enum_class(decoded[i])
+        return tuple(decoded)
+
+    def _paragraph_record(self, index):
+        start = index * PARAGRAPH_FIELDS
+        # 转成 tuple，避免切片视图在 close() 时仍然引用着 mmap
+        return tuple(self._paragraph_table[start:start + PARAGRAPH_FIELDS])
+
+    def _decode(self, offset, length):
+        return str(self._text[offset:offset + length], "utf-8")
+
+    def _paragraph_text(self, index):
+        record = self._paragraph_record(index)
+        return self._decode(record[0], record[1])
+
+    def _paragraph_runs(self, index):
+        record = self._paragraph_record(index)
+        runs = []
+        for r_idx in range(record[5]):
+            start = (record[4] + r_idx) * RUN_FIELDS
+            text_off, text_len, char_start, char_end, props_idx = self._run_table[start:start + RUN_FIELDS]
+            runs.append(SnapshotRun(r_idx, self._decode(text_off, text_len), char_start, char_end,
+                                    self.run_props[props_idx]))
+        return runs
+
+    @property
+    def paragraphs(self):
+        return SnapshotParagraphs(self)
+
+    def close(self):
+        for view in self._views:
+            if isinstance(view, memoryview):
+                view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_snapshot(snapshot_dir, doc_path):
+    """打开 doc_path 对应的快照；不存在或已损坏时返回 None。"""
+    path = snapshot_path(snapshot_dir, snapshot_key(doc_path))
+    try:
+        return DocumentSnapshot(path)
+    except (FileNotFoundError, ValueError, KeyError, struct.error):
+        return None
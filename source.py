@@ -0,0 +1,110 @@
+"""
+check_document 的输入：文件路径，或已经在内存中的文档内容。
+
+上传服务收到的文档本来就在内存里，不必先写到临时文件再检查。
+bytes / bytearray / memoryview / mmap 都通过 BufferReader 直接交给 zipfile：
+zipfile 只读取中央目录和实际被请求的成员，成员在读取时才解压，
+每次 read 只复制被请求的那一段，整个缓冲区不会被复制。
+"""
+import io
+import mmap
+import os
+from contextlib import contextmanager
+
+
+class BufferReader(io.RawIOBase):
+    """把支持缓冲区协议的对象包装成只读、可 seek 的文件对象。"""
+
+    def __init__(self, buffer, name=None):
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+        if name is not None:
+            self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"不支持的 whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"seek 位置不能为负数: {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            end = len(self._view)
+        else:
+            end = min(self._pos + size, len(self._view))
+        if self._pos >= end:
+            return b""
+        data = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        # 释放对底层缓冲区的引用，否则调用方之后无法关闭自己的 mmap
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def is_buffer(source):
+    return isinstance(source, (bytes, bytearray, memoryview, mmap.mmap))
+
+
+def describe_source(source):
+    """用于日志和报告的文档名称。"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if is_buffer(source):
+        return f"<内存中的文档, {memoryview(source).nbytes} 字节>"
+    name = getattr(source, "name", None)
+    if isinstance(name, str):
+        return name
+    return f"<{type(source).__name__}>"
+
+
+@contextmanager
+def open_source(source):
+    """
+    把 check_document 接受的各种输入转换成 docx.Document 能打开的对象：
+    - 路径 (str / PathLike)：原样返回
+    - bytes / bytearray / memoryview / mmap：包装成 BufferReader，退出时释放
+    - 可 seek 的文件对象：原样返回，不负责关闭
+    - 不可 seek 的文件对象（管道、网络流）：只能先完整读入内存
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield source
+    elif is_buffer(source):
+        reader = BufferReader(source)
+        try:
+            yield reader
+        finally:
+            reader.close()
+    elif hasattr(source, "read"):
+        if getattr(source, "seekable", lambda: False)():
+            yield source
+        else:
+            yield io.BytesIO(source.read())
+    else:
+        raise TypeError(f"不支持的文档输入类型: {type(source).__name__}")
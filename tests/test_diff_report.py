@@ -0,0 +1,31 @@
+"""diff_report.py：节格式的错误不随段落对齐变化。"""
+import logging
+
+from diff_report import ADDED, PERSISTING, REMOVED, SECTION_CATEGORIES, diff_documents
+
+
+def _save(path, texts):
+    import docx
+
+    # 默认模板的页边距（2.54 厘米）与 DEFAULT_RULES 不同，每个版本都有节格式的错误
+    document = docx.Document()
+    for text in texts:
+        document.add_paragraph(text)
+    document.save(path)
+
+
+def test_insert_before_first_paragraph(tmp_path, caplog):
+    body = ["第一段正文内容。", "第二段正文内容。", "第三段正文内容。"]
+    old_path, new_path = tmp_path / "old.docx", tmp_path / "new.docx"
+    _save(old_path, body)
+    _save(new_path, ["插入的段落 abc123"] + body)
+
+    with caplog.at_level(logging.ERROR):
+        diff, _ = diff_documents(str(old_path), str(new_path))
+
+    section = [entry for entry in diff[PERSISTING] if entry["category"] in SECTION_CATEGORIES]
+    assert section
+    for status in (ADDED, REMOVED):
+        assert not [entry for entry in diff[status] if entry["category"] in SECTION_CATEGORIES]
+    assert not diff[REMOVED]
+    assert {entry["new_para_idx"] for entry in diff[ADDED]} <= {0}
@@ -0,0 +1,48 @@
+"""job_queue.py：检查时抛出异常的文档移到 failed/，不影响后面的任务。"""
+import json
+import logging
+import zipfile
+
+from job_queue import DONE, FAILED, INCOMING, LEASED, JobQueue, work
+
+
+def _build_documents(tmp_path):
+    import docx
+    from docx.shared import Pt
+
+    document = docx.Document()
+    document.add_paragraph().add_run("正文段落").font.size = Pt(12)
+    good_path = tmp_path / "good.docx"
+    document.save(good_path)
+
+    # 字号不是整数，解析 run 属性时抛出 ValueError
+    bad_path = tmp_path / "bad.docx"
+    with zipfile.ZipFile(good_path) as source, zipfile.ZipFile(bad_path, "w") as target:
+        for info in source.infolist():
+            data = source.read(info)
+            if info.filename == "word/document.xml":
+                data = data.replace(b'<w:sz w:val="24"/>', b'<w:sz w:val="abc"/>')
+            target.writestr(info, data)
+    return good_path, bad_path
+
+
+def test_malformed_document_does_not_stop_worker(tmp_path, caplog):
+    good_path, bad_path = _build_documents(tmp_path)
+    queue = JobQueue(tmp_path / "queue")
+    # 任务按名字领取，坏文档排在前面
+    queue.submit(str(bad_path), "a_bad.docx")
+    queue.submit(str(good_path), "b_good.docx")
+
+    with caplog.at_level(logging.CRITICAL):
+        processed = work(queue, "test-worker", poll_interval=0.01, exit_when_empty=True)
+
+    assert processed == 1
+    counts = queue.counts()
+    assert counts[INCOMING] == 0 and counts[LEASED] == 0
+    assert counts[DONE] == 1 and counts[FAILED] == 1
+    with open(queue.path(FAILED, "a_bad.docx.json"), encoding="utf-8") as f:
+        failure = json.load(f)
+    assert "ValueError" in failure["reason"]
+    assert "Traceback" in failure["traceback"]
+    with open(queue.path(DONE, "b_good.docx.json"), encoding="utf-8") as f:
+        assert json.load(f)["worker"] == "test-worker"
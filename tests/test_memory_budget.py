@@ -0,0 +1,23 @@
+"""
+每段落内存预算（与 bench_memory.py 相同的场景和预算），在 CI 中运行：
+
+    python -m pytest tests/test_memory_budget.py
+
+tracemalloc 会让检查慢好几倍，全部场景共需一两分钟。
+"""
+import pytest
+
+from bench_memory import SCENARIOS, measure_fixed, measure_scenario
+
+
+@pytest.fixture(scope="module")
+def fixed(tmp_path_factory):
+    return measure_fixed(str(tmp_path_factory.mktemp("fixed")))
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_memory_budget(name, fixed, tmp_path):
+    paragraphs, errors, measured_kb, over = measure_scenario(str(tmp_path), name, fixed)
+    assert not (errors and errors[0]["para_idx"] == -1), errors[0]["details"][0]["actual"]
+    budgets_kb = SCENARIOS[name][2]
+    assert not over, {key: f"{measured_kb[key]:.1f} KB > {budgets_kb[key]} KB" for key in over}
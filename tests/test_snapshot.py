@@ -0,0 +1,44 @@
+"""snapshot.py：规则需要快照中没有的属性时，检查读原文档而不是快照。"""
+import logging
+
+from checking import FormatChecker
+from registry import DEFAULT_REGISTRY, Rule, SCOPE_PARAGRAPH
+from rules import DEFAULT_RULES
+
+
+class StyleBuiltinRule(Rule):
+    name = "style_builtin"
+    scope = SCOPE_PARAGRAPH
+    keys = ("style_builtin",)
+    requires = ("style",)
+
+    def check(self, ctx):
+        # 快照段落没有 python-docx 样式对象
+        if ctx.p.style.builtin != ctx.rules["style_builtin"]:
+            ctx.error("段落格式", self.name, ctx.rules["style_builtin"], ctx.p.style.builtin)
+
+
+def _build(path):
+    import docx
+
+    document = docx.Document()
+    document.add_paragraph("正文。")
+    document.save(path)
+
+
+def _rule_findings(errors):
+    return [block["para_idx"] for block in errors for detail in block["details"] if detail["rule"] == "style_builtin"]
+
+
+def test_rules_outside_snapshot_read_the_document(tmp_path, caplog):
+    doc_path, snapshot_dir = str(tmp_path / "doc.docx"), str(tmp_path / "snapshots")
+    _build(doc_path)
+    rules = {**DEFAULT_RULES, "spacing": {**DEFAULT_RULES["spacing"], "style_builtin": False}}
+    registry = DEFAULT_REGISTRY.copy()
+    registry.register(StyleBuiltinRule)
+
+    with caplog.at_level(logging.ERROR):
+        # 第一次写快照，第二次快照已存在
+        for _ in range(2):
+            errors = FormatChecker(rules, registry=registry).check_document(doc_path, snapshot_dir=snapshot_dir)
+            assert _rule_findings(errors) == [0]
@@ -0,0 +1,52 @@
+"""window.py：图片与图题同页的检查只针对真正的图片段落。"""
+import logging
+import struct
+import zlib
+
+from checking import FormatChecker
+from rules import CROSS_PARAGRAPH_RULES, DEFAULT_RULES
+
+RULE = "figure_keep_with_caption (图片与下方图题)"
+
+
+def _png(path):
+    """1x1 像素的 PNG。"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    ihdr = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+                + chunk(b"IDAT", zlib.compress(b"\x00\xff\xff\xff")) + chunk(b"IEND", b""))
+
+
+def _build(path, image_path):
+    import docx
+
+    document = docx.Document()
+    document.styles.add_style("图标题", docx.enum.style.WD_STYLE_TYPE.PARAGRAPH)
+    document.add_paragraph("正文。")
+    document.add_paragraph().add_run("   ")           # 只有空白的段落
+    document.add_paragraph("图 1 空白段落下方的图题", style="图标题")
+    document.add_paragraph().add_run().add_picture(str(image_path))
+    document.add_paragraph("图 2 图片下方的图题", style="图标题")
+    document.save(path)
+
+
+def _figure_findings(errors):
+    return [block["para_idx"] for block in errors for detail in block["details"] if detail["rule"] == RULE]
+
+
+def test_only_drawings_count_as_figures(tmp_path, caplog):
+    image_path, doc_path = tmp_path / "pixel.png", tmp_path / "figures.docx"
+    _png(image_path)
+    _build(doc_path, image_path)
+    rules = {**DEFAULT_RULES, "cross_paragraph": CROSS_PARAGRAPH_RULES}
+
+    with caplog.at_level(logging.ERROR):
+        assert _figure_findings(FormatChecker(rules).check_document(str(doc_path))) == [3]
+        # 写快照的一次和读快照的一次结果相同
+        snapshot_dir = str(tmp_path / "snapshots")
+        for _ in range(2):
+            errors = FormatChecker(rules).check_document(str(doc_path), snapshot_dir=snapshot_dir)
+            assert _figure_findings(errors) == [3]
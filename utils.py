@@ -1,6 +1,10 @@
+import weakref
+
 import tangled_up_in_unicode as unicodedata_tuu
 import docx
 from docx.oxml.ns import qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from lxml import etree
 from docx.shared import Pt, Cm  # 用于处理磅和厘米单位
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING  # 用于段落格式
 
@@ -51,6 +55,143 @@ def get_default_rfonts_attr(document, attr_name):
     return None
 
 
+# w:rFonts 中字体属性对应的主题字体属性（注意 cs 对应的是全小写的 w:cstheme）
+THEME_FONT_ATTRS = {
+    "ascii": "w:asciiTheme",
+    "hAnsi": "w:hAnsiTheme",
+    "eastAsia": "w:eastAsiaTheme",
+    "cs": "w:cstheme",
+}
+
+_DRAWINGML_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+# w:themeFontLang 的东亚语言 -> 主题中 <a:font script="..."> 的脚本名
+EAST_ASIA_LANG_SCRIPTS = {
+    "zh-CN": "Hans", "zh-SG": "Hans",
+    "zh-TW": "Hant", "zh-HK": "Hant", "zh-MO": "Hant",
+    "ja-JP": "Jpan", "ko-KR": "Hang",
+}
+
+# DocumentPart -> 该文档的字体解析缓存（主题字体表、各样式和文档默认的 rFonts）
+_document_font_caches = weakref.WeakKeyDictionary()
+
+
+def _document_font_cache(document):
+    cache = _document_font_caches.get(document.part)
+    if cache is None:
+        cache = {"styles": {}}
+        _document_font_caches[document.part] = cache
+    return cache
+
+
+def parse_theme_font_table(theme_xml, east_asia_script="Hans"):
+    """
+    解析 theme1.xml 中的 <a:fontScheme>，返回主题字体引用到字体名的映射，
+    键为 w:asciiTheme 等属性的取值：majorAscii、minorEastAsia、majorBidi ...
+    <a:ea typeface=""> 为空时（Office 默认主题即如此）按 east_asia_script 取对应脚本的字体。
+    """
+    table = {}
+    root = etree.fromstring(theme_xml)
+    for prefix in ("major", "minor"):
+        font_el = root.find(f".//{{{_DRAWINGML_NS}}}fontScheme/{{{_DRAWINGML_NS}}}{prefix}Font")
+        if font_el is None:
+            continue
+
+        def typeface(tag, _font_el=font_el):
+            el = _font_el.find(f"{{{_DRAWINGML_NS}}}{tag}")
+            return el.get("typeface") or None if el is not None else None
+
+        latin = typeface("latin")
+        east_asia = typeface("ea")
+        if not east_asia and east_asia_script:
+            for script_font in font_el.findall(f"{{{_DRAWINGML_NS}}}font"):
+                if script_font.get("script") == east_asia_script:
+                    east_asia = script_font.get("typeface") or None
+                    break
+        table[f"{prefix}Ascii"] = latin
+        table[f"{prefix}HAnsi"] = latin
+        table[f"{prefix}EastAsia"] = east_asia
+        table[f"{prefix}Bidi"] = typeface("cs")
+    return {k: v for k, v in table.items() if v}
+
+
+def _load_theme_font_table(document):
+    try:
+        theme_part = document.part.part_related_by(RT.THEME)
+    except KeyError:
+        return {}
+
+    east_asia_script = "Hans"  # 面向中文论文，未声明主题语言时按简体中文处理
+    try:
+        lang_elements = document.settings.element.xpath("./w:themeFontLang")
+        if lang_elements:
+            lang = lang_elements[0].get(qn("w:eastAsia"))
+            east_asia_script = EAST_ASIA_LANG_SCRIPTS.get(lang, east_asia_script)
+    except Exception:
+        pass
+
+    try:
+        return parse_theme_font_table(theme_part.blob, east_asia_script)
+    except etree.XMLSyntaxError:
+        return {}
+
+
+def get_theme_font_table(document):
+    """文档的主题字体表，每个文档只解析一次 theme1.xml。"""
+    cache = _document_font_cache(document)
+    if "theme" not in cache:
+        cache["theme"] = _load_theme_font_table(document)
+    return cache["theme"]
+
+
+def _rfonts_values(rfonts, theme_table):
+    """
+    读取一个 <w:rFonts> 元素中四种字体的实际字体名。
+    同一元素上主题引用优先于字面字体名（w:asciiTheme 存在时 w:ascii 被忽略）。
+    """
+    values = {}
+    for attr, theme_attr in THEME_FONT_ATTRS.items():
+        value = None
+        theme_ref = rfonts.get(qn(theme_attr))
+        if theme_ref:
+            value = theme_table.get(theme_ref)
+        if not value:
+            value = rfonts.get(qn(f"w:{attr}"))
+        values[attr] = value or None
+    return values
+
+
+def _style_fonts(document, style):
+    """样式自身 rPr 中定义的字体（不沿 based_on 查找），按样式缓存。"""
+    cache = _document_font_cache(document)["styles"]
+    key = style.style_id or style.name
+    values = cache.get(key)
+    if values is None:
+        values = {}
+        rpr = style.element.rPr
+        rfonts = rpr.rFonts if rpr is not None else None
+        if rfonts is not None:
+            values = _rfonts_values(rfonts, get_theme_font_table(document))
+        cache[key] = values
+    return values
+
+
+def _default_fonts(document):
+    """w:docDefaults 中定义的字体，每个文档只查找一次。"""
+    cache = _document_font_cache(document)
+    if "defaults" not in cache:
+        values = {}
+        try:
+            rfonts_elements = document.styles.element.xpath(
+                "./w:docDefaults/w:rPrDefault/w:rPr/w:rFonts")
+            if rfonts_elements:
+                values = _rfonts_values(rfonts_elements[0], get_theme_font_table(document))
+        except Exception:
+            pass
+        cache["defaults"] = values
+    return cache["defaults"]
+
+
 def get_effective_run_fonts(run, paragraph, document):
 # def get_effective_run_fonts(run, paragraph):
     effective_fonts = {"ascii": None,
@@ -62,34 +203,23 @@ def get_effective_run_fonts(run, paragraph, document):
     if rpr is not None:
         rfonts = rpr.rFonts
         if rfonts is not None:
-            for attr in attr_names:
-                if effective_fonts[attr] is None:
-                    val = rfonts.get(qn(f"w:{attr}"))
-                    if val:
-                        effective_fonts[attr] = val
+            effective_fonts.update(
+                _rfonts_values(rfonts, get_theme_font_table(document)))
 
+    # 依次用字符样式、段落样式和文档默认设置补全缺失的字体，
+    # 各级的 rFonts（含主题字体映射）按文档缓存，不会对每个 run 重复查找
+    levels = []
     char_style = run.style
     if char_style and char_style.type == docx.enum.style.WD_STYLE_TYPE.CHARACTER:  # 确保是字符样式
-        for attr in attr_names:
-            if effective_fonts[attr] is None:
-                val = get_style_rfonts_attr(
-                    char_style.font, f"w:{attr}")  # 字符样式字体在 style.font
-                if val:
-                    effective_fonts[attr] = val
-
+        levels.append(_style_fonts(document, char_style))
     para_style = paragraph.style
     if para_style and para_style.type == docx.enum.style.WD_STYLE_TYPE.PARAGRAPH:  # 确保是段落样式
+        levels.append(_style_fonts(document, para_style))
+    # 检查文档默认设置
+    levels.append(_default_fonts(document))
+
+    for level_fonts in levels:
         for attr in attr_names:
             if effective_fonts[attr] is None:
-                # 段落样式字体在其 font 属性
-                val = get_style_rfonts_attr(para_style.font, f"w:{attr}")
-                if val:
-                    effective_fonts[attr] = val
-
-    # 检查文档默认设置
-    for attr in attr_names:
-        if effective_fonts[attr] is None:
-            val = get_default_rfonts_attr(document, f"w:{attr}")
-            if val:
-                effective_fonts[attr] = val
+                effective_fonts[attr] = level_fonts.get(attr)
     return effective_fonts
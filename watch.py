@@ -0,0 +1,375 @@
+"""
+监视模式：文档保存后立即重新检查，只重新检查改动过的段落。
+
+作者在 Word 中修改论文时，每次保存都会触发一次检查。IncrementalChecker 记住上一次
+检查时每个段落的错误，下一次检查时：
+
+- 部件级：比较 zip 目录中各部件的 CRC，文档、样式、主题和设置都没变时直接复用上次结果；
+- 样式级：每个样式的指纹包含它自己的 XML 和 basedOn 链上所有样式的指纹，
+  只有引用了改动过的样式的段落才需要重新检查；
+- 段落级：段落的键为 (段落 XML, 段落样式和 run 样式的指纹,
+  主题/w:themeFontLang/docDefaults/默认字符样式的指纹)，
+  键没变的段落直接重放上次记录的错误，不再解析格式属性。
+
+跨段落规则（window.py）依赖前后段落，每次都对全部段落运行，它们只用到文本、样式名等
+很少的属性，开销很小。结果与完整检查逐条相同。
+
+监视文件变化在 Linux 上用 inotify（通过 ctypes 调用 libc，不需要额外依赖），
+其他平台或 inotify 不可用时退回到轮询 mtime：
+
+    python watch.py thesis.docx
+    python watch.py thesis.docx --html format_checker_report.html
+    python watch.py thesis.docx --poll 0.5
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+
+# 主题改变时所有段落都要重新检查；settings.xml 每次保存都会变（rsid），只比较其中的 w:themeFontLang
+THEME_PART = "word/theme/theme1.xml"
+# 这些部件都没变时可以直接复用上一次的结果
+CHECKED_PARTS = ("word/document.xml", "word/styles.xml", THEME_PART, "word/settings.xml")
+
+RE_PARAGRAPH_STYLE = re.compile(rb'<w:pStyle w:val="([^"]*)"')
+RE_RUN_STYLE = re.compile(rb'<w:rStyle w:val="([^"]*)"')
+
+
+def part_crcs(doc_path):
+    """{部件名: CRC32}，只读 zip 目录，不解压。不是路径或不是 zip 时返回 None。"""
+    import zipfile
+
+    if not isinstance(doc_path, (str, os.PathLike)):
+        return None
+    try:
+        with zipfile.ZipFile(doc_path) as zf:
+            return {info.filename: info.CRC for info in zf.infolist()}
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def _digest(*chunks):
+    hasher = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.digest()
+
+
+# style_fingerprints 结果中默认字符样式（run 没有 w:rStyle 时使用）的键
+DEFAULT_CHARACTER_STYLE = ("default", "character")
+
+
+def style_fingerprints(styles_element):
+    """
+    {styleId: 指纹}，指纹由样式自身的 XML 和 basedOn 链上的样式指纹组成。
+    另外用 None 键保存默认段落样式的指纹（段落没有 w:pStyle 时使用），
+    用 DEFAULT_CHARACTER_STYLE 键保存默认字符样式的指纹。
+    """
+    from docx.oxml.ns import qn
+    from lxml import etree
+
+    own = {}
+    based_on = {}
+    default_paragraph_style = default_character_style = None
+    for style in styles_element.iterchildren(qn("w:style")):
+        style_id = style.get(qn("w:styleId"))
+        own[style_id] = etree.tostring(style)
+        parent = style.find(qn("w:basedOn"))
+        if parent is not None:
+            based_on[style_id] = parent.get(qn("w:val"))
+        if style.get(qn("w:default")) in ("1", "true", "on"):
+            style_type = style.get(qn("w:type"))
+            if style_type == "paragraph":
+                default_paragraph_style = style_id
+            elif style_type == "character":
+                default_character_style = style_id
+
+    fingerprints = {}
+
+    def fingerprint(style_id, seen=()):
+        if style_id in fingerprints:
+            return fingerprints[style_id]
+        if style_id not in own or style_id in seen:
+            # 引用了不存在的样式或 basedOn 成环
+            return b""
+        parent_id = based_on.get(style_id)
+        parent = fingerprint(parent_id, seen + (style_id,)) if parent_id is not None else b""
+        fingerprints[style_id] = _digest(own[style_id], parent)
+        return fingerprints[style_id]
+
+    for style_id in own:
+        fingerprint(style_id)
+    fingerprints[None] = fingerprints.get(default_paragraph_style, b"")
+    fingerprints[DEFAULT_CHARACTER_STYLE] = fingerprints.get(default_character_style, b"")
+    return fingerprints
+
+
+class IncrementalChecker:
+    """
+    包装一个 FormatChecker，重复检查同一文档时只检查改动过的段落。
+    check(doc_path) 返回与 FormatChecker.check_document 相同的 CheckResult，
+    last_stats 记录本次检查了多少个段落、复用了多少个。
+    """
+
+    def __init__(self, checker):
+        self.checker = checker
+        # 段落键 -> 上次检查记录的错误参数（见 FormatChecker._add_error）
+        self._paragraph_findings = {}
+        self._crcs = None
+        self._result = None
+        self.last_stats = {}
+        # 最近一次检查的文档中每个段落的文本（w:t 拼接，供 diff_report.py 对齐段落）
+        self.paragraph_texts = []
+
+    def check(self, doc_path):
+        from docx.oxml.ns import qn
+        from lazy_package import open_document
+        from lxml import etree
+        from preflight import check_package
+        from resolved import ResolvedParagraph, resolve_sections
+        from source import open_source
+
+        started = time.perf_counter()
+        crcs = part_crcs(doc_path)
+        if (
+            crcs is not None
+            and self._result is not None
+            and all(crcs.get(name) == self._crcs.get(name) for name in CHECKED_PARTS)
+        ):
+            self.last_stats = {"unchanged": True, "rechecked": 0, "reused": self._result.paragraphs_total,
+                               "elapsed_s": time.perf_counter() - started}
+            return self._result
+
+        checker = self.checker
+        checker.start_check()
+        self._result = None
+        try:
+            with open_source(doc_path) as doc_file:
+                problem = check_package(doc_file)
+                if problem is None:
+                    doc = open_document(doc_file)
+        except Exception as e:
+            checker.add_document_error(doc_path, e)
+            return self._finish_failed(started)
+        if problem is not None:
+            checker.add_preflight_error(doc_path, problem)
+            return self._finish_failed(started)
+
+        styles_element = doc.styles.element
+        fingerprints = style_fingerprints(styles_element)
+        doc_defaults = styles_element.find(qn("w:docDefaults"))
+        theme_font_lang = doc.settings.element.find(qn("w:themeFontLang"))
+        environment = _digest(
+            repr((crcs or {}).get(THEME_PART)).encode("ascii"),
+            etree.tostring(doc_defaults) if doc_defaults is not None else b"",
+            etree.tostring(theme_font_lang) if theme_font_lang is not None else b"",
+            # 没有 w:rStyle 的 run 使用默认字符样式，它改变时所有段落都要重新检查
+            fingerprints[DEFAULT_CHARACTER_STYLE],
+        )
+
+        checker.check_sections(resolve_sections(doc))
+        paragraphs = doc.paragraphs
+        checker.errors.paragraphs_total = len(paragraphs)
+        window_runner = checker._window_runner
+        # 不是文件路径时无法比较主题和设置部件，不复用段落结果
+        previous = self._paragraph_findings if crcs is not None else {}
+        current = {}
+        style_names = {}
+        rechecked = 0
+        text_tag = qn("w:t")
+        self.paragraph_texts = texts = []
+        for p_idx, paragraph in enumerate(paragraphs):
+            xml = etree.tostring(paragraph._p)
+            texts.append("".join(paragraph._p.itertext(text_tag)))
+            match = RE_PARAGRAPH_STYLE.search(xml)
+            style_key = [fingerprints.get(match.group(1).decode("utf-8"), b"") if match else fingerprints[None]]
+            style_key += [fingerprints.get(run_style.decode("utf-8"), b"") for run_style in RE_RUN_STYLE.findall(xml)]
+            key = _digest(xml, environment, *style_key)
+
+            p = ResolvedParagraph(paragraph, p_idx, doc)
+            # python-docx 查找默认样式要遍历整个 styles.xml，同一样式只查一次
+            style_id = match.group(1) if match else None
+            if style_id in style_names:
+                p.__dict__["style_name"] = style_names[style_id]
+            else:
+                style_names[style_id] = p.style_name
+            if window_runner is not None:
+                window_runner.push(p)
+            records = previous.get(key)
+            if records is None:
+                records = current.get(key)
+            if records is None:
+                rechecked += 1
+                records = checker._finding_recorder = []
+                try:
+                    checker.check_paragraph_rules(p)
+                finally:
+                    checker._finding_recorder = None
+            else:
+                checker.replay_findings(p_idx, records)
+            current[key] = records
+        checker.errors.paragraphs_checked = len(paragraphs)
+
+        # 只保留当前版本中存在的段落，内存不会随编辑次数增长
+        self._paragraph_findings = current
+        self._crcs = crcs
+        self._result = checker.finish_check(started)
+        self.last_stats = {"unchanged": False, "rechecked": rechecked, "reused": len(paragraphs) - rechecked,
+                           "elapsed_s": self._result.elapsed_s}
+        return self._result
+
+    def _finish_failed(self, started):
+        # 读取失败（例如 Word 还没写完）时不保留缓存的结果，下次保存后重新检查
+        self._crcs = None
+        self.paragraph_texts = []
+        self.checker.errors.elapsed_s = time.perf_counter() - started
+        self.last_stats = {"unchanged": False, "rechecked": 0, "reused": 0,
+                           "elapsed_s": self.checker.errors.elapsed_s}
+        return self.checker.errors
+
+
+class PollingWatcher:
+    """轮询文件的 (mtime, 大小)。"""
+
+    def __init__(self, path, interval=0.5):
+        self.path = path
+        self.interval = interval
+        self._last = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def wait(self):
+        while True:
+            time.sleep(self.interval)
+            current = self._stat()
+            if current is not None and current != self._last:
+                self._last = current
+                return
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    用 inotify 监视文档所在目录：Word 保存时通常先写临时文件再改名覆盖原文件，
+    直接监视文件本身会在第一次保存后失效，所以监视目录中该文件名的写入完成和改名事件。
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    EVENT_HEADER = 16  # struct inotify_event: int wd, uint32 mask, cookie, len
+
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"无法监视目录 '{directory}'")
+        self._name = os.fsencode(os.path.basename(path))
+
+    def wait(self):
+        import struct
+
+        while True:
+            data = os.read(self._fd, 64 * 1024)
+            offset = 0
+            while offset + self.EVENT_HEADER <= len(data):
+                _, mask, _, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + self.EVENT_HEADER:offset + self.EVENT_HEADER + length].rstrip(b"\0")
+                offset += self.EVENT_HEADER + length
+                if name == self._name:
+                    return
+
+    def close(self):
+        os.close(self._fd)
+
+
+def make_watcher(path, poll_interval=None):
+    """poll_interval 为 None 时优先使用 inotify，不可用时退回到每 0.5 秒轮询一次。"""
+    if poll_interval is None and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError) as e:
+            logging.info(f"inotify 不可用（{e}），改为轮询")
+    return PollingWatcher(path, poll_interval or 0.5)
+
+
+def render(incremental, doc_path, html_report=None):
+    checker = incremental.checker
+    if sys.stdout.isatty():
+        # 清屏，让结果停在屏幕顶部
+        print("\033[2J\033[H", end="")
+    stats = incremental.last_stats
+    if stats.get("unchanged"):
+        summary = "文档内容未变化，沿用上次结果"
+    else:
+        summary = f"重新检查 {stats['rechecked']} 个段落，复用 {stats['reused']} 个"
+    findings = sum(len(block["details"]) for block in checker.errors)
+    print(f"[{time.strftime('%H:%M:%S')}] {doc_path}：{findings} 个问题（{summary}，用时 "
+          f"{stats['elapsed_s'] * 1000:.0f} ms）")
+    if checker.errors:
+        checker.print_structured_errors_to_console()
+    if html_report:
+        checker.generate_html_report(html_report)
+
+
+def watch(doc_path, checker, html_report=None, poll_interval=None, debounce_s=0.1):
+    """检查一次，然后每次文档保存后增量检查并输出结果，直到 Ctrl+C。"""
+    incremental = IncrementalChecker(checker)
+    incremental.check(doc_path)
+    render(incremental, doc_path, html_report)
+    watcher = make_watcher(doc_path, poll_interval)
+    try:
+        while True:
+            watcher.wait()
+            # Word 保存时会连续产生多个事件，稍等片刻让文件写完
+            time.sleep(debounce_s)
+            incremental.check(doc_path)
+            render(incremental, doc_path, html_report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="监视 docx 文档，保存后立即增量检查")
+    parser.add_argument("doc_path", help="待检查的 .docx 文件")
+    parser.add_argument("--html", dest="html_report", default=None, help="每次检查后同时更新 HTML 报告")
+    parser.add_argument("--poll", type=float, default=None, help="改为每隔这么多秒轮询文件，不使用 inotify")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="{levelname} - {message}", style="{", level=logging.WARNING)
+
+    if not os.path.isfile(args.doc_path):
+        print(f"Err: 文档 '{args.doc_path}' 不存在")
+        return 1
+
+    from checking import FormatChecker
+    from rules import DEFAULT_RULES
+
+    watch(args.doc_path, FormatChecker(DEFAULT_RULES), args.html_report, args.poll)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+跨段落规则：在一次遍历中用有界滑动窗口检查需要上下文的格式。
+
+标题编号是否连续、图片段落是否与图题保持同页、参考文献编号是否连续这类检查
+需要看到前后段落。每条规则声明自己需要往前 (look_behind) 和往后 (look_ahead)
+看几个段落，ParagraphWindow 只保留 max(look_behind) + 1 + max(look_ahead) 个段落，
+内存占用与文档长度无关；需要更长上下文的规则自己保存常数大小的状态（如当前编号）。
+
+规则集中的 "cross_paragraph" 分组决定启用哪些规则：
+
+    "cross_paragraph": {
+        "heading_numbering": {"levels": {"Heading 1": 1, "Heading 2": 2}},
+        "figure_keep_with_caption": {"caption_styles": {"图标题": "below"}},
+        "reference_numbering": {"styles": ["参考文献"]},
+    }
+"""
+import re
+from collections import deque
+
+ERROR_CATEGORY = "跨段落"
+
+
+class WindowRule:
+    """
+    跨段落规则的基类。
+    check(window, report) 对 window.current 做检查，可以通过 window.behind(k) /
+    window.ahead(k) 访问前后第 k 个段落（k 不超过声明的范围，超出文档时为 None）。
+    report(p, rule_key, expected, actual, location=None) 记录一条错误。
+    """
+
+    name = ""
+    look_behind = 0
+    look_ahead = 0
+    # 配置键 -> (取值类型, 元素的类型或允许的取值)，字典检查它的值；供 rules_validation 校验
+    config_types = {}
+
+    def __init__(self, config=None):
+        self.config = config or {}
+
+    def reset(self):
+        """开始检查新文档时调用，清空规则自己保存的状态。"""
+
+    def check(self, window, report):
+        raise NotImplementedError
+
+    def finish(self, report):
+        """所有段落都检查完后调用。"""
+
+
+class ParagraphWindow:
+    def __init__(self, look_behind, look_ahead):
+        self.look_behind = look_behind
+        self.look_ahead = look_ahead
+        self._buffer = deque(maxlen=look_behind + 1 + look_ahead)
+        self._current = None  # 当前段落在 _buffer 中的位置
+
+    @property
+    def current(self):
+        return self._buffer[self._current]
+
+    def behind(self, k=1):
+        if k > self.look_behind:
+            raise IndexError(f"规则没有声明 look_behind >= {k}")
+        position = self._current - k
+        return self._buffer[position] if position >= 0 else None
+
+    def ahead(self, k=1):
+        if k > self.look_ahead:
+            raise IndexError(f"规则没有声明 look_ahead >= {k}")
+        position = self._current + k
+        return self._buffer[position] if position < len(self._buffer) else None
+
+
+class WindowRunner:
+    """把段落逐个送入窗口，当前段落的后续段落到齐后对它运行所有规则。"""
+
+    def __init__(self, rules, report):
+        self.rules = rules
+        self.report = report
+        look_behind = max((rule.look_behind for rule in rules), default=0)
+        look_ahead = max((rule.look_ahead for rule in rules), default=0)
+        self.window = ParagraphWindow(look_behind, look_ahead)
+
+    def reset(self):
+        self.window = ParagraphWindow(self.window.look_behind, self.window.look_ahead)
+        for rule in self.rules:
+            rule.reset()
+
+    def push(self, p):
+        window = self.window
+        window._buffer.append(p)
+        # 缓冲区中当前段落之后还有 look_ahead 个段落时才检查它
+        pending = len(window._buffer) - 1 - window.look_ahead
+        if pending >= 0:
+            window._current = pending
+            self._run_rules()
+
+    def flush(self):
+        """文档结束：检查还在等待后续段落的那些段落，然后调用各规则的 finish。"""
+        window = self.window
+        start = 0 if window._current is None else window._current + 1
+        for position in range(start, len(window._buffer)):
+            window._current = position
+            self._run_rules()
+        for rule in self.rules:
+            rule.finish(self.report)
+
+    def _run_rules(self):
+        for rule in self.rules:
+            rule.check(self.window, self.report)
+
+
+def _first_line_location(text):
+    end = text.find("\n")
+    return [0, end if end != -1 else len(text)] if text else None
+
+
+_CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5,
+                   "六": 6, "七": 7, "八": 8, "九": 9}
+
+
+def parse_chinese_number(text):
+    """解析一百以内的中文数字（如 "十二"、"二十"），无法解析时返回 None。"""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        tens_value = _CHINESE_DIGITS.get(tens, None) if tens else 1
+        ones_value = _CHINESE_DIGITS.get(ones, None) if ones else 0
+        if tens_value is None or ones_value is None:
+            return None
+        return tens_value * 10 + ones_value
+    if len(text) == 1:
+        return _CHINESE_DIGITS.get(text)
+    return None
+
+
+RE_CHAPTER_NUMBER = re.compile(r"^\s*第([一二三四五六七八九十零〇\d]+)章")
+RE_DOTTED_NUMBER = re.compile(r"^\s*(\d+(?:\.\d+)*)(?=\s|$|[^\d.])")
+
+
+class HeadingNumberingRule(WindowRule):
+    """
+    标题编号连续：同一上级标题下的编号从 1 开始逐个递增，编号层数与标题级别一致。
+    只检查以 "第X章" 或 "1.2.3" 开头的标题，Word 自动编号的标题文本中没有编号，会被跳过。
+    发现错误后以实际编号为准继续，避免一处跳号导致后面全部报错。
+    """
+
+    name = "heading_numbering"
+    config_types = {"levels": (dict, int)}
+    DEFAULT_LEVELS = {
+        "Heading 1": 1, "Heading 2": 2, "Heading 3": 3,
+        "标题 1": 1, "标题 2": 2, "标题 3": 3,
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.levels = self.config.get("levels", self.DEFAULT_LEVELS)
+        self.current = []
+
+    def reset(self):
+        self.current = []
+
+    @staticmethod
+    def parse_number(text):
+        match = RE_CHAPTER_NUMBER.match(text)
+        if match:
+            number = parse_chinese_number(match.group(1))
+            return ((number,), match.span(1)) if number is not None else (None, None)
+        match = RE_DOTTED_NUMBER.match(text)
+        if match:
+            return tuple(int(part) for part in match.group(1).split(".")), match.span(1)
+        return None, None
+
+    def check(self, window, report):
+        p = window.current
+        level = self.levels.get(p.style_name)
+        if level is None:
+            return
+        numbers, span = self.parse_number(p.text)
+        if numbers is None:
+            return
+
+        if len(numbers) != level:
+            report(p, "heading_numbering", f"{level} 级编号", ".".join(map(str, numbers)), list(span))
+        else:
+            known_parent = len(self.current) >= level - 1
+            parent = tuple(self.current[:level - 1]) if known_parent else numbers[:-1]
+            if len(self.current) >= level and tuple(self.current[:level - 1]) == parent:
+                expected = parent + (self.current[level - 1] + 1,)
+            else:
+                expected = parent + (1,)
+            if numbers != expected:
+                report(p, "heading_numbering", ".".join(map(str, expected)),
+                       ".".join(map(str, numbers)), list(span))
+        self.current = list(numbers)
+
+
+def _is_figure_paragraph(p, figure_styles):
+    # 空白段落不是图片段落，只看样式和段落中是否真的有图片
+    return p.style_name in figure_styles or p.has_drawing
+
+
+class FigureKeepWithCaptionRule(WindowRule):
+    """
+    图片段落与图题不能分页：图题在图下方时图片段落要设置"与下段同页"，
+    图题在图上方时图题段落要设置"与下段同页"。
+    图片段落是样式在 figure_styles 中、或包含 w:drawing / w:pict 的段落。
+    caption_styles: {图题样式名: "below" 或 "above"}。
+    """
+
+    name = "figure_keep_with_caption"
+    look_ahead = 1
+    config_types = {"caption_styles": (dict, ("below", "above")), "figure_styles": (list, str)}
+    DEFAULT_CAPTION_STYLES = {"图标题": "below"}
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.caption_styles = self.config.get("caption_styles", self.DEFAULT_CAPTION_STYLES)
+        self.figure_styles = set(self.config.get("figure_styles", ["图"]))
+
+    def check(self, window, report):
+        p = window.current
+        next_p = window.ahead(1)
+        if next_p is None:
+            return
+        if self.caption_styles.get(next_p.style_name) == "below" and _is_figure_paragraph(p, self.figure_styles):
+            if not p.keep_with_next:
+                report(p, "figure_keep_with_caption (图片与下方图题)", True, p.keep_with_next)
+        elif self.caption_styles.get(p.style_name) == "above" and _is_figure_paragraph(next_p, self.figure_styles):
+            if not p.keep_with_next:
+                report(p, "figure_keep_with_caption (图题与下方图片)", True, p.keep_with_next)
+
+
+RE_REFERENCE_NUMBER = re.compile(r"^\s*[\[［](\d+)[\]］]")
+
+
+class ReferenceNumberingRule(WindowRule):
+    """参考文献条目以 [1]、[2] …… 顺序编号。"""
+
+    name = "reference_numbering"
+    config_types = {"styles": (list, str)}
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.styles = set(self.config.get("styles", ["参考文献"]))
+        self.last_number = 0
+
+    def reset(self):
+        self.last_number = 0
+
+    def check(self, window, report):
+        p = window.current
+        if p.style_name not in self.styles:
+            return
+        match = RE_REFERENCE_NUMBER.match(p.text)
+        if match is None:
+            return
+        number = int(match.group(1))
+        if number != self.last_number + 1:
+            report(p, "reference_numbering", f"[{self.last_number + 1}]", f"[{number}]", list(match.span()))
+        self.last_number = number
+
+
+# 规则名 -> 规则类，规则集的 "cross_paragraph" 分组中的键必须是这里的名字
+WINDOW_RULES = {
+    rule_class.name: rule_class
+    for rule_class in (HeadingNumberingRule, FigureKeepWithCaptionRule, ReferenceNumberingRule)
+}
+
+
+def build_window_rules(config):
+    """按规则集的 "cross_paragraph" 分组实例化规则；值为 False / None 的规则不启用。"""
+    rules = []
+    for name, rule_config in (config or {}).items():
+        if rule_config is False or rule_config is None:
+            continue
+        rule_class = WINDOW_RULES.get(name)
+        if rule_class is None:
+            raise ValueError(f"未知的跨段落规则 '{name}'")
+        rules.append(rule_class(rule_config if isinstance(rule_config, dict) else None))
+    return rules
+
+
+def make_reporter(checker):
+    """把跨段落规则的错误记录到 FormatChecker 中，与段落错误放在同一个错误块里。"""
+
+    def report(p, rule_key, expected, actual, location=None):
+        text = p.text
+        checker._add_error(
+            p.index,
+            p.style_name,
+            text[:30].replace("\n", " "),
+            text,
+            ERROR_CATEGORY,
+            rule_key,
+            expected,
+            actual,
+            error_char_location=location or _first_line_location(text),
+        )
+
+    return report